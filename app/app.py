@@ -4,9 +4,12 @@ A simple bug tracking system with user authentication and CRUD operations.
 """
 
 from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from jinja2 import FileSystemBytecodeCache
 from models import db, User, Bug
 from datetime import datetime
 import os
+import time
+import click
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,7 +17,7 @@ load_dotenv()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///bugtracker.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///bugtracker.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['BASE_PATH'] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -25,6 +28,66 @@ app.config['SESSION_USE_SIGNER'] = True
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 
+# Template bytecode cache, shared by every worker and filled at deploy time
+# with `flask --app app precompile-templates`. Set to an empty string to disable.
+app.config['JINJA_BYTECODE_CACHE_DIR'] = os.getenv(
+    'JINJA_BYTECODE_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache')
+)
+if app.config['JINJA_BYTECODE_CACHE_DIR']:
+    os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])
+
+# Support chat: persisted document index and how often it re-checks files
+app.config['SUPPORT_STATE_DIR'] = os.getenv('SUPPORT_STATE_DIR', app.instance_path)
+app.config['SUPPORT_INDEX_POLL_SECONDS'] = float(os.getenv('SUPPORT_INDEX_POLL_SECONDS', '5'))
+# Prebuilt support context that workers map at startup instead of indexing the
+# repository; build it with `flask --app app build-context-bundle`. Empty disables.
+app.config['SUPPORT_CONTEXT_BUNDLE'] = os.getenv(
+    'SUPPORT_CONTEXT_BUNDLE', os.path.join(app.config['SUPPORT_STATE_DIR'], 'support_context.bundle')
+)
+# Cached chat replies: seconds to keep them (0 disables) and how many to keep
+app.config['SUPPORT_RESPONSE_CACHE_TTL'] = float(os.getenv('SUPPORT_RESPONSE_CACHE_TTL', '86400'))
+app.config['SUPPORT_RESPONSE_CACHE_MAX_ENTRIES'] = int(os.getenv('SUPPORT_RESPONSE_CACHE_MAX_ENTRIES', '5000'))
+# Token budget for the conversation history sent with each chat message
+app.config['SUPPORT_HISTORY_TOKENS'] = int(os.getenv('SUPPORT_HISTORY_TOKENS', '1500'))
+# Reuse answers to first questions at least this similar (Jaccard, 0 disables)
+app.config['SUPPORT_SIMILAR_QUESTION_THRESHOLD'] = float(os.getenv('SUPPORT_SIMILAR_QUESTION_THRESHOLD', '0.6'))
+# Answer questions the local classifier is this sure are out of scope without the LLM (0 disables)
+app.config['SUPPORT_SCOPE_THRESHOLD'] = float(os.getenv('SUPPORT_SCOPE_THRESHOLD', '0.85'))
+# Answer first questions from a help-article section when this confident it covers them (0 disables)
+app.config['SUPPORT_ARTICLE_ANSWER_THRESHOLD'] = float(os.getenv('SUPPORT_ARTICLE_ANSWER_THRESHOLD', '0.7'))
+# Identical chat requests in flight share one reply: seconds a request waits
+# for it (0 disables) and whether workers coordinate through the cache database
+app.config['SUPPORT_COALESCE_SECONDS'] = float(os.getenv('SUPPORT_COALESCE_SECONDS', '30'))
+app.config['SUPPORT_COALESCE_MAX_WAITERS'] = int(os.getenv('SUPPORT_COALESCE_MAX_WAITERS', '8'))
+app.config['SUPPORT_COALESCE_ACROSS_WORKERS'] = os.getenv('SUPPORT_COALESCE_ACROSS_WORKERS', 'true').lower() == 'true'
+# Chat and article requests per minute (and burst) per user, and across all users (0 disables);
+# LLM calls in flight per worker, requests that may queue for one and how long they wait.
+# Keep in-flight calls plus queue below the worker's threads so bug pages stay responsive.
+app.config['SUPPORT_RATE_PER_MINUTE'] = float(os.getenv('SUPPORT_RATE_PER_MINUTE', '20'))
+app.config['SUPPORT_RATE_BURST'] = float(os.getenv('SUPPORT_RATE_BURST', '5'))
+app.config['SUPPORT_GLOBAL_RATE_PER_MINUTE'] = float(os.getenv('SUPPORT_GLOBAL_RATE_PER_MINUTE', '0'))
+app.config['SUPPORT_GLOBAL_RATE_BURST'] = float(os.getenv('SUPPORT_GLOBAL_RATE_BURST', '20'))
+app.config['SUPPORT_LLM_MAX_CONCURRENT'] = int(os.getenv('SUPPORT_LLM_MAX_CONCURRENT', '4'))
+app.config['SUPPORT_LLM_QUEUE'] = int(os.getenv('SUPPORT_LLM_QUEUE', '8'))
+app.config['SUPPORT_LLM_QUEUE_TIMEOUT'] = float(os.getenv('SUPPORT_LLM_QUEUE_TIMEOUT', '10'))
+# Per-request chat analytics (latency, cache hits, context size), written in batches
+# off the request path; summarize with `flask --app app chat-stats`
+app.config['SUPPORT_CHAT_LOG'] = os.getenv('SUPPORT_CHAT_LOG', 'true').lower() == 'true'
+# Threads per worker for background jobs such as article generation (0 runs them in the request)
+app.config['SUPPORT_JOB_WORKERS'] = int(os.getenv('SUPPORT_JOB_WORKERS', '2'))
+# LLM provider: API root (e.g. a local fake), seconds per attempt and per call,
+# retries per call and the share of calls that may be retried overall,
+# pooled connections, and failures in a row that open the circuit for N seconds
+app.config['OPENAI_BASE_URL'] = os.getenv('OPENAI_BASE_URL')
+app.config['SUPPORT_LLM_TIMEOUT'] = float(os.getenv('SUPPORT_LLM_TIMEOUT', '30'))
+app.config['SUPPORT_LLM_DEADLINE'] = float(os.getenv('SUPPORT_LLM_DEADLINE', '60'))
+app.config['SUPPORT_LLM_MAX_RETRIES'] = int(os.getenv('SUPPORT_LLM_MAX_RETRIES', '2'))
+app.config['SUPPORT_LLM_RETRY_BUDGET'] = float(os.getenv('SUPPORT_LLM_RETRY_BUDGET', '0.2'))
+app.config['SUPPORT_LLM_POOL_SIZE'] = int(os.getenv('SUPPORT_LLM_POOL_SIZE', '20'))
+app.config['SUPPORT_LLM_BREAKER_FAILURES'] = int(os.getenv('SUPPORT_LLM_BREAKER_FAILURES', '5'))
+app.config['SUPPORT_LLM_BREAKER_RESET'] = float(os.getenv('SUPPORT_LLM_BREAKER_RESET', '30'))
+
 # Initialize database
 db.init_app(app)
 
@@ -32,11 +95,18 @@ db.init_app(app)
 from support import support_bp
 app.register_blueprint(support_bp)
 
+# Register bug statistics reports blueprint
+from reporting import reports_bp
+from reporting.stats import ensure_indexes
+app.register_blueprint(reports_bp)
+
 
 def init_db():
     """Initialize database with mock users and sample bugs."""
     with app.app_context():
         db.create_all()
+        with db.engine.connect() as connection:
+            ensure_indexes(connection)
         
         # Check if users already exist
         if User.query.count() == 0:
@@ -91,6 +161,67 @@ def init_db():
             print("Database initialized with mock data!")
 
 
+@app.cli.command('precompile-templates')
+def precompile_templates():
+    """Compile every template into the bytecode cache (run at deploy time)."""
+    if app.jinja_env.bytecode_cache is None:
+        print("JINJA_BYTECODE_CACHE_DIR is disabled; nothing to precompile.")
+        return
+
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    print(f"Precompiled {len(names)} templates into {app.config['JINJA_BYTECODE_CACHE_DIR']}")
+
+
+@app.cli.command('build-context-bundle')
+def build_context_bundle():
+    """Prebuild the support assistant's context into SUPPORT_CONTEXT_BUNDLE (run at deploy time)."""
+    if not app.config['SUPPORT_CONTEXT_BUNDLE']:
+        print("SUPPORT_CONTEXT_BUNDLE is disabled; nothing to build.")
+        return
+
+    from support.context_bundle import build_bundle
+    stats = build_bundle(app.config['BASE_PATH'], app.config['SUPPORT_CONTEXT_BUNDLE'])
+    print(f"Bundled {stats['documents']} documents ({stats['sections']} sections, ~{stats['tokens']} tokens"
+          f"{', with vectors' if stats['vectors'] else ''}) into {stats['path']} ({stats['bytes'] // 1024} KB)")
+
+
+@app.cli.command('chat-stats')
+@click.option('--days', default=7.0, show_default=True, help='Only requests from the last N days.')
+@click.option('--top', default=10, show_default=True, help='How many of the most asked questions to list.')
+def chat_stats(days, top):
+    """Summarize the support chat analytics: outcomes, p50/p95 latencies and top questions."""
+    from support.chat_log import ChatLog
+
+    path = os.path.join(app.config['SUPPORT_STATE_DIR'], 'support_analytics.db')
+    if not os.path.exists(path):
+        print(f"No chat analytics at {path} yet.")
+        return
+
+    log = ChatLog(path)
+    summary = log.summary(since=time.time() - days * 86400, top=top)
+    log.close()
+
+    def fmt(value, unit=''):
+        return '-' if value is None else f"{value:,.0f}{unit}"
+
+    print(f"{summary['requests']} chat requests in the last {days:g} days")
+    print("  " + ", ".join(f"{outcome} {count}" for outcome, count in
+                           sorted(summary['outcomes'].items(), key=lambda item: -item[1])))
+    print(f"  cache hit rate {summary['cache_hit_rate']:.0%}, "
+          f"article proposed in {summary['article_proposed_rate']:.0%} of replies")
+    print(f"\n  {'':<16} {'p50':>9} {'p95':>9}")
+    for name, unit in (('first_token_ms', 'ms'), ('total_ms', 'ms'), ('context_chars', ''), ('context_tokens', ''),
+                       ('duplicate_tokens', '')):
+        print(f"  {name:<16} {fmt(summary['p50'][name], unit):>9} {fmt(summary['p95'][name], unit):>9}")
+    if summary['top_questions']:
+        print(f"\n  {'asked':>5} {'cached':>6} {'p95':>8}  question")
+        for question in summary['top_questions']:
+            print(f"  {question['requests']:>5} {question['cache_hit_rate']:>6.0%} "
+                  f"{fmt(question['p95_total_ms'], 'ms'):>8}  {question['question'][:70]}")
+
+
 @app.route('/')
 def index():
     """Redirect to login page."""
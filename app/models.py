@@ -36,7 +36,7 @@ class Bug(db.Model):
     reporter = db.Column(db.String(120), nullable=False)
     reporter_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    updated_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     def __repr__(self):
         return f'<Bug {self.id}: {self.title}>'
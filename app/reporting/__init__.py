@@ -0,0 +1,8 @@
+"""
+Reporting module for the bug tracker application.
+Provides cached bug statistics as an HTML page and as JSON.
+"""
+
+from .routes import reports_bp
+
+__all__ = ['reports_bp']
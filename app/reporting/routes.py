@@ -0,0 +1,84 @@
+"""
+Flask routes for bug statistics reports.
+"""
+
+from flask import Blueprint, request, jsonify, current_app, session, flash, redirect, url_for, render_template
+
+from .stats import BugStatsSnapshot, ensure_indexes
+
+reports_bp = Blueprint('reports', __name__, url_prefix='/reports')
+
+DEFAULT_REPORT_DAYS = 30
+MAX_REPORT_DAYS = 366
+
+
+def get_snapshot():
+    """
+    Return the app-wide statistics snapshot, refreshed against the database.
+
+    The snapshot lives in ``app.extensions`` so every request in a worker
+    shares it; refreshing is a single COUNT/MAX query when nothing changed.
+    """
+    snapshot = current_app.extensions.get('bug_stats')
+    engine = current_app.extensions['sqlalchemy'].engine
+    with engine.connect() as connection:
+        if snapshot is None:
+            # First use in this worker: existing databases may predate the index
+            ensure_indexes(connection)
+            snapshot = current_app.extensions.setdefault('bug_stats', BugStatsSnapshot())
+        snapshot.refresh(connection)
+
+    return snapshot
+
+
+def get_report_days():
+    """Parse the ?days= query parameter, clamped to a sane range."""
+    try:
+        days = int(request.args.get('days', DEFAULT_REPORT_DAYS))
+    except (TypeError, ValueError):
+        days = DEFAULT_REPORT_DAYS
+    return max(1, min(days, MAX_REPORT_DAYS))
+
+
+@reports_bp.route('/', methods=['GET'])
+def reports_page():
+    """Display bug statistics as an HTML report."""
+    if 'user_email' not in session:
+        flash('Please log in to view reports.', 'error')
+        return redirect(url_for('login'))
+
+    report = get_snapshot().report(days=get_report_days())
+
+    return render_template('reports.html',
+                         report=report,
+                         user_email=session['user_email'],
+                         user_role=session['user_role'])
+
+
+@reports_bp.route('/stats.json', methods=['GET'])
+def reports_json():
+    """
+    Return bug statistics as JSON.
+
+    Query parameters:
+        days: Number of days in the inflow/closure series (default 30, max 366)
+
+    Returns:
+    {
+        "total_bugs": 42,
+        "open_bugs": 17,
+        "daily": [{"date": "2025-12-06", "opened": 3, "closed": 1}, ...],
+        "aging": [{"bucket": "0-7 days", "count": 5}, ...],
+        "severity": [{"severity": "High", "open": 4, "closed": 2, "total": 6}, ...],
+        "reporters": [{"reporter": "reporter@example.com", "open": 3, "closed": 1, "total": 4}, ...]
+    }
+    """
+    if 'user_email' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    try:
+        return jsonify(get_snapshot().report(days=get_report_days()))
+
+    except Exception as e:
+        print(f"Error in reports endpoint: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
@@ -0,0 +1,279 @@
+"""
+Bug statistics engine backing the reports page.
+
+All statistics are derived from one cached "cube" of bug counts that is
+built with a single GROUP BY query and then kept up to date incrementally
+by reading only the rows whose ``updated_date`` moved past the last
+watermark.
+"""
+
+import threading
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+
+# Age buckets (in days) for open bugs: (label, min_age, max_age inclusive)
+AGING_BUCKETS = [
+    ('0-7 days', 0, 7),
+    ('8-30 days', 8, 30),
+    ('31-90 days', 31, 90),
+    ('90+ days', 91, None),
+]
+
+SEVERITIES = ['High', 'Medium', 'Low']
+# One row per distinct (created day, closed day, severity, status, reporter)
+# cell, carrying the ids that fall into it so later deltas can move bugs
+# between cells without re-reading the table.
+CUBE_QUERY = text("""
+    SELECT date(created_date) AS created_day,
+           CASE WHEN status = 'Closed' THEN date(updated_date) END AS closed_day,
+           severity,
+           status,
+           reporter,
+           COUNT(*) AS bug_count,
+           GROUP_CONCAT(id) AS bug_ids,
+           MAX(updated_date) AS last_update
+    FROM bugs
+    GROUP BY created_day, closed_day, severity, status, reporter
+""")
+
+# Databases created before the model declared index=True lack the index;
+# create_all() doesn't alter existing tables, so it is created explicitly
+UPDATED_DATE_INDEX = text("CREATE INDEX IF NOT EXISTS ix_bugs_updated_date ON bugs (updated_date)")
+
+# Two statements so SQLite can answer MAX() from the updated_date index
+COUNT_QUERY = text("SELECT COUNT(*) FROM bugs")
+WATERMARK_QUERY = text("SELECT MAX(updated_date) FROM bugs")
+
+DELTA_QUERY = text("""
+    SELECT id,
+           date(created_date) AS created_day,
+           CASE WHEN status = 'Closed' THEN date(updated_date) END AS closed_day,
+           severity,
+           status,
+           reporter,
+           updated_date
+    FROM bugs
+    WHERE updated_date >= :watermark
+""")
+
+
+Cell = Tuple[str, Optional[str], str, str, str]
+
+
+def ensure_indexes(connection):
+    """Create the updated_date index the watermark query relies on, if missing."""
+    connection.execute(UPDATED_DATE_INDEX)
+    connection.commit()
+
+
+class BugStatsSnapshot:
+    """
+    Cached bug statistics for a single database.
+
+    The snapshot stores a count per cell, the cell of every bug id and the
+    per-day/per-severity/per-reporter rollups derived from those cells.
+    ``refresh()`` is cheap when nothing changed (a COUNT and an indexed MAX),
+    reads only changed rows when bugs were created or edited, and falls back
+    to a full rebuild when rows disappeared (deletes do not touch
+    ``updated_date``).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.watermark: Optional[str] = None
+        self.version = 0
+        self.built_at: Optional[datetime] = None
+        self._report_cache: Dict[tuple, dict] = {}
+        self._reset()
+
+    def _reset(self):
+        """Drop all cells and rollups."""
+        self.cells: Counter = Counter()
+        self.bug_cells: Dict[int, Cell] = {}
+        self.total = 0
+        self.inflow = Counter()
+        self.closures = Counter()
+        self.open_by_day = Counter()
+        self.severity_mix = defaultdict(Counter)
+        self.reporters = defaultdict(Counter)
+
+    def _bump(self, cell: Cell, count: int):
+        """Add ``count`` bugs (negative to remove) to a cell and its rollups."""
+        created_day, closed_day, severity, status, reporter = cell
+        self.cells[cell] += count
+        if self.cells[cell] <= 0:
+            del self.cells[cell]
+        self.total += count
+        self.inflow[created_day] += count
+        if closed_day is not None:
+            # The schema has no closed_date; the last edit of a closed bug
+            # is the closest thing to its closure day.
+            self.closures[closed_day] += count
+        elif status == 'Open':
+            self.open_by_day[created_day] += count
+        self.severity_mix[severity][status] += count
+        self.reporters[reporter][status] += count
+
+    def refresh(self, connection) -> bool:
+        """
+        Bring the snapshot up to date with the database.
+
+        Args:
+            connection: SQLAlchemy connection to the bug tracker database
+
+        Returns:
+            True if the snapshot changed, False if it was already current
+        """
+        with self._lock:
+            count = connection.execute(COUNT_QUERY).scalar()
+            max_updated = connection.execute(WATERMARK_QUERY).scalar()
+            max_updated = str(max_updated) if max_updated is not None else None
+
+            if self.built_at is not None and count == self.total and max_updated == self.watermark:
+                return False
+
+            if self.built_at is None or count < self.total or self.watermark is None:
+                self._rebuild(connection)
+            else:
+                self._apply_delta(connection)
+                if self.total != count:
+                    # Inserts and deletes cancelled out; ids no longer line up.
+                    self._rebuild(connection)
+
+            self.version += 1
+            self._report_cache.clear()
+            return True
+
+    def _rebuild(self, connection):
+        """Rebuild every cell from one GROUP BY pass over the bugs table."""
+        self._reset()
+        watermark = None
+
+        for row in connection.execute(CUBE_QUERY):
+            cell = (row.created_day, row.closed_day, row.severity, row.status, row.reporter)
+            self._bump(cell, row.bug_count)
+            for bug_id in str(row.bug_ids).split(','):
+                self.bug_cells[int(bug_id)] = cell
+            last_update = str(row.last_update)
+            if watermark is None or last_update > watermark:
+                watermark = last_update
+
+        self.watermark = watermark
+        self.built_at = datetime.utcnow()
+
+    def _apply_delta(self, connection):
+        """Move bugs updated since the watermark into their new cells."""
+        # ">=" re-reads rows sharing the watermark timestamp; re-applying an
+        # unchanged row is a no-op, so this only guards against missed edits.
+        rows = connection.execute(DELTA_QUERY, {'watermark': self.watermark}).all()
+
+        for row in rows:
+            old_cell = self.bug_cells.get(row.id)
+            if old_cell is not None:
+                self._bump(old_cell, -1)
+
+            new_cell = (row.created_day, row.closed_day, row.severity, row.status, row.reporter)
+            self._bump(new_cell, 1)
+            self.bug_cells[row.id] = new_cell
+
+            updated = str(row.updated_date)
+            if updated > self.watermark:
+                self.watermark = updated
+
+    def report(self, days: int = 30, today: Optional[date] = None) -> dict:
+        """
+        Summarize the snapshot into report sections.
+
+        Args:
+            days: Number of days to include in the inflow/closure series
+            today: Reference date for aging (defaults to the current UTC date)
+
+        Returns:
+            Dictionary with inflow/closure series, aging buckets, severity mix
+            and per-reporter counts
+        """
+        today = today or datetime.utcnow().date()
+        # Under the lock refresh() holds while it changes the rollups
+        with self._lock:
+            cache_key = (self.version, days, today)
+            cached = self._report_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            start = today - timedelta(days=days - 1)
+            series = []
+            for offset in range(days):
+                day = (start + timedelta(days=offset)).isoformat()
+                series.append({
+                    'date': day,
+                    'opened': self.inflow.get(day, 0),
+                    'closed': self.closures.get(day, 0),
+                })
+
+            report = {
+                'generated_at': datetime.utcnow().isoformat(),
+                'snapshot_version': self.version,
+                'total_bugs': self.total,
+                'open_bugs': sum(self.open_by_day.values()),
+                'days': days,
+                'daily': series,
+                'aging': self._aging(self.open_by_day, today),
+                'severity': self._severity_mix(self.severity_mix),
+                'reporters': self._reporter_counts(self.reporters),
+            }
+
+            self._report_cache = {cache_key: report}
+            return report
+
+    @staticmethod
+    def _aging(open_by_day: Counter, today: date) -> List[dict]:
+        """Bucket open bugs by age using the open-bugs-per-created-day counts."""
+        buckets = Counter()
+        for created_day, count in open_by_day.items():
+            if count <= 0:
+                continue
+            age = (today - date.fromisoformat(created_day)).days
+            for label, low, high in AGING_BUCKETS:
+                if age >= low and (high is None or age <= high):
+                    buckets[label] += count
+                    break
+            else:
+                # Created "in the future" (clock skew) counts as brand new.
+                buckets[AGING_BUCKETS[0][0]] += count
+
+        return [{'bucket': label, 'count': buckets.get(label, 0)} for label, _, _ in AGING_BUCKETS]
+
+    @staticmethod
+    def _severity_mix(severity_mix: Dict[str, Counter]) -> List[dict]:
+        """Order severities High -> Low, keeping unknown values at the end."""
+        ordered = SEVERITIES + sorted(s for s in severity_mix if s not in SEVERITIES)
+        rows = []
+        for severity in ordered:
+            counts = severity_mix.get(severity, Counter())
+            rows.append({
+                'severity': severity,
+                'open': counts.get('Open', 0),
+                'closed': counts.get('Closed', 0),
+                'total': sum(counts.values()),
+            })
+        return rows
+
+    @staticmethod
+    def _reporter_counts(reporters: Dict[str, Counter]) -> List[dict]:
+        """Per-reporter totals, busiest reporters first."""
+        rows = [
+            {
+                'reporter': reporter,
+                'open': counts.get('Open', 0),
+                'closed': counts.get('Closed', 0),
+                'total': sum(counts.values()),
+            }
+            for reporter, counts in reporters.items()
+            if sum(counts.values()) > 0
+        ]
+        rows.sort(key=lambda r: (-r['total'], r['reporter']))
+        return rows
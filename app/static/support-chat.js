@@ -6,7 +6,8 @@
 class SupportChat {
     constructor() {
         this.isOpen = false;
-        this.conversationHistory = [];
+        // History lives on the server; the widget only keeps the conversation id
+        this.conversationId = null;
         this.isLoading = false;
 
         this.init();
@@ -121,48 +122,57 @@ class SupportChat {
         // Add user message to UI
         this.addMessage(message, 'user');
 
-        // Add to conversation history
-        this.conversationHistory.push({
-            role: 'user',
-            content: message
-        });
-
         // Show loading indicator
         this.showLoading();
 
         try {
-            // Call backend API
+            // Call backend API; the reply streams back as server-sent events
             const response = await fetch('/api/support/chat', {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json'
+                    'Content-Type': 'application/json',
+                    'Accept': 'text/event-stream'
                 },
                 body: JSON.stringify({
                     message: message,
-                    conversation: this.conversationHistory
+                    conversation_id: this.conversationId,
+                    stream: true
                 })
             });
 
+            // Shed under load: say when to try again instead of a generic error
+            if (response.status === 429) {
+                const retryAfter = response.headers.get('Retry-After') || 'a few';
+                this.hideLoading();
+                this.addMessage(`I'm getting a lot of questions right now. Please try again in ${retryAfter} seconds.`, 'bot');
+                return;
+            }
+
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
 
-            const data = await response.json();
-
-            // Remove loading indicator
-            this.hideLoading();
+            let data;
+            if ((response.headers.get('Content-Type') || '').includes('text/event-stream')) {
+                data = await this.readStreamedReply(response);
+            } else {
+                data = await response.json();
+                this.hideLoading();
+                this.addMessage(data.reply, 'bot');
+            }
+            const reply = data.reply;
 
-            // Add bot response to UI
-            this.addMessage(data.reply, 'bot');
+            if (data.conversation_id) {
+                this.conversationId = data.conversation_id;
+            }
 
-            // Add to conversation history
-            this.conversationHistory.push({
-                role: 'assistant',
-                content: data.reply
-            });
+            // Replies answered locally come with the articles they link
+            if (data.articles) {
+                this.showArticleLinks(data.articles);
+            }
 
             // Check if response contains a proposed article
-            this.checkForProposedArticle(data.reply);
+            this.checkForProposedArticle(reply);
 
         } catch (error) {
             console.error('Error sending message:', error);
@@ -171,6 +181,81 @@ class SupportChat {
         }
     }
 
+    async readStreamedReply(response) {
+        // Parse "event: ...\ndata: {...}\n\n" blocks as they arrive and
+        // render the reply so far; the "done" event carries the full payload
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let reply = '';
+        let result = null;
+        let messageContent = null;
+        let renderPending = false;
+
+        const render = () => {
+            renderPending = false;
+            messageContent.innerHTML = this.formatMarkdown(reply);
+            this.scrollToBottom();
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event:')) {
+                        event = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        data += line.slice(5).trim();
+                    }
+                }
+                if (!data) {
+                    continue;
+                }
+                const payload = JSON.parse(data);
+
+                if (event === 'token') {
+                    if (!messageContent) {
+                        this.hideLoading();
+                        this.addMessage('', 'bot');
+                        messageContent = this.elements.messages.lastElementChild.querySelector('.message-content');
+                    }
+                    reply += payload.text;
+                    // Re-render at most once per frame however fast tokens come
+                    if (!renderPending) {
+                        renderPending = true;
+                        requestAnimationFrame(render);
+                    }
+                } else if (event === 'done') {
+                    result = payload;
+                    reply = payload.reply;
+                } else if (event === 'error') {
+                    // The reply broke off: keep what arrived and say so
+                    reply += `\n\n${payload.error}`;
+                    result = { reply: '', conversation_id: payload.conversation_id };
+                }
+            }
+        }
+
+        if (!messageContent) {
+            this.hideLoading();
+            this.addMessage(reply, 'bot');
+        } else {
+            render();
+        }
+        return result || { reply: reply };
+    }
+
     addMessage(content, type = 'bot') {
         const messageDiv = document.createElement('div');
         messageDiv.className = `chat-message ${type}`;
@@ -263,6 +348,20 @@ class SupportChat {
         }
     }
 
+    showArticleLinks(articles) {
+        const lastMessage = this.elements.messages.lastElementChild;
+        const messageContent = lastMessage.querySelector('.message-content');
+
+        const linksDiv = document.createElement('div');
+        linksDiv.className = 'suggested-articles';
+        linksDiv.innerHTML = articles.map(article =>
+            `<a href="/help-articles#article=${encodeURIComponent(article.path.split('/').pop())}" target="_blank"
+                title="${this.escapeHtml(article.path)}">📄 ${this.escapeHtml(article.title)}</a>`
+        ).join('');
+
+        messageContent.appendChild(linksDiv);
+    }
+
     showSaveArticleOption(topic) {
         const lastMessage = this.elements.messages.lastElementChild;
         const messageContent = lastMessage.querySelector('.message-content');
@@ -294,7 +393,7 @@ class SupportChat {
                 },
                 body: JSON.stringify({
                     topic: topic,
-                    conversation: this.conversationHistory
+                    conversation_id: this.conversationId
                 })
             });
 
@@ -302,9 +401,14 @@ class SupportChat {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
 
-            const data = await response.json();
+            let data = await response.json();
 
-            if (data.success) {
+            // The article is written by a background job; wait for it to finish
+            if (data.job_id) {
+                data = await this.waitForJob(data.status_url);
+            }
+
+            if (data && data.success) {
                 this.addMessage(
                     `✅ Great! I've saved the help article "${data.title}". You can find it at: ${data.article_path}`,
                     'bot'
@@ -319,6 +423,23 @@ class SupportChat {
         }
     }
 
+    async waitForJob(statusUrl, intervalMs = 1000) {
+        while (true) {
+            const response = await fetch(statusUrl);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const job = await response.json();
+            if (job.status === 'done') {
+                return job.result;
+            }
+            if (job.status === 'failed') {
+                return null;
+            }
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    }
+
     formatMarkdown(text) {
         // Simple markdown-like formatting (basic implementation)
         let formatted = this.escapeHtml(text);
@@ -0,0 +1,219 @@
+"""
+Admission control for the support endpoints that call the LLM.
+
+Each worker limits how fast requests come in, with a token bucket per user
+and one shared by everyone. It also caps how many LLM calls are in flight.
+When every slot is busy a request waits in a bounded queue. Requests
+waiting for an identical request's reply are bounded separately, so they
+never take the queue places the request computing that reply needs.
+A full queue, or a wait that runs out, sheds the request with 429 and a
+Retry-After.
+Keeping slots, queue and waiters below the worker's thread count leaves threads
+free for the bug tracker's own pages however busy the chat is.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from .metrics import metrics
+
+
+# Idle per-user buckets are dropped after this long (they are full again by then)
+IDLE_BUCKET_SECONDS = 600
+
+
+class Overloaded(Exception):
+    """
+    A request was shed.
+
+    Args:
+        reason: 'user_rate', 'global_rate', 'queue_full' or 'queue_timeout'
+        retry_after: Seconds the client should wait before retrying
+    """
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Allows ``rate`` requests per second on average, in bursts of up to ``burst``.
+
+    Not thread-safe on its own; AdmissionController holds its lock.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _fill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._fill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class AdmissionController:
+    """
+    Rate limits and a concurrency cap with a bounded wait queue.
+
+    Args:
+        user_rate: Requests per second per user (0 disables the per-user limit)
+        user_burst: Requests a user may make at once
+        global_rate: Requests per second across all users (0 disables)
+        global_burst: Requests all users together may make at once
+        max_concurrent: LLM calls in flight at once (0 disables the cap)
+        max_queue: Requests that may wait for a slot
+        queue_timeout: Longest a request waits for a slot
+        max_waiters: Requests that may wait for another request's reply
+    """
+
+    def __init__(self, user_rate: float = 0.5, user_burst: float = 5, global_rate: float = 0,
+                 global_burst: float = 20, max_concurrent: int = 4, max_queue: int = 8,
+                 queue_timeout: float = 10, max_waiters: int = 8):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_waiters = max_waiters
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._users: Dict[str, TokenBucket] = {}
+        self._global = TokenBucket(global_rate, global_burst) if global_rate > 0 else None
+        self._last_sweep = time.monotonic()
+        self.in_flight = 0
+        self.queued = 0
+        self.waiters = 0
+
+    def check_rate(self, user_key: str):
+        """
+        Spend a token from the user's bucket and the global one.
+
+        Raises:
+            Overloaded: Either bucket is empty; neither is charged
+        """
+        now = time.monotonic()
+        with self._lock:
+            buckets = []
+            if self.user_rate > 0:
+                bucket = self._users.get(user_key)
+                if bucket is None:
+                    bucket = self._users[user_key] = TokenBucket(self.user_rate, self.user_burst)
+                buckets.append(('user_rate', bucket))
+            if self._global is not None:
+                buckets.append(('global_rate', self._global))
+            for reason, bucket in buckets:
+                wait = bucket.wait_time(now)
+                if wait > 0:
+                    self._shed(reason)
+                    raise Overloaded(reason, wait)
+            for _, bucket in buckets:
+                bucket.take()
+            if now - self._last_sweep > IDLE_BUCKET_SECONDS:
+                self._sweep(now)
+
+    def acquire(self):
+        """
+        Take one of the ``max_concurrent`` LLM slots, waiting in the queue if
+        needed; every successful call must be paired with ``release()``.
+
+        Raises:
+            Overloaded: The queue is full, or no slot freed up in time
+        """
+        if self.max_concurrent <= 0:
+            return
+        with self._lock:
+            if self.in_flight >= self.max_concurrent:
+                if self.queued >= self.max_queue:
+                    self._shed('queue_full')
+                    raise Overloaded('queue_full', self._retry_after())
+                self._wait_for_slot()
+            self.in_flight += 1
+            metrics.incr('admission.in_flight')
+
+    def release(self):
+        """Give a slot back and wake the next queued request."""
+        if self.max_concurrent <= 0:
+            return
+        with self._lock:
+            self.in_flight -= 1
+            metrics.incr('admission.in_flight', -1)
+            self._slot_freed.notify()
+
+    @contextmanager
+    def waiting(self):
+        """
+        Hold one of the ``max_waiters`` places while waiting on something
+        other than a slot (another request computing the same reply). These
+        places are separate from the slot queue, so waiters can never crowd
+        out the request they are waiting for.
+
+        Raises:
+            Overloaded: Every waiter place is taken
+        """
+        if self.max_concurrent <= 0:
+            yield
+            return
+        with self._lock:
+            if self.waiters >= self.max_waiters:
+                self._shed('queue_full')
+                raise Overloaded('queue_full', self._retry_after())
+            self.waiters += 1
+            metrics.incr('admission.waiters')
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.waiters -= 1
+                metrics.incr('admission.waiters', -1)
+
+    def _wait_for_slot(self):
+        """Wait in the queue (lock held) until a slot is free or the wait times out."""
+        started = time.monotonic()
+        give_up = started + self.queue_timeout
+        self.queued += 1
+        metrics.incr('admission.queue_depth')
+        metrics.observe('admission.queue_depth_seen', self.queued)
+        try:
+            while self.in_flight >= self.max_concurrent:
+                remaining = give_up - time.monotonic()
+                if remaining <= 0:
+                    self._shed('queue_timeout')
+                    raise Overloaded('queue_timeout', self._retry_after())
+                self._slot_freed.wait(remaining)
+        finally:
+            self.queued -= 1
+            metrics.incr('admission.queue_depth', -1)
+            metrics.observe('admission.queue_wait_ms', (time.monotonic() - started) * 1000)
+
+    def _retry_after(self) -> float:
+        """A guess at when a slot will be free: one queue timeout per full queue ahead."""
+        return max(1.0, self.queue_timeout * (self.queued + 1) / max(1, self.max_queue))
+
+    def _shed(self, reason: str):
+        metrics.incr('admission.shed')
+        metrics.incr(f'admission.shed.{reason}')
+
+    def _sweep(self, now: float):
+        for key in [k for k, b in self._users.items() if now - b.updated > IDLE_BUCKET_SECONDS]:
+            del self._users[key]
+        self._last_sweep = now
+
+
+def retry_after_header(seconds: float) -> str:
+    """Retry-After value: whole seconds, rounded up."""
+    return str(max(1, math.ceil(seconds)))
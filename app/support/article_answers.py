@@ -0,0 +1,149 @@
+"""
+Retrieval-first answers straight from the help articles.
+
+When one section of a help article clearly covers a question, the section
+itself (plus the next one from the same article if it scores nearly as
+well) is returned with a link to the article, and the LLM is skipped.
+"Clearly covers" is measured as confidence: the IDF-weighted share of the
+question's terms found in the section's heading, averaged with the share
+found in its text. The article title is left out; it names the whole
+article, so it would lift every section of it alike. Terms no document
+contains count against it at full weight, so questions about things the
+docs never mention fall through to the LLM. A section must also mention
+every action the question asks about (create, delete, edit...), so
+"How do I delete a bug report?" is not answered from an article about
+creating them.
+"""
+
+import re
+from typing import List, Optional
+
+from .metrics import metrics
+from .question_index import ACTION_TERMS
+from .retrieval import canonical_tokens, get_bm25_index, tokenize
+from .tokens import estimate_tokens
+
+
+# Longest extractive answer
+MAX_ANSWER_TOKENS = 350
+
+# Sections shorter than this are headings or separators, not answers
+MIN_SECTION_TOKENS = 15
+
+# A second section from the same article is added when it scores this close to the first
+FOLLOW_ON_RATIO = 0.8
+
+HEADING_LINE_RE = re.compile(r'^#{1,6}\s+(.+?)\s*#*\s*$')
+RULE_RE = re.compile(r'^\s*(-{3,}|\*{3,}|_{3,})\s*$')
+GENERATED_RE = re.compile(r'^_Generated on .*_$')
+
+
+def article_title(document: dict) -> str:
+    """The article's top-level heading, or a title made from its file name."""
+    for section in document['sections']:
+        if section['level'] == 1 and section['heading']:
+            return section['heading']
+    stem = document['path'].rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    return stem.replace('-', ' ').replace('_', ' ').title()
+
+
+def coverage(bm25, query_terms: List[str], text: str) -> float:
+    """IDF-weighted share of ``query_terms`` found in ``text``."""
+    text_terms = set(tokenize(text))
+    max_idf = max(bm25.idf.values(), default=1.0)
+    total = found = 0.0
+    for term in query_terms:
+        weight = bm25.idf.get(term, max_idf)
+        total += weight
+        if term in text_terms:
+            found += weight
+    return found / total if total else 0.0
+
+
+def format_section(text: str) -> str:
+    """Section markdown as a chat reply: headings in bold, rules and stamps dropped."""
+    lines = []
+    for line in text.strip().splitlines():
+        heading = HEADING_LINE_RE.match(line)
+        if heading:
+            lines.append(f"**{heading.group(1)}**")
+        elif not RULE_RE.match(line) and not GENERATED_RE.match(line.strip()):
+            lines.append(line.rstrip())
+    return '\n'.join(lines).strip()
+
+
+def trim_to_budget(text: str, max_tokens: int) -> str:
+    """Cut ``text`` at a line boundary so it fits ``max_tokens``."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    for line in text.splitlines():
+        if estimate_tokens('\n'.join(kept + [line])) > max_tokens:
+            break
+        kept.append(line)
+    return '\n'.join(kept).rstrip() + '\n…'
+
+
+def answer_from_articles(document_index, question: str, threshold: float,
+                         max_tokens: int = MAX_ANSWER_TOKENS) -> Optional[dict]:
+    """
+    Extractive answer for ``question`` from the help articles.
+
+    Args:
+        document_index: The DocumentIndex to search
+        question: The user's question
+        threshold: Minimum confidence (0-1) in the best section
+        max_tokens: Longest answer
+
+    Returns:
+        Dict with 'reply', 'articles' ([{'title', 'path'}]), 'confidence' and
+        'heading', or None when no section covers the question well enough
+    """
+    bm25 = get_bm25_index(document_index)
+    query_terms = list(dict.fromkeys(tokenize(question)))
+    if not query_terms:
+        metrics.incr('article_answers.misses')
+        return None
+    actions = set(canonical_tokens(question)) & ACTION_TERMS
+
+    # Confidence: how well the section's heading and its text each cover the
+    # question; article intros are summaries, not answers
+    candidates = []
+    for score, unit_id in bm25.score(question, bm25.units_of_kinds({'help'})):
+        unit = bm25.units[unit_id]
+        section = unit['document']['sections'][unit['section_pos']]
+        if section['level'] <= 1 or unit['tokens'] < MIN_SECTION_TOKENS:
+            continue
+        if not actions <= set(canonical_tokens(unit['text'])):
+            continue
+        heading_coverage = coverage(bm25, query_terms, section['heading'])
+        confidence = (heading_coverage + coverage(bm25, query_terms, unit['text'])) / 2
+        # Ties go to BM25
+        candidates.append((confidence, score, unit))
+    if not candidates:
+        metrics.incr('article_answers.misses')
+        return None
+
+    candidates.sort(key=lambda c: c[:2], reverse=True)
+    best_confidence, best_score, best = candidates[0]
+    metrics.observe('article_answers.confidence', best_confidence)
+    if best_confidence < threshold:
+        metrics.incr('article_answers.misses')
+        return None
+
+    sections = [best]
+    for confidence, score, unit in candidates[1:3]:
+        if unit['path'] == best['path'] and confidence >= best_confidence * FOLLOW_ON_RATIO \
+                and score >= best_score * FOLLOW_ON_RATIO:
+            sections.append(unit)
+    sections.sort(key=lambda unit: unit['section_pos'])
+
+    title = article_title(best['document'])
+    body = trim_to_budget('\n\n'.join(format_section(unit['text']) for unit in sections), max_tokens)
+    metrics.incr('article_answers.hits')
+    return {
+        'reply': f"{body}\n\nSee: '{title}' for more details.",
+        'articles': [{'title': title, 'path': best['path']}],
+        'confidence': best_confidence,
+        'heading': best['document']['sections'][best['section_pos']]['heading'],
+    }
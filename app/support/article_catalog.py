@@ -0,0 +1,139 @@
+"""
+In-memory catalog of the help articles for the help-articles page.
+
+Built from the document index, which already holds every article's
+sections, mtime and size and is kept fresh by its watcher (and by
+generate-article, which refreshes it after writing). Listing articles
+therefore never touches the disk. Entries are rebuilt only for articles
+whose content hash changed, and each sort order is computed once per
+index change, so a page is a slice of a ready-made list.
+"""
+
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .article_answers import article_title
+
+
+# Longest summary shown under an article's title
+SUMMARY_CHARS = 160
+
+# Sort keys accepted by page(), with their default direction
+SORTS = {
+    'created': True,
+    'title': False,
+    'size': True,
+}
+
+SKIP_LINE_RE = re.compile(r'^(#{1,6}\s|_Generated on .*_$|\s*(-{3,}|\*{3,}|_{3,})\s*$)')
+
+
+def summarize(document: dict) -> str:
+    """The article's first paragraph of prose, cut to SUMMARY_CHARS at a word."""
+    for section in document['sections']:
+        paragraph = []
+        for line in section['text'].splitlines():
+            stripped = line.strip()
+            if SKIP_LINE_RE.match(stripped):
+                continue
+            if not stripped:
+                if paragraph:
+                    break
+                continue
+            paragraph.append(stripped.lstrip('-*> ').strip())
+        text = ' '.join(part for part in paragraph if part)
+        if text:
+            if len(text) > SUMMARY_CHARS:
+                text = text[:SUMMARY_CHARS].rsplit(' ', 1)[0].rstrip(',.;:') + '…'
+            return text
+    return ''
+
+
+class ArticleCatalog:
+    """Title, path, mtime, size and summary of each help article, with cached sort orders."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = None
+        self._entries: Dict[str, dict] = {}
+        self._sorted: Dict[tuple, List[dict]] = {}
+
+    def articles(self, document_index) -> List[dict]:
+        """Every article, in index order; rebuilt only when the index changed."""
+        documents = document_index.documents()
+        if documents is self._documents:
+            return list(self._entries.values())
+
+        with self._lock:
+            if documents is not self._documents:
+                entries = {}
+                for document in documents:
+                    if document['kind'] != 'help':
+                        continue
+                    old = self._entries.get(document['path'])
+                    if old is not None and old['hash'] == document['hash']:
+                        entries[document['path']] = dict(old, mtime=document['mtime'], size=document['size'],
+                                                         created=datetime.fromtimestamp(document['mtime']).isoformat())
+                        continue
+                    entries[document['path']] = {
+                        'title': article_title(document),
+                        'path': document['path'],
+                        'created': datetime.fromtimestamp(document['mtime']).isoformat(),
+                        'mtime': document['mtime'],
+                        'size': document['size'],
+                        'summary': summarize(document),
+                        'hash': document['hash'],
+                    }
+                self._entries = entries
+                self._sorted = {}
+                self._documents = documents
+            return list(self._entries.values())
+
+    def page(self, document_index, sort: str = 'created', descending: Optional[bool] = None,
+             page: int = 1, per_page: int = 20, query: str = '') -> dict:
+        """
+        One page of the catalog.
+
+        Args:
+            document_index: The DocumentIndex the articles come from
+            sort: One of SORTS
+            descending: Sort direction; None uses the sort's default
+            page: 1-based page number
+            per_page: Articles per page
+            query: Only articles whose title or summary contains this (case-insensitive)
+
+        Returns:
+            Dict with 'articles', 'total', 'page', 'per_page' and 'pages'
+        """
+        if descending is None:
+            descending = SORTS[sort]
+        self.articles(document_index)
+        with self._lock:
+            key = (sort, descending)
+            ordered = self._sorted.get(key)
+            if ordered is None:
+                field = {'created': 'mtime'}.get(sort, sort)
+                ordered = sorted(
+                    self._entries.values(),
+                    key=lambda entry: entry[field].lower() if field == 'title' else entry[field],
+                    reverse=descending
+                )
+                self._sorted[key] = ordered
+
+        if query:
+            needle = query.lower()
+            ordered = [entry for entry in ordered
+                       if needle in entry['title'].lower() or needle in entry['summary'].lower()]
+
+        total = len(ordered)
+        start = (page - 1) * per_page
+        return {
+            'articles': [{field: entry[field] for field in ('title', 'path', 'created', 'size', 'summary')}
+                         for entry in ordered[start:start + per_page]],
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'pages': (total + per_page - 1) // per_page,
+        }
@@ -0,0 +1,267 @@
+"""
+Server-side rendering of help articles to sanitized HTML.
+
+Articles are rendered once per content version and kept in memory and on
+disk, keyed by the hash of their markdown, so the help page shows them
+without parsing anything in the browser. The renderer handles the
+markdown the articles use (headings, paragraphs, nested lists, tables,
+block quotes, code, emphasis and links). It is safe by construction: all
+text is escaped, only a fixed set of tags is ever emitted, and links are
+kept only for http(s), mailto and relative URLs.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from html import escape
+from typing import List, Optional, Tuple
+
+
+# Bump when the rendered output changes, so stale cached HTML is not served
+RENDER_VERSION = 2
+
+# Rendered articles kept in memory
+MEMORY_ENTRIES = 256
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+RULE_RE = re.compile(r'^\s*(-{3,}|\*{3,}|_{3,})\s*$')
+FENCE_RE = re.compile(r'^\s*(```|~~~)')
+LIST_RE = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+TABLE_SEPARATOR_RE = re.compile(r'^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$')
+
+CODE_SPAN_RE = re.compile(r'`([^`]+)`')
+# Targets may contain balanced parentheses, so the whole of
+# "javascript:alert(1)" is the URL (and rejected)
+LINK_RE = re.compile(r'\[([^\]]+)\]\(((?:[^()\s]|\([^()\s]*\))+)\)')
+PLACEHOLDER_RE = re.compile('\x00(\\d+)\x00')
+BOLD_RE = re.compile(r'(\*\*|__)(?=\S)(.+?)(?<=\S)\1')
+ITALIC_RE = re.compile(r'(?<![\w*])([*_])(?=\S)(.+?)(?<=\S)\1(?![\w*])')
+SCHEME_RE = re.compile(r'^([a-zA-Z][a-zA-Z0-9+.-]*):')
+SAFE_SCHEMES = {'http', 'https', 'mailto'}
+
+
+def safe_url(url: str) -> bool:
+    """Whether a link target is relative or uses a safe scheme."""
+    if any(ord(c) < 32 for c in url):
+        return False
+    scheme = SCHEME_RE.match(url)
+    return scheme is None or scheme.group(1).lower() in SAFE_SCHEMES
+
+
+def render_inline(text: str) -> str:
+    """Escape ``text`` and apply code spans, links, bold and italics."""
+    placeholders = []
+
+    def hold(html):
+        placeholders.append(html)
+        return f'\x00{len(placeholders) - 1}\x00'
+
+    def link(match):
+        # The label keeps any placeholders already taken from it; they are
+        # resolved with the rest at the end
+        label, url = inline(match.group(1)), match.group(2)
+        if not safe_url(url):
+            return hold(label)
+        return hold(f'<a href="{escape(url)}" rel="noopener noreferrer">{label}</a>')
+
+    def inline(text):
+        text = LINK_RE.sub(link, text)
+        text = escape(text, quote=False)
+        text = BOLD_RE.sub(r'<strong>\2</strong>', text)
+        return ITALIC_RE.sub(r'<em>\2</em>', text)
+
+    def resolve(match):
+        return PLACEHOLDER_RE.sub(resolve, placeholders[int(match.group(1))])
+
+    text = CODE_SPAN_RE.sub(lambda m: hold(f'<code>{escape(m.group(1))}</code>'), text)
+    return PLACEHOLDER_RE.sub(resolve, inline(text))
+
+
+def _split_row(line: str) -> List[str]:
+    return [cell.strip() for cell in line.strip().strip('|').split('|')]
+
+
+def _render_list(lines: List[str]) -> str:
+    """Render consecutive list lines, nesting by indentation."""
+    html = []
+    stack: List[Tuple[int, str]] = []  # (indent, tag)
+    for line in lines:
+        match = LIST_RE.match(line)
+        if match is None:
+            # Continuation of the previous item
+            html[-1] = html[-1][:-len('</li>')] + ' ' + render_inline(line.strip()) + '</li>'
+            continue
+        indent = len(match.group(1).expandtabs(4))
+        tag = 'ol' if match.group(2)[0].isdigit() else 'ul'
+        while stack and indent < stack[-1][0]:
+            html.append(f'</{stack.pop()[1]}></li>')
+        if stack and indent == stack[-1][0] and tag != stack[-1][1]:
+            html.append(f'</{stack.pop()[1]}>')
+        if not stack or indent > stack[-1][0]:
+            if stack:
+                # Reopen the previous item to hold the nested list
+                html[-1] = html[-1][:-len('</li>')]
+            html.append(f'<{tag}>')
+            stack.append((indent, tag))
+        html.append(f'<li>{render_inline(match.group(3))}</li>')
+    while stack:
+        html.append(f'</{stack.pop()[1]}>' + ('</li>' if stack else ''))
+    return ''.join(html)
+
+
+def render_markdown(text: str) -> str:
+    """Render article markdown to sanitized HTML."""
+    lines = text.replace('\x00', '').replace('\r\n', '\n').split('\n')
+    html = []
+    paragraph = []
+
+    def flush():
+        if paragraph:
+            html.append(f"<p>{'<br>'.join(render_inline(line) for line in paragraph)}</p>")
+            paragraph.clear()
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        if FENCE_RE.match(line):
+            flush()
+            fence = FENCE_RE.match(line).group(1)
+            code = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith(fence):
+                code.append(lines[i])
+                i += 1
+            html.append(f"<pre><code>{escape(chr(10).join(code))}</code></pre>")
+            i += 1
+            continue
+
+        if not stripped:
+            flush()
+        elif HEADING_RE.match(line):
+            flush()
+            level, heading = HEADING_RE.match(line).groups()
+            html.append(f'<h{len(level)}>{render_inline(heading)}</h{len(level)}>')
+        elif RULE_RE.match(line):
+            flush()
+            html.append('<hr>')
+        elif stripped.startswith('>'):
+            flush()
+            quoted = []
+            while i < len(lines) and lines[i].strip().startswith('>'):
+                quoted.append(lines[i].strip()[1:].lstrip())
+                i += 1
+            html.append(f"<blockquote>{render_markdown(chr(10).join(quoted))}</blockquote>")
+            continue
+        elif stripped.startswith('|') and i + 1 < len(lines) and TABLE_SEPARATOR_RE.match(lines[i + 1]):
+            flush()
+            header = ''.join(f'<th>{render_inline(cell)}</th>' for cell in _split_row(line))
+            rows = []
+            i += 2
+            while i < len(lines) and lines[i].strip().startswith('|'):
+                rows.append(''.join(f'<td>{render_inline(cell)}</td>' for cell in _split_row(lines[i])))
+                i += 1
+            body = ''.join(f'<tr>{row}</tr>' for row in rows)
+            html.append(f'<table><thead><tr>{header}</tr></thead><tbody>{body}</tbody></table>')
+            continue
+        elif LIST_RE.match(line):
+            flush()
+            items = []
+            while i < len(lines) and (LIST_RE.match(lines[i]) or (
+                    lines[i].strip() and lines[i][:1].isspace() and items)):
+                items.append(lines[i])
+                i += 1
+            html.append(_render_list(items))
+            continue
+        else:
+            paragraph.append(stripped)
+        i += 1
+
+    flush()
+    return '\n'.join(html)
+
+
+class ArticleRenderer:
+    """
+    Rendered HTML for article files, cached by content hash.
+
+    Args:
+        cache_dir: Directory for rendered HTML shared by every worker; None
+            keeps it in memory only
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        # path -> (mtime_ns, size, digest), so unchanged files are not re-read
+        self._stats = {}
+        # digest -> {'content', 'html'}
+        self._rendered: OrderedDict = OrderedDict()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def etag(self, path: str) -> Optional[str]:
+        """The file's version tag if it hasn't changed since it was rendered, else None."""
+        stat = os.stat(path)
+        known = self._stats.get(path)
+        if known and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            return known[2]
+        return None
+
+    def render(self, path: str) -> Tuple[str, str, str]:
+        """
+        Markdown and rendered HTML for an article file.
+
+        Returns:
+            (etag, markdown, html)
+        """
+        stat = os.stat(path)
+        known = self._stats.get(path)
+        if known and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            with self._lock:
+                entry = self._rendered.get(known[2])
+                if entry is not None:
+                    self._rendered.move_to_end(known[2])
+                    return known[2], entry['content'], entry['html']
+
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = f"{RENDER_VERSION}-{hashlib.sha256(raw).hexdigest()[:32]}"
+        content = raw.decode('utf-8')
+
+        html = self._read_cached(digest)
+        if html is None:
+            html = render_markdown(content)
+            self._write_cached(digest, html)
+
+        with self._lock:
+            self._stats[path] = (stat.st_mtime_ns, stat.st_size, digest)
+            self._rendered[digest] = {'content': content, 'html': html}
+            self._rendered.move_to_end(digest)
+            while len(self._rendered) > MEMORY_ENTRIES:
+                self._rendered.popitem(last=False)
+        return digest, content, html
+
+    def _read_cached(self, digest: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(os.path.join(self.cache_dir, f'{digest}.html'), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_cached(self, digest: str, html: str):
+        if not self.cache_dir:
+            return
+        path = os.path.join(self.cache_dir, f'{digest}.html')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error caching rendered article {path}: {e}")
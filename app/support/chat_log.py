@@ -0,0 +1,290 @@
+"""
+Structured per-request analytics for the support chat.
+
+Every chat request is recorded with:
+- how it was answered (LLM, reply cache, similar question, help article,
+  local redirect, shed or error)
+- a hash of the question and the sections retrieved for it
+- the size of the context, and the near-duplicate text left out of it
+- its token counts
+- time to first token and total latency
+- whether the reply proposed a help article
+
+Requests never wait on the database. ``log()`` puts the row on a bounded
+in-memory queue, and a writer thread inserts the rows in batches, one
+transaction per batch. If the queue is full, rows are dropped and counted
+rather than slowing chat down. ``summary()`` reports p50/p95 latencies,
+cache hit rates and the most frequent questions. The
+``flask --app app chat-stats`` command prints it.
+"""
+
+import atexit
+import hashlib
+import json
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from .metrics import metrics
+from .response_cache import normalize_prompt
+
+
+# How a request was answered; the first four served a stored or local reply
+OUTCOMES = ('cache', 'similar', 'coalesced', 'article', 'redirect', 'llm', 'error', 'shed')
+CACHE_OUTCOMES = ('cache', 'similar', 'coalesced')
+
+# Longest question text kept next to its hash, for reading the top-questions list
+QUESTION_CHARS = 200
+
+# Rows older than this are deleted by the writer now and then
+RETENTION_SECONDS = 90 * 24 * 3600
+PRUNE_EVERY = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    user_id INTEGER,
+    conversation_id TEXT,
+    question_hash TEXT NOT NULL,
+    question TEXT NOT NULL,
+    follow_up INTEGER NOT NULL DEFAULT 0,
+    outcome TEXT NOT NULL,
+    cache_hit INTEGER NOT NULL DEFAULT 0,
+    streamed INTEGER NOT NULL DEFAULT 0,
+    sections TEXT NOT NULL DEFAULT '[]',
+    context_chars INTEGER NOT NULL DEFAULT 0,
+    context_tokens INTEGER NOT NULL DEFAULT 0,
+    duplicate_tokens INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    first_token_ms REAL,
+    total_ms REAL,
+    article_proposed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_chat_requests_created ON chat_requests (created);
+CREATE INDEX IF NOT EXISTS ix_chat_requests_question ON chat_requests (question_hash, created);
+"""
+
+# Columns added since the table was first created: name -> definition
+ADDED_COLUMNS = {
+    'duplicate_tokens': 'INTEGER NOT NULL DEFAULT 0',
+}
+
+COLUMNS = ('created', 'user_id', 'conversation_id', 'question_hash', 'question', 'follow_up', 'outcome',
+           'cache_hit', 'streamed', 'sections', 'context_chars', 'context_tokens', 'duplicate_tokens',
+           'prompt_tokens', 'completion_tokens', 'first_token_ms', 'total_ms', 'article_proposed')
+
+
+def question_hash(question: str) -> str:
+    """Hash of the normalized question, so rewordings in case and spacing group together."""
+    return hashlib.sha256(normalize_prompt(question).encode('utf-8')).hexdigest()[:16]
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of ``values`` (None when there are none)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class ChatLog:
+    """
+    Asynchronous, batched SQLite log of chat requests, shared by every worker.
+
+    Args:
+        path: SQLite file
+        batch_size: Most rows written in one transaction
+        flush_interval: Longest a logged row waits before it is written
+        max_queue: Rows held in memory before new ones are dropped
+    """
+
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._batches = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            existing = {row['name'] for row in conn.execute('PRAGMA table_info(chat_requests)')}
+            for name, definition in ADDED_COLUMNS.items():
+                if name not in existing:
+                    conn.execute(f'ALTER TABLE chat_requests ADD COLUMN {name} {definition}')
+        self._writer = threading.Thread(target=self._write_loop, name='support-chat-log', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection, committing on success."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def log(self, question: str, outcome: str, sections: Optional[List[str]] = None,
+            context: str = '', context_tokens: int = 0, duplicate_tokens: int = 0,
+            api_usage: Optional[Dict[str, int]] = None,
+            first_token_ms: Optional[float] = None, total_ms: Optional[float] = None,
+            user_id: Optional[int] = None, conversation_id: Optional[str] = None,
+            follow_up: bool = False, streamed: bool = False, article_proposed: bool = False):
+        """
+        Queue one request for writing; never blocks.
+
+        Args:
+            question: The user's message
+            outcome: One of ``OUTCOMES``
+            sections: Labels of the sections retrieved into the context
+            context: Documentation context sent to the LLM
+            context_tokens: Estimated tokens of ``context``
+            duplicate_tokens: Tokens of near-duplicate text left out of ``context``
+            api_usage: {'prompt_tokens', 'completion_tokens'} from the API
+            first_token_ms: Request start to the first reply text being sent
+            total_ms: Request start to the reply being complete
+            user_id: Logged-in user, if any
+            conversation_id: Server-side conversation, if any
+            follow_up: Whether earlier messages were sent with it
+            streamed: Whether the reply was streamed
+            article_proposed: Whether the reply proposed a help article
+        """
+        api_usage = api_usage or {}
+        row = (
+            time.time(), user_id, conversation_id, question_hash(question), question[:QUESTION_CHARS],
+            int(follow_up), outcome, int(outcome in CACHE_OUTCOMES), int(streamed), json.dumps(sections or []),
+            len(context), context_tokens, duplicate_tokens, api_usage.get('prompt_tokens'),
+            api_usage.get('completion_tokens'), first_token_ms, total_ms, int(article_proposed)
+        )
+        metrics.incr(f'chat_log.{outcome}')
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            metrics.incr('chat_log.dropped')
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every row logged so far is written; False if that took too long."""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self):
+        """Write what is queued and stop the writer."""
+        if self._writer.is_alive():
+            try:
+                self._queue.put(None, timeout=5)
+            except queue.Full:
+                return
+            self._writer.join(timeout=5)
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stopping or waiters or len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch: List[tuple]):
+        started = time.perf_counter()
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    f"INSERT INTO chat_requests ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    batch
+                )
+                self._batches += 1
+                if self._batches % PRUNE_EVERY == 0:
+                    conn.execute('DELETE FROM chat_requests WHERE created < ?', (time.time() - RETENTION_SECONDS,))
+        except sqlite3.Error as e:
+            print(f"Error writing chat analytics: {e}")
+            metrics.incr('chat_log.dropped', len(batch))
+            return
+        metrics.incr('chat_log.written', len(batch))
+        metrics.observe('chat_log.batch_size', len(batch))
+        metrics.observe('chat_log.write_ms', (time.perf_counter() - started) * 1000)
+
+    def summary(self, since: float = 0, top: int = 10) -> dict:
+        """
+        Aggregate the requests logged since ``since``.
+
+        Returns:
+            Dict with 'requests', 'outcomes' (count per outcome), 'cache_hit_rate',
+            'article_proposed_rate', 'p50'/'p95' of first_token_ms, total_ms,
+            context_chars, context_tokens and duplicate_tokens (LLM-answered
+            requests only for the context figures), and 'top_questions': the most asked, with
+            count, cache hit rate, p95 total_ms and one sample wording
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT outcome, cache_hit, first_token_ms, total_ms, context_chars, context_tokens, '
+                'duplicate_tokens, article_proposed FROM chat_requests WHERE created >= ?', (since,)
+            ).fetchall()
+            questions = conn.execute(
+                'SELECT question_hash, COUNT(*) AS requests, AVG(cache_hit) AS cache_hit_rate, '
+                'MIN(question) AS question FROM chat_requests WHERE created >= ? AND follow_up = 0 '
+                'GROUP BY question_hash ORDER BY requests DESC, MAX(created) DESC LIMIT ?', (since, top)
+            ).fetchall()
+            latencies = {}
+            for question in questions:
+                latencies[question['question_hash']] = [r[0] for r in conn.execute(
+                    'SELECT total_ms FROM chat_requests WHERE question_hash = ? AND created >= ? '
+                    'AND total_ms IS NOT NULL', (question['question_hash'], since)
+                )]
+
+        outcomes = {}
+        for row in rows:
+            outcomes[row['outcome']] = outcomes.get(row['outcome'], 0) + 1
+        llm_rows = [row for row in rows if row['outcome'] in ('llm', 'error')]
+        columns = {
+            'first_token_ms': [row['first_token_ms'] for row in rows if row['first_token_ms'] is not None],
+            'total_ms': [row['total_ms'] for row in rows if row['total_ms'] is not None],
+            'context_chars': [row['context_chars'] for row in llm_rows],
+            'context_tokens': [row['context_tokens'] for row in llm_rows],
+            'duplicate_tokens': [row['duplicate_tokens'] for row in llm_rows],
+        }
+        count = len(rows)
+        return {
+            'requests': count,
+            'outcomes': outcomes,
+            'cache_hit_rate': sum(row['cache_hit'] for row in rows) / count if count else 0.0,
+            'article_proposed_rate': sum(row['article_proposed'] for row in rows) / count if count else 0.0,
+            'p50': {name: percentile(values, 0.5) for name, values in columns.items()},
+            'p95': {name: percentile(values, 0.95) for name, values in columns.items()},
+            'top_questions': [
+                dict(question, p95_total_ms=percentile(latencies[question['question_hash']], 0.95))
+                for question in questions
+            ],
+        }
@@ -0,0 +1,356 @@
+"""
+Compact summaries of the app's Python modules for the assistant's context.
+
+Raw source spends most of the budget on template arguments, imports and
+boilerplate. Instead each key module is parsed with ``ast`` and reduced to
+the facts users ask about:
+- routes: path, methods and inputs
+- the checks a route makes (login, permissions, validation) and the message
+  each one shows
+- what a route renders or redirects to
+- models with their fields and constraints
+- settings and CLI commands
+
+Every route, model and group gets its own section, so retrieval picks
+only the relevant ones. Summaries are cached by the hash of the file's
+contents (and the document index persists them), so a module is only
+parsed again when it changes.
+"""
+
+import ast
+import io
+import tokenize
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .tokens import estimate_tokens
+
+
+# Summaries kept in memory, keyed by file hash
+CACHE_ENTRIES = 64
+
+# Flash categories that report success rather than a failed check
+SUCCESS_CATEGORIES = {'success', 'info'}
+
+# Longest default value shown for a setting
+MAX_DEFAULT_CHARS = 40
+
+_cache: 'OrderedDict[str, List[dict]]' = OrderedDict()
+
+
+def _name(node: ast.AST) -> str:
+    """Dotted name of a Name/Attribute chain ('request.form.get'), else ''."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return '.'.join(reversed(parts))
+    if isinstance(node, ast.Call):
+        parts.append(_name(node.func) + '()')
+        return '.'.join(reversed(parts))
+    return ''
+
+
+def _string(node: Optional[ast.AST]) -> Optional[str]:
+    return node.value if isinstance(node, ast.Constant) and isinstance(node.value, str) else None
+
+
+def _keyword(call: ast.Call, name: str) -> Optional[ast.AST]:
+    for keyword in call.keywords:
+        if keyword.arg == name:
+            return keyword.value
+    return None
+
+
+def _first_line(node: ast.AST) -> str:
+    docstring = ast.get_docstring(node) if isinstance(node, (ast.FunctionDef, ast.ClassDef)) else None
+    return docstring.strip().splitlines()[0] if docstring else ''
+
+
+def _comments(source: str) -> Dict[int, str]:
+    """Trailing comments by line number (ast drops them)."""
+    comments = {}
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(source).readline):
+            if token.type == tokenize.COMMENT:
+                comments[token.start[0]] = token.string.lstrip('#').strip()
+    except (tokenize.TokenError, IndentationError):
+        pass
+    return comments
+
+
+def _calls(nodes: List[ast.stmt]):
+    """Calls in ``nodes``, not descending into nested ifs (they are checks of their own)."""
+    pending = list(nodes)
+    while pending:
+        node = pending.pop(0)
+        if isinstance(node, ast.If):
+            continue
+        if isinstance(node, ast.Call):
+            yield node
+        pending.extend(ast.iter_child_nodes(node))
+
+
+def _outcome(body: List[ast.stmt]) -> Optional[str]:
+    """The user-facing message of a check's body, with its status or redirect."""
+    message = None
+    result = []
+    for call in _calls(body):
+        name = _name(call.func)
+        if name == 'flash' and call.args:
+            category = _string(call.args[1]) if len(call.args) > 1 else None
+            if category not in SUCCESS_CATEGORIES:
+                message = message or _string(call.args[0])
+        elif name.endswith('errors.append') and call.args:
+            message = message or _string(call.args[0])
+        elif name == 'jsonify' and call.args and isinstance(call.args[0], ast.Dict):
+            for key, value in zip(call.args[0].keys, call.args[0].values):
+                if _string(key) in ('message', 'error') and _string(value):
+                    message = message or _string(value)
+        elif name == 'abort' and call.args:
+            result.append(f"HTTP {ast.unparse(call.args[0])}")
+        elif name == 'url_for' and call.args and _string(call.args[0]):
+            result.append(f"redirects to {_string(call.args[0])}")
+    for node in body:
+        if isinstance(node, ast.Return) and isinstance(node.value, ast.Tuple) and len(node.value.elts) == 2:
+            status = node.value.elts[1]
+            if isinstance(status, ast.Constant) and isinstance(status.value, int):
+                result.append(f"HTTP {status.value}")
+    if message is None:
+        return None
+    return f'"{message}"' + (f" ({', '.join(result)})" if result else '')
+
+
+def _route_decorator(decorator: ast.AST):
+    """(methods, path) for ``@x.route(path, methods=[...])`` or ``@x.get(path)``-style decorators."""
+    if not isinstance(decorator, ast.Call) or not decorator.args or _string(decorator.args[0]) is None:
+        return None
+    name = _name(decorator.func)
+    verb = name.rsplit('.', 1)[-1]
+    if verb == 'route':
+        methods = _keyword(decorator, 'methods')
+        if isinstance(methods, (ast.List, ast.Tuple)):
+            return [_string(m) or ast.unparse(m) for m in methods.elts], _string(decorator.args[0])
+        return ['GET'], _string(decorator.args[0])
+    if verb in ('get', 'post', 'put', 'patch', 'delete') and '.' in name:
+        return [verb.upper()], _string(decorator.args[0])
+    return None
+
+
+def summarize_route(function: ast.FunctionDef, methods: List[str], path: str) -> dict:
+    """One section describing a view function."""
+    form, args, json_body = [], [], False
+    templates, redirects, successes, checks = [], [], [], []
+
+    for node in ast.walk(function):
+        if isinstance(node, ast.Call):
+            name = _name(node.func)
+            field = _string(node.args[0]) if node.args else None
+            if name in ('request.form.get', 'request.form.getlist') and field:
+                form.append(field)
+            elif name in ('request.args.get', 'request.args.getlist') and field:
+                args.append(field)
+            elif name in ('request.get_json',):
+                json_body = True
+            elif name == 'render_template' and field:
+                templates.append(field)
+            elif name == 'redirect' and node.args and isinstance(node.args[0], ast.Call) \
+                    and _name(node.args[0].func) == 'url_for' and _string(node.args[0].args[0]):
+                redirects.append(_string(node.args[0].args[0]))
+            elif name == 'flash' and field and len(node.args) > 1 and _string(node.args[1]) in SUCCESS_CATEGORIES:
+                successes.append(field)
+            elif name.endswith('get_or_404'):
+                checks.append(f"- 404 when `{ast.unparse(node)}` finds nothing")
+        elif isinstance(node, ast.Subscript) and _name(node.value) == 'request.form' and _string(node.slice):
+            form.append(_string(node.slice))
+        elif isinstance(node, ast.If):
+            test = ast.unparse(node.test)
+            if 'request.method' in test:
+                continue
+            negated = f"not {test}" if isinstance(node.test, (ast.Name, ast.Attribute, ast.Call)) else f"not ({test})"
+            for condition, body in ((test, node.body), (negated, node.orelse)):
+                outcome = _outcome(body) if body else None
+                if outcome is None:
+                    continue
+                kind = 'Access denied' if 'session' in condition or 'user_role' in condition else 'Rejected'
+                checks.append(f"- {kind} when `{condition}`: {outcome}")
+
+    lines = [f"### {', '.join(methods)} {path} -> {function.name}()"]
+    if _first_line(function):
+        lines.append(_first_line(function))
+    if form:
+        lines.append(f"- Form fields: {', '.join(dict.fromkeys(form))}")
+    if args:
+        lines.append(f"- Query parameters: {', '.join(dict.fromkeys(args))}")
+    if json_body:
+        lines.append("- Takes a JSON body")
+    lines.extend(dict.fromkeys(checks))
+    if successes:
+        lines.append(f"- On success: {'; '.join(dict.fromkeys(successes))}")
+    if templates:
+        lines.append(f"- Renders {', '.join(dict.fromkeys(templates))}")
+    if redirects:
+        lines.append(f"- Redirects to {', '.join(dict.fromkeys(redirects))}")
+    return {'heading': f"{' '.join(methods)} {path} {function.name}", 'level': 1, 'text': '\n'.join(lines) + '\n'}
+
+
+def _column(call: ast.Call, comment: str) -> str:
+    """'String(120), unique, required' for a ``db.Column(...)`` call."""
+    facts = []
+    for arg in call.args:
+        if isinstance(arg, ast.Call) and _name(arg.func).endswith('ForeignKey') and arg.args:
+            facts.append(f"references {_string(arg.args[0]) or ast.unparse(arg.args[0])}")
+        else:
+            # db.String(120) -> String(120)
+            facts.append(ast.unparse(arg).split('.', 1)[-1])
+    flags = {'primary_key': 'primary key', 'unique': 'unique', 'index': 'indexed'}
+    for keyword in call.keywords:
+        value = ast.unparse(keyword.value)
+        if keyword.arg in flags and value == 'True':
+            facts.append(flags[keyword.arg])
+        elif keyword.arg == 'nullable':
+            facts.append('required' if value == 'False' else 'optional')
+        elif keyword.arg == 'default':
+            facts.append(f"default {value}")
+        elif keyword.arg == 'onupdate':
+            facts.append(f"set to {value} on update")
+    return ', '.join(facts) + (f" ({comment})" if comment else '')
+
+
+def summarize_model(cls: ast.ClassDef, comments: Dict[int, str]) -> Optional[dict]:
+    """One section describing a model class, or None if it declares no columns."""
+    table = None
+    fields = []
+    methods = []
+    for node in cls.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            target = node.targets[0].id
+            if target == '__tablename__':
+                table = _string(node.value)
+            elif isinstance(node.value, ast.Call):
+                func = _name(node.value.func)
+                if func.endswith('Column'):
+                    fields.append(f"- {target}: {_column(node.value, comments.get(node.lineno, ''))}")
+                elif func.endswith('relationship') and node.value.args:
+                    backref = _string(_keyword(node.value, 'backref'))
+                    fields.append(f"- {target}: {_string(node.value.args[0])} records"
+                                  + (f" (each has .{backref})" if backref else ''))
+        elif isinstance(node, ast.FunctionDef) and not node.name.startswith('_'):
+            methods.append(f"{node.name}(): {_first_line(node)}" if _first_line(node) else f"{node.name}()")
+    if not fields:
+        return None
+
+    lines = [f"### Model {cls.name}" + (f" (table {table})" if table else '')]
+    if _first_line(cls):
+        lines.append(_first_line(cls))
+    lines.extend(fields)
+    if methods:
+        lines.append(f"- Methods: {'; '.join(methods)}")
+    return {'heading': f"model {cls.name} {table or ''}".strip(), 'level': 1, 'text': '\n'.join(lines) + '\n'}
+
+
+def _setting(node: ast.Assign) -> Optional[str]:
+    """'NAME (default ...)' for ``app.config['NAME'] = ...os.getenv('NAME', default)...``."""
+    target = node.targets[0]
+    if not (isinstance(target, ast.Subscript) and _name(target.value).endswith('config') and _string(target.slice)):
+        return None
+    name = _string(target.slice)
+    for call in ast.walk(node.value):
+        if isinstance(call, ast.Call) and _name(call.func) in ('os.getenv', 'os.environ.get') and len(call.args) > 1:
+            default = ast.unparse(call.args[1])
+            return name if len(default) > MAX_DEFAULT_CHARS else f"{name} (default {default})"
+    value = ast.unparse(node.value)
+    return name if len(value) > MAX_DEFAULT_CHARS else f"{name} = {value}"
+
+
+def _command(function: ast.FunctionDef) -> Optional[str]:
+    """'name [--option ...]: docstring' for a ``@x.cli.command(...)`` function."""
+    command, options = None, []
+    for decorator in function.decorator_list:
+        if not isinstance(decorator, ast.Call):
+            continue
+        name = _name(decorator.func)
+        if name.endswith('cli.command'):
+            command = _string(decorator.args[0]) if decorator.args else function.name.replace('_', '-')
+        elif name.endswith('option') and decorator.args:
+            options.append(_string(decorator.args[0]) or '')
+    if command is None:
+        return None
+    usage = ' '.join([command] + [option for option in options if option])
+    return f"- flask {usage}: {_first_line(function)}" if _first_line(function) else f"- flask {usage}"
+
+
+def summarize_module(source: str, path: str) -> Optional[List[dict]]:
+    """
+    Summary sections for a Python module.
+
+    Args:
+        source: Module source
+        path: Path shown in section headings
+
+    Returns:
+        List of dicts with 'heading', 'level', 'text' and 'tokens', or None
+        if the module doesn't parse
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+
+    comments = _comments(source)
+    sections = []
+    settings, commands, helpers = [], [], []
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            routes = [r for r in (_route_decorator(d) for d in node.decorator_list) if r]
+            for methods, route in routes:
+                sections.append(summarize_route(node, methods, route))
+            command = _command(node)
+            if command:
+                commands.append(command)
+            elif not routes and not node.name.startswith('_'):
+                helpers.append(f"- {node.name}(): {_first_line(node)}" if _first_line(node) else f"- {node.name}()")
+        elif isinstance(node, ast.ClassDef):
+            model = summarize_model(node, comments)
+            if model:
+                sections.append(model)
+            elif not node.name.startswith('_'):
+                helpers.append(f"- class {node.name}: {_first_line(node)}" if _first_line(node) else f"- class {node.name}")
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1:
+            setting = _setting(node)
+            if setting:
+                settings.append(f"- {setting}")
+
+    module_doc = ast.get_docstring(tree)
+    overview = [f"### {path}"]
+    if module_doc:
+        overview.append(' '.join(module_doc.split()))
+    overview.extend(helpers)
+    if len(overview) > 1:
+        sections.insert(0, {'heading': f"{path} overview", 'level': 1, 'text': '\n'.join(overview) + '\n'})
+    if settings:
+        sections.append({'heading': f"{path} settings configuration", 'level': 1,
+                         'text': f"### Settings ({path})\n" + '\n'.join(settings) + '\n'})
+    if commands:
+        sections.append({'heading': f"{path} cli commands", 'level': 1,
+                         'text': f"### CLI commands ({path})\n" + '\n'.join(commands) + '\n'})
+
+    for section in sections:
+        section['tokens'] = estimate_tokens(section['text'])
+    return sections
+
+
+def code_summary(source: str, path: str, digest: str) -> Optional[List[dict]]:
+    """``summarize_module`` cached by ``digest`` (the hash of ``source``)."""
+    key = f"{path}:{digest}"
+    sections = _cache.get(key)
+    if sections is None:
+        sections = summarize_module(source, path)
+        _cache[key] = sections
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    else:
+        _cache.move_to_end(key)
+    return [dict(section) for section in sections] if sections is not None else None
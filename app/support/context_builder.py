@@ -2,60 +2,142 @@
 Context builder for gathering relevant documentation and code from the repository.
 """
 
-import os
-from pathlib import Path
-from typing import List, Set
+from itertools import takewhile
+from typing import List, Optional
 
+from .doc_index import get_document_index
+from .metrics import metrics
+from .near_duplicates import get_duplicate_index
+from .retrieval import BM25Index, get_bm25_index
+from .tokens import CHARS_PER_TOKEN
+from .vector_index import hybrid_rank
 
-# File extensions to include in context
-RELEVANT_EXTENSIONS = {'.md', '.txt', '.py', '.html', '.css', '.js'}
 
-# Directories to exclude from scanning
-EXCLUDE_DIRS = {
-    '__pycache__', 'node_modules', '.git', '.venv', 'venv',
-    'env', 'instance', 'reports', 'screenshots', '.pytest_cache'
+# Section header label per document kind
+KIND_LABELS = {'doc': 'File', 'help': 'Help Article', 'code': 'Code Summary'}
+
+# Ranked chunks scoring below this fraction of the best match aren't worth
+# their tokens
+MIN_RELATIVE_SCORE = 0.35
+
+# Most ranked chunks considered by the knapsack
+MAX_CANDIDATES = 80
+
+# Knapsack weight resolution (tokens)
+KNAPSACK_GRANULARITY = 8
+
+# Tokens charged per chunk for its "## File: ..." header and separator
+HEADER_TOKENS = 12
+
+# Fill order without a query: (kind, is under docs/) -> priority
+KIND_PRIORITY = {
+    ('help', False): 3,
+    ('doc', True): 2,
+    ('doc', False): 1,
+    ('code', False): 0,
 }
 
 
-def scan_directory(directory: Path, extensions: Set[str], max_file_size: int = 100000) -> List[tuple]:
+def document_content(document: dict) -> str:
+    """Reassemble a document's full text from its indexed sections."""
+    return ''.join(section['text'] for section in document['sections'])
+
+
+def knapsack_select(items: List[tuple], capacity: int, granularity: int = KNAPSACK_GRANULARITY) -> List[int]:
     """
-    Recursively scan a directory for files with specific extensions.
+    Solve the 0/1 knapsack over ``items`` exactly (at ``granularity`` resolution).
+    
+    Weights are rounded up to multiples of ``granularity`` tokens, so the
+    chosen set never exceeds ``capacity`` while the DP table stays small.
     
     Args:
-        directory: Path object pointing to the directory to scan
-        extensions: Set of file extensions to include (e.g., {'.md', '.py'})
-        max_file_size: Maximum file size in bytes (default 100KB)
+        items: List of (value, weight) tuples
+        capacity: Maximum total weight
+        granularity: Weight resolution
         
     Returns:
-        List of tuples: (file_path, file_content)
+        Indices of the chosen items, in input order
     """
-    files_content = []
-    
-    try:
-        for item in directory.rglob('*'):
-            # Skip excluded directories
-            if any(excluded in item.parts for excluded in EXCLUDE_DIRS):
-                continue
-            
-            # Check if it's a file with relevant extension
-            if item.is_file() and item.suffix in extensions:
-                # Skip large files
-                if item.stat().st_size > max_file_size:
-                    continue
-                
-                try:
-                    with open(item, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        relative_path = item.relative_to(directory.parent)
-                        files_content.append((str(relative_path), content))
-                except (UnicodeDecodeError, PermissionError):
-                    # Skip files that can't be read
-                    continue
-    
-    except Exception as e:
-        print(f"Error scanning directory {directory}: {e}")
-    
-    return files_content
+    slots = capacity // granularity
+    weights = [-(-int(weight) // granularity) for _value, weight in items]
+    best = [0.0] * (slots + 1)
+    taken = []
+    
+    for (value, _weight), weight in zip(items, weights):
+        row = bytearray(slots + 1)
+        if weight <= slots:
+            for slot in range(slots, weight - 1, -1):
+                candidate = best[slot - weight] + value
+                if candidate > best[slot]:
+                    best[slot] = candidate
+                    row[slot] = 1
+        taken.append(row)
+    
+    chosen = []
+    slot = slots
+    for i in range(len(items) - 1, -1, -1):
+        if taken[i][slot]:
+            chosen.append(i)
+            slot -= weights[i]
+    return sorted(chosen)
+
+
+def format_chunks(units: List[dict]) -> str:
+    """Emit chunks grouped by file, in index order, under one header per file."""
+    context_parts = []
+    for unit in sorted(units, key=lambda unit: (unit['doc_pos'], unit['section_pos'])):
+        if context_parts and context_parts[-1][0] == unit['path']:
+            context_parts[-1][1].append(unit['text'])
+        else:
+            context_parts.append((unit['path'], [unit['text']], unit['kind']))
+    
+    return "\n---\n".join(
+        f"## {KIND_LABELS[kind]}: {path}\n\n{''.join(texts)}\n"
+        for path, texts, kind in context_parts
+    )
+
+
+def select_ranked_chunks(ranked: List[tuple], max_tokens: int) -> List[dict]:
+    """
+    Choose the set of ranked chunks with the highest total score that fits.
+    
+    Args:
+        ranked: List of (score, unit) tuples from ``hybrid_rank``, best first
+        max_tokens: Token budget for the chosen chunks and their headers
+        
+    Returns:
+        The chosen units
+    """
+    if not ranked:
+        return []
+    
+    cutoff = ranked[0][0] * MIN_RELATIVE_SCORE
+    candidates = [(score, unit) for score, unit in ranked[:MAX_CANDIDATES] if score >= cutoff]
+    chosen = knapsack_select(
+        [(score, unit['tokens'] + HEADER_TOKENS) for score, unit in candidates],
+        max_tokens
+    )
+    return [candidates[i][1] for i in chosen]
+
+
+def default_priority(unit: dict) -> tuple:
+    """Sort key for filling the budget without a query."""
+    return -KIND_PRIORITY[unit['kind'], unit['path'].startswith('docs/')], unit['doc_pos'], unit['section_pos']
+
+
+def select_default_chunks(units: List[dict], max_tokens: int) -> List[dict]:
+    """
+    Fill the budget without a query: help articles, then docs/, then other
+    docs, then code, skipping chunks that don't fit.
+    """
+    chosen = []
+    used = 0
+    for unit in sorted(units, key=default_priority):
+        cost = unit['tokens'] + HEADER_TOKENS
+        if used + cost <= max_tokens:
+            chosen.append(unit)
+            used += cost
+    return chosen
 
 
 def build_context(
@@ -63,87 +145,100 @@ def build_context(
     query: str = "",
     include_docs: bool = True,
     include_code: bool = False,
-    max_context_length: int = 15000
+    max_context_length: int = 15000,
+    max_context_tokens: Optional[int] = None,
+    sections: Optional[List[str]] = None,
+    deduplicate: bool = True,
+    stats: Optional[dict] = None
 ) -> str:
     """
     Build a context string from repository documentation and optionally code.
     
+    Content comes from the shared document index, so this does no filesystem
+    access once the index has been loaded. Documents are split into
+    heading/function-level chunks with precomputed token estimates. With a
+    query, chunks are ranked with BM25 fused with local vector similarity
+    and the highest-scoring set that fits the token budget is chosen (0/1
+    knapsack); without one (or when nothing matches) the budget is filled by
+    document kind. Only the preferred section of each cluster of
+    near-duplicates is considered, and chosen sections lose paragraphs that
+    a better one already carries.
+    
     Args:
         base_path: Root path of the repository
-        query: Optional search query to filter relevant content
+        query: Optional search query used to rank sections by relevance
         include_docs: Whether to include documentation files
-        include_code: Whether to include source code files
-        max_context_length: Maximum length of context string (in characters)
+        include_code: Whether to include the summaries of the key source files
+        max_context_length: Maximum length of context string (in characters),
+            used when ``max_context_tokens`` is not given
+        max_context_tokens: Token budget for the context
+        sections: Optional list that receives a "path: heading" label for
+            each section chosen
+        deduplicate: Whether to leave near-duplicate sections and paragraphs out
+        stats: Optional dict that receives 'duplicate_tokens', the tokens of
+            near-duplicate text left out because the context already covers it
         
     Returns:
         Formatted context string containing relevant content
     """
-    context_parts = []
-    total_length = 0
-    
-    base = Path(base_path)
+    max_tokens = max_context_tokens or max_context_length // CHARS_PER_TOKEN
+    index = get_document_index(base_path)
     
-    # Scan documentation directory
+    kinds = {'help'}
     if include_docs:
-        docs_dir = base / 'docs'
-        if docs_dir.exists():
-            doc_files = scan_directory(docs_dir, {'.md', '.txt'})
-            for file_path, content in doc_files:
-                if total_length + len(content) > max_context_length:
-                    break
-                context_parts.append(f"## File: {file_path}\n\n{content}\n")
-                total_length += len(content)
-        
-        # Also include root-level markdown files
-        for md_file in base.glob('*.md'):
-            if total_length >= max_context_length:
-                break
-            try:
-                with open(md_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if total_length + len(content) <= max_context_length:
-                        context_parts.append(f"## File: {md_file.name}\n\n{content}\n")
-                        total_length += len(content)
-            except (UnicodeDecodeError, PermissionError):
-                continue
-    
-    # Scan help articles
-    help_articles_dir = base / 'help_articles'
-    if help_articles_dir.exists():
-        article_files = scan_directory(help_articles_dir, {'.md'})
-        for file_path, content in article_files:
-            if total_length + len(content) > max_context_length:
-                break
-            context_parts.append(f"## Help Article: {file_path}\n\n{content}\n")
-            total_length += len(content)
-    
-    # Optionally scan source code (be selective)
-    if include_code and total_length < max_context_length:
-        app_dir = base / 'app'
-        if app_dir.exists():
-            # Only include main app files, not everything
-            key_files = ['app.py', 'models.py']
-            for key_file in key_files:
-                file_path = app_dir / key_file
-                if file_path.exists() and total_length < max_context_length:
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            if total_length + len(content) <= max_context_length:
-                                context_parts.append(f"## Source Code: app/{key_file}\n\n{content}\n")
-                                total_length += len(content)
-                    except (UnicodeDecodeError, PermissionError):
-                        continue
-    
-    if not context_parts:
+        kinds.add('doc')
+    if include_code:
+        kinds.add('code')
+    
+    duplicates = get_duplicate_index(index) if deduplicate else None
+    chosen = []
+    repeated = []
+    if query.strip():
+        ranked = hybrid_rank(index, query, kinds)
+        if duplicates is not None and ranked:
+            # Chunks below the cutoff are never chosen, so only the rest compete
+            cutoff = ranked[0][0] * MIN_RELATIVE_SCORE
+            ranked = list(takewhile(lambda item: item[0] >= cutoff, ranked))
+            flags = duplicates.repeats([unit for _score, unit in ranked])
+            repeated = [unit for (_score, unit), flag in zip(ranked, flags) if flag]
+            ranked = [item for item, flag in zip(ranked, flags) if not flag]
+        chosen = select_ranked_chunks(ranked, max_tokens)
+    
+    if not chosen:
+        bm25 = get_bm25_index(index)
+        units = [bm25.units[i] for i in sorted(bm25.units_of_kinds(kinds))]
+        repeated = []
+        if duplicates is not None:
+            units = sorted(units, key=default_priority)
+            flags = duplicates.repeats(units)
+            repeated = [unit for unit, flag in zip(units, flags) if flag]
+            units = [unit for unit, flag in zip(units, flags) if not flag]
+        chosen = select_default_chunks(units, max_tokens)
+    
+    if not chosen:
         return "No documentation or context files found in the repository."
     
-    return "\n---\n".join(context_parts)
+    if duplicates is not None:
+        chosen, saved = duplicates.trim(chosen)
+        clusters = {duplicates.cluster_of(unit) for unit in chosen}
+        saved += sum(unit['tokens'] for unit in repeated if duplicates.cluster_of(unit) in clusters)
+        metrics.observe('context.duplicate_tokens', saved)
+        if stats is not None:
+            stats['duplicate_tokens'] = saved
+    
+    if sections is not None:
+        for unit in chosen:
+            heading = unit['document']['sections'][unit['section_pos']]['heading']
+            sections.append(f"{unit['path']}: {heading}" if heading else unit['path'])
+    return format_chunks(chosen)
 
 
 def search_context(context: str, keywords: List[str]) -> str:
     """
-    Filter context based on keyword relevance (simple implementation).
+    Keep the file sections of a built context that are relevant to keywords.
+    
+    Sections are ranked with BM25 and returned best first; sections with no
+    matching term are dropped.
     
     Args:
         context: The full context string
@@ -155,16 +250,11 @@ def search_context(context: str, keywords: List[str]) -> str:
     if not keywords:
         return context
     
-    # Simple keyword matching - split by file sections
-    sections = context.split("## File:")
-    relevant_sections = []
-    
-    for section in sections:
-        section_lower = section.lower()
-        if any(keyword.lower() in section_lower for keyword in keywords):
-            relevant_sections.append(section)
+    sections = [section for section in context.split("\n---\n") if section.strip()]
+    bm25 = BM25Index([{'text': section} for section in sections])
+    ranked = bm25.score(" ".join(keywords))
     
-    if relevant_sections:
-        return "## File:".join(relevant_sections)
+    if ranked:
+        return "\n---\n".join(sections[unit_id] for _score, unit_id in ranked)
     
     return context  # Return full context if no matches
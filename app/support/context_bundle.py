@@ -0,0 +1,286 @@
+"""
+Prebuilt context bundle, so a new worker does not index the repository.
+
+``flask --app app build-context-bundle`` runs at deploy time, like
+precompile-templates. It reads the docs, help articles and key code once
+and writes one file holding everything the context builder derives from
+them: the parsed sections with their token estimates, the BM25 keyword
+index with the document and section of each of its units, the
+near-duplicate clusters and, when NumPy is installed, the
+embedding matrix. A worker maps that
+file and installs it into the document index and the retrieval caches.
+So neither startup nor the first chat reads, parses or tokenizes the
+repository. The matrix is used straight from the mapping, and its pages
+are shared by every worker on the machine.
+
+Layout: an 8-byte magic and the header length as a little-endian uint64,
+then a JSON header, then the blocks it describes, each on a page
+boundary. The documents, the term list and the clusters are JSON. The
+postings, section lengths, IDF weights, unit positions and matrix are
+flat native arrays, read in place through the mapping; a term's postings
+are decoded only when a query uses it, and a unit is built only when it
+is first read. The file is always replaced atomically, and the document
+index watcher installs a new one when it appears.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # the bundle then carries no vectors
+    np = None
+
+from .doc_index import INDEX_FORMAT, DocumentIndex
+from .near_duplicates import DuplicateIndex, prime_duplicate_index
+from .retrieval import BM25Index, prime_bm25_index, section_unit, section_units
+from .vector_index import HashedEmbedder, VectorIndex, prime_vector_index
+
+
+# Bump when the layout or any block's contents change
+BUNDLE_FORMAT = 3
+
+MAGIC = b'SUPCTX\x00\x01'
+PREFIX = struct.Struct('<8sQ')
+
+# Blocks start on page boundaries so the matrix can be used in place
+ALIGN = mmap.PAGESIZE
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+class PackedPostings(Mapping):
+    """
+    BM25 postings backed by flat arrays: term ``i`` has the (unit, tf) pairs
+    at ``starts[i]:starts[i + 1]`` of ``units`` and ``tfs``.
+    """
+
+    def __init__(self, terms: List[str], starts, units, tfs):
+        self._slots = {term: slot for slot, term in enumerate(terms)}
+        self._starts = starts
+        self._units = units
+        self._tfs = tfs
+
+    def __getitem__(self, term: str) -> List[Tuple[int, int]]:
+        slot = self._slots[term]
+        start, end = self._starts[slot], self._starts[slot + 1]
+        return list(zip(self._units[start:end], self._tfs[start:end]))
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+class PackedUnits(Sequence):
+    """
+    BM25 units built on first read: unit ``i`` is section
+    ``sections[i]`` of ``documents[docs[i]]``, so loading a bundle does
+    not walk every section of the corpus.
+    """
+
+    def __init__(self, documents: List[dict], docs, sections):
+        self._documents = documents
+        self._docs = docs
+        self._sections = sections
+        self._built: Dict[int, dict] = {}
+
+    def __getitem__(self, unit_id: int) -> dict:
+        unit = self._built.get(unit_id)
+        if unit is None:
+            doc_pos = self._docs[unit_id]
+            # setdefault keeps one dict per unit when two threads build it at once
+            unit = self._built.setdefault(
+                unit_id, section_unit(self._documents[doc_pos], doc_pos, self._sections[unit_id]))
+        return unit
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def kind_of(self, unit_id: int) -> str:
+        """A unit's kind, without building it."""
+        return self._documents[self._docs[unit_id]]['kind']
+
+
+def build_bundle(base_path: str, path: str, vectors: bool = True) -> dict:
+    """
+    Index ``base_path`` from scratch and write its bundle to ``path``.
+
+    Args:
+        base_path: Repository root
+        path: Bundle file to write (replaced atomically)
+        vectors: Include the embedding matrix (needs NumPy)
+
+    Returns:
+        Dict with 'path', 'bytes', 'fingerprint', 'documents', 'sections',
+        'tokens' and 'vectors'
+    """
+    index = DocumentIndex(base_path)
+    index.refresh()
+    documents = index.documents()
+    bm25 = BM25Index(section_units(documents))
+    unit_docs = array('I', (unit['doc_pos'] for unit in bm25.units))
+    unit_sections = array('I', (unit['section_pos'] for unit in bm25.units))
+
+    terms = list(bm25.postings)
+    starts, units, tfs = array('I', [0]), array('I'), array('I')
+    for term in terms:
+        for unit_id, tf in bm25.postings[term]:
+            units.append(unit_id)
+            tfs.append(tf)
+        starts.append(len(units))
+
+    blocks = [
+        ('documents', json.dumps(documents, separators=(',', ':')).encode('utf-8')),
+        ('terms', json.dumps(terms, separators=(',', ':')).encode('utf-8')),
+        ('starts', starts.tobytes()),
+        ('units', units.tobytes()),
+        ('tfs', tfs.tobytes()),
+        ('lengths', array('I', bm25.lengths).tobytes()),
+        ('idf', array('d', (bm25.idf[term] for term in terms)).tobytes()),
+        ('unit_docs', unit_docs.tobytes()),
+        ('unit_sections', unit_sections.tobytes()),
+        ('duplicates', json.dumps(DuplicateIndex.build(index.fingerprint, bm25.units).to_json(),
+                                  separators=(',', ':')).encode('utf-8')),
+    ]
+    header = {
+        'format': BUNDLE_FORMAT,
+        'index_format': INDEX_FORMAT,
+        'byteorder': sys.byteorder,
+        'fingerprint': index.fingerprint,
+        'built': time.time(),
+        'documents': len(documents),
+        'sections': len(bm25.units),
+        'tokens': sum(unit['tokens'] for unit in bm25.units),
+        'blocks': {},
+    }
+    if vectors and np is not None:
+        built = VectorIndex.build(index.fingerprint, bm25.units)
+        blocks.append(('vectors', np.ascontiguousarray(built.matrix, dtype=np.float32).tobytes()))
+        header['vectors'] = {
+            'rows': int(built.matrix.shape[0]),
+            'dim': built.embedder.dim,
+            'idf': built.embedder.idf.tolist(),
+            'kinds': built.kinds.tolist(),
+        }
+
+    # Offsets are relative to the first block, which follows the header on a page boundary
+    offset = 0
+    for name, data in blocks:
+        header['blocks'][name] = [offset, len(data)]
+        offset = _aligned(offset + len(data))
+    encoded = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    start = _aligned(PREFIX.size + len(encoded))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, len(encoded)))
+        f.write(encoded)
+        for name, data in blocks:
+            f.seek(start + header['blocks'][name][0])
+            f.write(data)
+        f.truncate(start + offset)
+    os.replace(tmp_path, path)
+
+    return {
+        'path': path,
+        'bytes': os.path.getsize(path),
+        'fingerprint': index.fingerprint,
+        'documents': header['documents'],
+        'sections': header['sections'],
+        'tokens': header['tokens'],
+        'vectors': 'vectors' in header,
+    }
+
+
+class ContextBundle:
+    """
+    A bundle file mapped into memory.
+
+    Raises:
+        OSError: The file can't be opened
+        ValueError: It is not a bundle, or was built by another format
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size < PREFIX.size:
+                raise ValueError('file is too short')
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Identifies this file on disk, so a replaced bundle is noticed
+        self.stat_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+        magic, length = PREFIX.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError('not a context bundle')
+        self.header = json.loads(self._map[PREFIX.size:PREFIX.size + length])
+        if (self.header.get('format') != BUNDLE_FORMAT or self.header.get('index_format') != INDEX_FORMAT
+                or self.header.get('byteorder') != sys.byteorder):
+            raise ValueError('built by a different version or platform')
+        self.fingerprint = self.header['fingerprint']
+        self._start = _aligned(PREFIX.size + length)
+
+    def _block(self, name: str) -> memoryview:
+        offset, length = self.header['blocks'][name]
+        return memoryview(self._map)[self._start + offset:self._start + offset + length]
+
+    def entries(self) -> Dict[str, dict]:
+        """Indexed documents keyed by path, in context order, as DocumentIndex stores them."""
+        return {document['path']: document for document in json.loads(bytes(self._block('documents')))}
+
+    def keyword_index(self, documents) -> BM25Index:
+        """The BM25 index over ``documents`` (this bundle's entries), from the saved postings."""
+        terms = json.loads(bytes(self._block('terms')))
+        postings = PackedPostings(terms, self._block('starts').cast('I'), self._block('units').cast('I'),
+                                  self._block('tfs').cast('I'))
+        idf = dict(zip(terms, self._block('idf').cast('d')))
+        units = PackedUnits(list(documents), self._block('unit_docs').cast('I'),
+                            self._block('unit_sections').cast('I'))
+        bm25 = BM25Index.from_postings(units, postings, self._block('lengths').cast('I'), idf,
+                                       kind_of=units.kind_of)
+        bm25.fingerprint = self.fingerprint
+        return bm25
+
+    def duplicate_index(self) -> DuplicateIndex:
+        """The near-duplicate clusters among this bundle's sections."""
+        return DuplicateIndex.from_json(json.loads(bytes(self._block('duplicates'))))
+
+    def vector_index(self) -> Optional[VectorIndex]:
+        """Embeddings backed by the mapping, or None without NumPy or vectors in the bundle."""
+        meta = self.header.get('vectors')
+        if np is None or meta is None:
+            return None
+        offset, length = self.header['blocks']['vectors']
+        matrix = np.frombuffer(self._map, dtype=np.float32, count=length // 4, offset=self._start + offset)
+        matrix = matrix.reshape(meta['rows'], meta['dim'])
+        embedder = HashedEmbedder(meta['dim'], np.array(meta['idf'], dtype=np.float32))
+        return VectorIndex(self.fingerprint, matrix, embedder, meta['kinds'])
+
+
+def install_bundle(document_index: DocumentIndex, bundle: ContextBundle):
+    """
+    Publish a bundle's documents to ``document_index`` with their keyword
+    index, vector index and near-duplicate clusters already in the caches.
+    """
+    entries = bundle.entries()
+    # Units point at the same document dicts the index is about to serve
+    bm25 = bundle.keyword_index(entries.values())
+    prime_bm25_index(document_index, bm25)
+    prime_duplicate_index(document_index, bundle.duplicate_index())
+    vectors = bundle.vector_index()
+    if vectors is not None:
+        prime_vector_index(document_index, vectors)
+    document_index.install(entries)
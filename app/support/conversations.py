@@ -0,0 +1,217 @@
+"""
+Server-side storage of support chat conversations.
+
+The widget sends only its new message and a conversation id. Each prompt
+gets a history window that fits a token budget: the most recent turns
+verbatim, preceded by a rolling summary of the turns that no longer fit.
+Turns are folded into the summary once, when they fall out of the
+window, so the summary is built incrementally and never needs an extra
+LLM call. A conversation belongs to the user who started it and only
+they can continue or read it.
+"""
+
+import os
+import re
+import secrets
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from .tokens import estimate_tokens
+
+
+# Budget for the rolling summary of older turns
+SUMMARY_TOKENS = 300
+
+# Longest excerpt of a single turn kept in the summary
+SUMMARY_LINE_TOKENS = 40
+
+# Conversations idle for longer than this are deleted
+CONVERSATION_TTL_SECONDS = 7 * 24 * 3600
+
+# Delete idle conversations every this many new conversations
+PRUNE_EVERY = 100
+
+ARTICLE_BLOCK_RE = re.compile(r'=== PROPOSED_HELP_ARTICLE ===.*?(=== END_PROPOSED_HELP_ARTICLE ===|$)', re.S)
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_turns INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversation_turns (
+    conversation_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    PRIMARY KEY (conversation_id, position)
+);
+CREATE INDEX IF NOT EXISTS ix_conversations_updated ON conversations (updated);
+"""
+
+# Columns added after the first release, created on existing databases at startup
+ADDED_COLUMNS = {
+    'user_id': 'INTEGER',
+}
+
+
+def summarize_turn(role: str, content: str) -> str:
+    """One summary line for a turn: its first sentence, trimmed to a budget."""
+    text = ' '.join(ARTICLE_BLOCK_RE.sub('(proposed a help article)', content).split())
+    first = SENTENCE_RE.split(text, 1)[0]
+    words = first.split()
+    while len(words) > 1 and estimate_tokens(' '.join(words)) > SUMMARY_LINE_TOKENS:
+        words = words[:len(words) * 3 // 4 or 1]
+    excerpt = ' '.join(words) + ('…' if len(words) < len(text.split()) else '')
+    return f"{'User' if role == 'user' else 'Assistant'}: {excerpt}"
+
+
+def roll_summary(summary: str, lines: List[str]) -> str:
+    """Append summary lines, dropping the oldest ones beyond SUMMARY_TOKENS."""
+    kept = [line for line in summary.split('\n') if line] + lines
+    while len(kept) > 1 and estimate_tokens('\n'.join(kept)) > SUMMARY_TOKENS:
+        kept.pop(0)
+    return '\n'.join(kept)
+
+
+class ConversationStore:
+    """
+    SQLite-backed conversations shared by every worker.
+
+    Args:
+        path: SQLite file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._created = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            existing = {row[1] for row in conn.execute('PRAGMA table_info(conversations)')}
+            for name, definition in ADDED_COLUMNS.items():
+                if name not in existing:
+                    conn.execute(f'ALTER TABLE conversations ADD COLUMN {name} {definition}')
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection, committing on success."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, user_id: Optional[int] = None) -> str:
+        """Start a conversation owned by ``user_id`` (None when logged out) and return its id."""
+        conversation_id = secrets.token_urlsafe(16)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('INSERT INTO conversations (id, user_id, created, updated) VALUES (?, ?, ?, ?)',
+                         (conversation_id, user_id, now, now))
+            self._created += 1
+            if self._created % PRUNE_EVERY == 0:
+                self._prune(conn, now)
+        return conversation_id
+
+    def exists(self, conversation_id: Optional[str], user_id: Optional[int] = None) -> bool:
+        """Whether ``conversation_id`` names a stored conversation owned by ``user_id``."""
+        if not conversation_id:
+            return False
+        with self._connect() as conn:
+            return conn.execute('SELECT 1 FROM conversations WHERE id = ? AND user_id IS ?',
+                                (conversation_id, user_id)).fetchone() is not None
+
+    def append(self, conversation_id: str, turns: List[Dict[str, str]]):
+        """Add turns ({'role', 'content'}) to the end of a conversation."""
+        with self._connect() as conn:
+            # Take the write lock before reading the next position, so concurrent appends queue up
+            conn.execute('BEGIN IMMEDIATE')
+            position = conn.execute(
+                'SELECT COALESCE(MAX(position) + 1, 0) FROM conversation_turns WHERE conversation_id = ?',
+                (conversation_id,)
+            ).fetchone()[0]
+            conn.executemany(
+                'INSERT INTO conversation_turns (conversation_id, position, role, content, tokens) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(conversation_id, position + i, turn['role'], turn['content'], estimate_tokens(turn['content']))
+                 for i, turn in enumerate(turns)]
+            )
+            conn.execute('UPDATE conversations SET updated = ? WHERE id = ?', (time.time(), conversation_id))
+
+    def turns(self, conversation_id: str, user_id: Optional[int] = None) -> List[Dict[str, str]]:
+        """Every turn of a conversation owned by ``user_id``, oldest first (none for anyone else)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT t.role, t.content FROM conversation_turns t JOIN conversations c ON c.id = t.conversation_id '
+                'WHERE t.conversation_id = ? AND c.user_id IS ? ORDER BY t.position',
+                (conversation_id, user_id)
+            ).fetchall()
+        return [{'role': role, 'content': content} for role, content in rows]
+
+    def window(self, conversation_id: str, budget_tokens: int) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        History to send with the next message.
+
+        Recent turns are kept verbatim while they fit ``budget_tokens``
+        (less the summary's share); turns that no longer fit are folded
+        into the rolling summary and never read again.
+
+        Returns:
+            (summary, recent turns oldest first); summary is '' until
+            something has been folded
+        """
+        with self._connect() as conn:
+            row = conn.execute('SELECT summary, summarized_turns FROM conversations WHERE id = ?',
+                               (conversation_id,)).fetchone()
+            if row is None:
+                return '', []
+            summary, summarized = row
+            rows = conn.execute(
+                'SELECT position, role, content, tokens FROM conversation_turns '
+                'WHERE conversation_id = ? AND position >= ? ORDER BY position',
+                (conversation_id, summarized)
+            ).fetchall()
+
+            # Reserve room for the summary unless everything still fits without one
+            available = budget_tokens
+            if summary or sum(r[3] for r in rows) > budget_tokens:
+                available -= SUMMARY_TOKENS
+            keep_from = len(rows)
+            used = 0
+            while keep_from > 0 and used + rows[keep_from - 1][3] <= available:
+                keep_from -= 1
+                used += rows[keep_from][3]
+
+            if keep_from:
+                folded = rows[:keep_from]
+                summary = roll_summary(summary, [summarize_turn(role, content) for _, role, content, _ in folded])
+                summarized = folded[-1][0] + 1
+                conn.execute('UPDATE conversations SET summary = ?, summarized_turns = ? WHERE id = ?',
+                             (summary, summarized, conversation_id))
+
+        return summary, [{'role': role, 'content': content} for _, role, content, _ in rows[keep_from:]]
+
+    def _prune(self, conn, now: float):
+        stale = 'SELECT id FROM conversations WHERE updated < ?'
+        cutoff = now - CONVERSATION_TTL_SECONDS
+        conn.execute(f'DELETE FROM conversation_turns WHERE conversation_id IN ({stale})', (cutoff,))
+        conn.execute('DELETE FROM conversations WHERE updated < ?', (cutoff,))
+
+
+def history_messages(summary: str, recent: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Chat messages for a history window, with the summary as a system note."""
+    messages = []
+    if summary:
+        messages.append({'role': 'system', 'content': f"Summary of the earlier conversation:\n{summary}"})
+    messages.extend(recent)
+    return messages
@@ -0,0 +1,538 @@
+"""
+Persistent, incrementally refreshed index of the documents the support
+assistant uses as context.
+
+Each indexed file is stored as ``path -> (mtime, size, hash, sections)``.
+Refreshing only stats the source files and re-reads the ones whose mtime or
+size changed, so chat requests read from memory and never touch the disk.
+A background watcher keeps the index current using watchdog (inotify on
+Linux) when it is installed, and mtime polling otherwise.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog is optional; fall back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
+
+from .code_summary import code_summary
+from .tokens import estimate_tokens
+
+
+# Bump when the on-disk layout, section parsing or the retrieval terms
+# (``retrieval.SYNONYMS``, which the saved vectors embed) change
+INDEX_FORMAT = 4
+
+# Directories to exclude from scanning
+EXCLUDE_DIRS = {
+    '__pycache__', 'node_modules', '.git', '.venv', 'venv',
+    'env', 'instance', 'reports', 'screenshots', '.pytest_cache'
+}
+
+DOC_EXTENSIONS = {'.md', '.txt'}
+HELP_EXTENSIONS = {'.md'}
+
+# Source files summarized for the assistant (relative to the app directory)
+KEY_CODE_FILES = ['app.py', 'models.py']
+
+# Skip documents larger than this (bytes)
+MAX_FILE_SIZE = 100000
+
+# Sections longer than this are split further at paragraph breaks
+MAX_SECTION_CHARS = 2000
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*\S)\s*$')
+
+
+def parse_sections(content: str, suffix: str) -> List[dict]:
+    """
+    Split a document into chunks: markdown at headings, Python at top-level
+    functions and classes, with long chunks split again at blank lines.
+
+    The concatenated section texts always equal the original content, so the
+    index never needs to keep a second copy of the file.
+
+    Args:
+        content: File content
+        suffix: File extension ('.md' and '.py' are split)
+
+    Returns:
+        List of dicts with 'heading', 'level', 'text' and 'tokens'
+    """
+    if suffix == '.md':
+        sections = _split_markdown(content)
+    elif suffix == '.py':
+        sections = _split_python(content)
+    else:
+        sections = [{'heading': '', 'level': 0, 'text': content}]
+
+    chunks = []
+    for section in sections:
+        for text in _split_long(section['text']):
+            chunks.append({
+                'heading': section['heading'],
+                'level': section['level'],
+                'text': text,
+                'tokens': estimate_tokens(text),
+            })
+    return chunks
+
+
+def _split_markdown(content: str) -> List[dict]:
+    """Split markdown at ATX headings outside code fences."""
+    sections = []
+    current = {'heading': '', 'level': 0, 'lines': []}
+    in_fence = False
+
+    for line in content.splitlines(keepends=True):
+        if line.lstrip().startswith('```'):
+            in_fence = not in_fence
+        match = None if in_fence else HEADING_RE.match(line)
+        if match:
+            if current['lines']:
+                sections.append(current)
+            current = {'heading': match.group(2), 'level': len(match.group(1)), 'lines': []}
+        current['lines'].append(line)
+
+    if current['lines'] or not sections:
+        sections.append(current)
+
+    return [
+        {'heading': s['heading'], 'level': s['level'], 'text': ''.join(s['lines'])}
+        for s in sections
+    ]
+
+
+def _split_python(content: str) -> List[dict]:
+    """Split Python source at top-level functions and classes."""
+    try:
+        tree = ast.parse(content)
+    except SyntaxError:
+        return [{'heading': '', 'level': 0, 'text': content}]
+
+    lines = content.splitlines(keepends=True)
+    starts = []
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+        # Keep comments sitting directly above the definition with it
+        while start > 0 and lines[start - 1].lstrip().startswith('#'):
+            start -= 1
+        kind = 'class' if isinstance(node, ast.ClassDef) else 'def'
+        starts.append((start, f"{kind} {node.name}"))
+
+    sections = []
+    previous_start, previous_heading = 0, ''
+    for start, heading in starts:
+        if start > previous_start:
+            sections.append({'heading': previous_heading, 'level': 1 if previous_heading else 0,
+                             'text': ''.join(lines[previous_start:start])})
+            previous_start, previous_heading = start, heading
+        else:
+            previous_heading = heading
+    sections.append({'heading': previous_heading, 'level': 1 if previous_heading else 0,
+                     'text': ''.join(lines[previous_start:])})
+    return sections
+
+
+def _split_long(text: str) -> List[str]:
+    """Split text longer than MAX_SECTION_CHARS at blank lines."""
+    if len(text) <= MAX_SECTION_CHARS:
+        return [text]
+
+    parts = []
+    current = ''
+    for paragraph in re.split(r'(?<=\n\n)', text):
+        if current and paragraph.strip() and len(current) + len(paragraph) > MAX_SECTION_CHARS:
+            parts.append(current)
+            current = ''
+        current += paragraph
+    if current:
+        parts.append(current)
+    return parts
+
+
+def walk_files(root: Path, extensions: Set[str], exclude_dirs: Set[str] = EXCLUDE_DIRS) -> List[Path]:
+    """
+    Files under ``root`` with one of ``extensions``, in sorted order.
+
+    Uses ``os.scandir`` and never descends into excluded directories (or
+    follows directory symlinks), so a large venv, node_modules or .git
+    costs one directory entry instead of a walk of everything inside it.
+    """
+    found = []
+    pending = [str(root)]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in exclude_dirs:
+                            pending.append(entry.path)
+                    elif os.path.splitext(entry.name)[1] in extensions and entry.is_file():
+                        found.append(Path(entry.path))
+        except OSError:
+            continue
+    return sorted(found)
+
+
+def list_source_files(base: Path) -> List[Tuple[str, str, Path]]:
+    """
+    List the files that make up the assistant's context, in context order.
+
+    Returns:
+        List of tuples: (relative_path, kind, absolute_path) where kind is
+        'doc', 'help' or 'code'
+    """
+    sources = []
+
+    docs_dir = base / 'docs'
+    if docs_dir.is_dir():
+        for item in walk_files(docs_dir, DOC_EXTENSIONS):
+            sources.append((item.relative_to(base).as_posix(), 'doc', item))
+
+    for item in sorted(base.glob('*.md')):
+        if item.is_file():
+            sources.append((item.name, 'doc', item))
+
+    help_dir = base / 'help_articles'
+    if help_dir.is_dir():
+        for item in walk_files(help_dir, HELP_EXTENSIONS):
+            sources.append((item.relative_to(base).as_posix(), 'help', item))
+
+    for key_file in KEY_CODE_FILES:
+        item = base / 'app' / key_file
+        if item.is_file():
+            sources.append((f"app/{key_file}", 'code', item))
+
+    return sources
+
+
+class DocumentIndex:
+    """
+    In-memory document index with an optional JSON file behind it.
+
+    Readers call ``documents()``, which returns the current immutable list of
+    entries without locking or touching the filesystem. ``refresh()`` builds a
+    new list and swaps it in, bumping ``version`` and ``fingerprint`` when any
+    content changed.
+
+    With a ``bundle_path``, ``load_bundle()`` installs a prebuilt context
+    bundle (see context_bundle) instead of reading the repository.
+    """
+
+    def __init__(self, base_path: str, index_path: Optional[str] = None, bundle_path: Optional[str] = None):
+        self.base = Path(base_path)
+        self.index_path = Path(index_path) if index_path else None
+        self.bundle_path = bundle_path
+        self.version = 0
+        self.fingerprint = ''
+        self._entries: Dict[str, dict] = {}
+        self._documents: List[dict] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._dirty = threading.Event()
+        self._watcher = None
+        self._observer = None
+        self._bundle_stat = None
+
+    def documents(self) -> List[dict]:
+        """Return the indexed documents in context order."""
+        return self._documents
+
+    def load(self) -> bool:
+        """
+        Load the persisted index, if there is one for this format.
+
+        Returns:
+            True if entries were loaded
+        """
+        if self.index_path is None or not self.index_path.exists():
+            return False
+
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable document index {self.index_path}: {e}")
+            return False
+
+        if data.get('format') != INDEX_FORMAT:
+            return False
+
+        with self._lock:
+            self._swap(data.get('files', {}))
+            self.version = data.get('version', 0)
+        return True
+
+    def install(self, entries: Dict[str, dict]):
+        """Publish entries built elsewhere (a context bundle) in place of the current ones."""
+        with self._lock:
+            fingerprint = self.fingerprint
+            self._swap(entries)
+            if self.fingerprint != fingerprint:
+                self.version += 1
+
+    def load_bundle(self) -> bool:
+        """
+        Install the context bundle at ``bundle_path`` if it is new or was replaced.
+
+        Returns:
+            True if a bundle was installed
+        """
+        if not self.bundle_path:
+            return False
+        try:
+            stat = os.stat(self.bundle_path)
+        except OSError:
+            return False
+        if self._bundle_stat == (stat.st_mtime_ns, stat.st_size, stat.st_ino):
+            return False
+
+        # context_bundle builds on the retrieval modules, which build on this one
+        from .context_bundle import ContextBundle, install_bundle
+        try:
+            bundle = ContextBundle(self.bundle_path)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring context bundle {self.bundle_path}: {e}")
+            self._bundle_stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            return False
+        install_bundle(self, bundle)
+        self._bundle_stat = bundle.stat_key
+        return True
+
+    def _swap(self, entries: Dict[str, dict]):
+        """Publish a new set of entries to readers."""
+        self._entries = entries
+        self._documents = list(entries.values())
+        # Content identity shared by every process with the same files,
+        # unlike ``version`` which only counts local changes. The format is
+        # part of it, so vectors and replies saved for differently parsed
+        # sections of the same files are not reused.
+        self.fingerprint = hashlib.sha256(
+            '\n'.join([f"format:{INDEX_FORMAT}"]
+                      + [f"{path}:{entry['hash']}" for path, entry in entries.items()]).encode('utf-8')
+        ).hexdigest()[:16]
+
+    def save(self):
+        """Atomically write the index to ``index_path``."""
+        if self.index_path is None:
+            return
+
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': INDEX_FORMAT, 'version': self.version, 'files': self._entries}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def refresh(self) -> bool:
+        """
+        Re-stat the source files and re-read only those that changed.
+
+        Returns:
+            True if any document's content changed
+        """
+        with self._lock:
+            entries = {}
+            changed = False
+            touched = False
+
+            for rel_path, kind, path in list_source_files(self.base):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+
+                old = self._entries.get(rel_path)
+                if old and old['mtime'] == stat.st_mtime and old['size'] == stat.st_size and old['kind'] == kind:
+                    entries[rel_path] = old
+                    continue
+
+                entry = self._read_entry(rel_path, kind, path, stat, old)
+                if entry is None:
+                    continue
+                entries[rel_path] = entry
+                if old is None or entry['hash'] != old['hash']:
+                    changed = True
+                else:
+                    touched = True
+
+            # Removed files, or the same set in a different order
+            if list(entries) != list(self._entries):
+                changed = True
+
+            if changed or touched:
+                self._swap(entries)
+                if changed:
+                    self.version += 1
+                try:
+                    self.save()
+                except OSError as e:
+                    print(f"Error saving document index {self.index_path}: {e}")
+
+            return changed
+
+    def _read_entry(self, rel_path, kind, path, stat, old) -> Optional[dict]:
+        """
+        Read and parse one file, reusing ``old`` when only mtime moved.
+
+        Documents are read one byte past ``MAX_FILE_SIZE``, so one that grew
+        after it was stat'ed is still skipped without being read whole.
+        """
+        limited = kind != 'code'
+        if limited and stat.st_size > MAX_FILE_SIZE:
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read(MAX_FILE_SIZE + 1) if limited else f.read()
+            if limited and len(raw) > MAX_FILE_SIZE:
+                return None
+            content = raw.decode('utf-8')
+        except (UnicodeDecodeError, PermissionError, OSError):
+            return None
+
+        digest = hashlib.sha256(raw).hexdigest()
+        if old and old['hash'] == digest and old['kind'] == kind:
+            # Touched but not modified: keep the parsed sections
+            return dict(old, mtime=stat.st_mtime, size=stat.st_size)
+
+        sections = code_summary(content, rel_path, digest) if kind == 'code' else None
+        return {
+            'path': rel_path,
+            'kind': kind,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'hash': digest,
+            'sections': sections or parse_sections(content, path.suffix),
+        }
+
+    def mark_dirty(self):
+        """Ask the watcher to refresh as soon as possible."""
+        self._dirty.set()
+
+    def start_watcher(self, poll_interval: float = 5.0):
+        """
+        Keep the index fresh from a daemon thread.
+
+        With watchdog installed, filesystem events wake the thread right away
+        and polling only acts as a safety net.
+        """
+        if self._watcher is not None or poll_interval <= 0:
+            return
+
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                handler = _DirtyHandler(self)
+                self._observer.schedule(handler, str(self.base), recursive=False)
+                for subdir, recursive in (('docs', True), ('help_articles', True), ('app', False)):
+                    if (self.base / subdir).is_dir():
+                        self._observer.schedule(handler, str(self.base / subdir), recursive=recursive)
+                self._observer.daemon = True
+                self._observer.start()
+            except OSError as e:
+                print(f"File watching unavailable, polling instead: {e}")
+                self._observer = None
+
+        self._watcher = threading.Thread(
+            target=self._watch_loop, args=(poll_interval,), name='support-doc-index', daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watcher(self):
+        """Stop the background watcher (used by tests and shutdown hooks)."""
+        self._stop.set()
+        self._dirty.set()
+        if self._observer is not None:
+            self._observer.stop()
+
+    def _watch_loop(self, poll_interval: float):
+        while not self._stop.is_set():
+            self._dirty.wait(poll_interval)
+            self._dirty.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.load_bundle()
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing document index: {e}")
+
+
+class _DirtyHandler(FileSystemEventHandler):
+    """watchdog handler that flags the index for refresh on relevant events."""
+
+    def __init__(self, index: DocumentIndex):
+        self.index = index
+
+    def on_any_event(self, event):
+        path = Path(getattr(event, 'dest_path', '') or event.src_path)
+        if path.suffix in DOC_EXTENSIONS or path.suffix == '.py':
+            self.index.mark_dirty()
+
+
+# Process-wide indexes, one per repository root
+_indexes: Dict[str, DocumentIndex] = {}
+_settings: Dict[str, dict] = {}
+_registry_lock = threading.Lock()
+
+
+def configure_document_index(base_path: str, state_dir: Optional[str] = None, poll_interval: float = 5.0,
+                             bundle_path: Optional[str] = None):
+    """
+    Set where the index for ``base_path`` is persisted, how it is watched
+    and which prebuilt context bundle it starts from.
+
+    Must be called before the first ``get_document_index()`` for that path
+    (the support blueprint does this when it is registered).
+    """
+    key = os.path.realpath(base_path)
+    with _registry_lock:
+        _settings[key] = {
+            'index_path': os.path.join(state_dir, 'support_index.json') if state_dir else None,
+            'poll_interval': poll_interval,
+            'bundle_path': bundle_path,
+        }
+
+
+def get_document_index(base_path: str) -> DocumentIndex:
+    """
+    Return the shared index for ``base_path``, building it on first use.
+
+    The first call installs the context bundle when there is one, and
+    otherwise loads the persisted index and re-reads only files that changed
+    since it was written; later calls return the in-memory index.
+    """
+    key = os.path.realpath(base_path)
+    index = _indexes.get(key)
+    if index is not None:
+        return index
+
+    with _registry_lock:
+        index = _indexes.get(key)
+        if index is None:
+            settings = _settings.get(key, {'index_path': None, 'poll_interval': 5.0, 'bundle_path': None})
+            index = DocumentIndex(key, settings['index_path'], settings['bundle_path'])
+            # With a bundle, startup costs the same however large the repository
+            # is; the watcher checks the files against it in the background
+            if not index.load_bundle():
+                index.load()
+                index.refresh()
+            index.start_watcher(settings['poll_interval'])
+            _indexes[key] = index
+
+    return index
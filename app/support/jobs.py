@@ -0,0 +1,171 @@
+"""
+Background jobs for slow support tasks.
+
+A request submits a job and gets its id straight back. The job runs on a
+small thread pool in the worker that accepted it. Its status, result and
+error are kept in SQLite, so any worker can answer a poll for it. Tasks
+are registered by kind (article generation, reindexing, exports, ...)
+and take a JSON payload, returning a JSON result.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import metrics
+
+
+# Finished jobs older than this are deleted
+JOB_TTL_SECONDS = 7 * 24 * 3600
+
+# Delete old jobs every this many submissions
+PRUNE_EVERY = 100
+
+# A queued or running job not updated for this long was left by a worker that died
+STALE_SECONDS = 600
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    user_id INTEGER,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_updated ON jobs (status, updated);
+"""
+
+
+class JobRunner:
+    """
+    Runs registered tasks in background threads and records them in SQLite.
+
+    Args:
+        path: SQLite file shared by every worker
+        workers: Threads running jobs in this worker
+        context: Called around each job, e.g. ``app.app_context``
+    """
+
+    def __init__(self, path: str, workers: int = 2, context: Optional[Callable[[], Any]] = None):
+        self.path = path
+        self.context = context or nullcontext
+        self.handlers: Dict[str, Callable[[dict], Any]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='support-job')
+        self._submitted = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._fail_stale(conn, time.time())
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection, committing on success."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def register(self, kind: str, handler: Callable[[dict], Any]):
+        """Run ``handler(payload)`` for jobs of ``kind``; it returns a JSON-serializable result."""
+        self.handlers[kind] = handler
+
+    def submit(self, kind: str, payload: dict, user_id: Optional[int] = None) -> str:
+        """
+        Queue a job and return its id without waiting for it.
+
+        Raises:
+            KeyError: No handler is registered for ``kind``
+        """
+        handler = self.handlers[kind]
+        job_id = secrets.token_urlsafe(12)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, kind, status, payload, user_id, created, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, 'queued', json.dumps(payload), user_id, now, now)
+            )
+            self._submitted += 1
+            if self._submitted % PRUNE_EVERY == 0:
+                self._prune(conn, now)
+        metrics.incr(f'jobs.{kind}.submitted')
+        self._pool.submit(self._run, job_id, kind, handler, payload)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """A job's kind, status, timestamps, result and error, or None if unknown."""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT id, kind, status, result, error, user_id, created, started, finished '
+                'FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(('id', 'kind', 'status', 'result', 'error', 'user_id', 'created', 'started', 'finished'), row))
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def wait(self, job_id: str, timeout: float = 30, poll_interval: float = 0.05) -> Optional[dict]:
+        """Poll until a job has finished or ``timeout`` passes; returns its last state."""
+        give_up = time.monotonic() + timeout
+        job = self.get(job_id)
+        while job is not None and job['status'] in ('queued', 'running') and time.monotonic() < give_up:
+            time.sleep(poll_interval)
+            job = self.get(job_id)
+        return job
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs; with ``wait`` let queued ones finish."""
+        self._pool.shutdown(wait=wait)
+
+    def _run(self, job_id: str, kind: str, handler: Callable[[dict], Any], payload: dict):
+        started = time.time()
+        self._update(job_id, status='running', started=started)
+        try:
+            with self.context():
+                result = handler(payload)
+            self._update(job_id, status='done', result=json.dumps(result), finished=time.time())
+            metrics.incr(f'jobs.{kind}.done')
+        except Exception as e:
+            print(f"Error in {kind} job {job_id}: {e}")
+            traceback.print_exc()
+            self._update(job_id, status='failed', error=str(e) or type(e).__name__, finished=time.time())
+            metrics.incr(f'jobs.{kind}.failed')
+        metrics.observe(f'jobs.{kind}.ms', (time.time() - started) * 1000)
+
+    def _update(self, job_id: str, **fields):
+        fields['updated'] = time.time()
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        try:
+            with self._connect() as conn:
+                conn.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+        except sqlite3.Error as e:
+            print(f"Error updating job {job_id}: {e}")
+
+    def _fail_stale(self, conn, now: float):
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'Interrupted', finished = ?, updated = ? "
+            "WHERE status IN ('queued', 'running') AND updated < ?",
+            (now, now, now - STALE_SECONDS)
+        )
+
+    def _prune(self, conn, now: float):
+        conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                     (now - JOB_TTL_SECONDS,))
@@ -0,0 +1,311 @@
+"""
+Resilient client layer for the LLM provider.
+
+Wraps the OpenAI SDK (sync and async) with:
+
+- one pooled keep-alive HTTP client per process instead of a connection per call
+- a per-attempt timeout and an overall deadline per call
+- retries with full-jitter exponential backoff, limited by a process-wide
+  retry budget so retries can't multiply load during an outage
+- a circuit breaker that fails fast while the provider keeps failing
+
+The SDK's own retries are disabled so this layer is the only one deciding.
+Settings come from the app config through ``configure_llm_client()``.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from typing import Optional
+
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+from .metrics import metrics
+
+
+# Errors worth retrying; anything else (bad request, auth) fails immediately
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a call's deadline passes before an attempt succeeds."""
+
+
+class RetryBudget:
+    """
+    Token bucket shared by all calls: each call deposits ``ratio`` tokens
+    and each retry spends one, so retries stay below ~``ratio`` of traffic.
+
+    Args:
+        ratio: Retries allowed per call, on average
+        max_tokens: Burst of retries allowed after a quiet period
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after ``failure_threshold`` consecutive failures; open
+    rejects calls for ``reset_timeout`` seconds, then lets one probe
+    through (half-open) whose outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def admit(self) -> Optional[str]:
+        """
+        Let a call through if the circuit allows it.
+
+        Returns:
+            'call' when closed, 'probe' for the one half-open probe (which
+            must end in ``record_success``, ``record_failure`` or
+            ``release_probe``), None when the call is rejected
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return 'call'
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = 'half-open'
+                self._probing = False
+            if self.state == 'half-open' and not self._probing:
+                self._probing = True
+                return 'probe'
+            return None
+
+    def allow(self) -> bool:
+        return self.admit() is not None
+
+    def release_probe(self):
+        """End a probe that neither succeeded nor failed, so the next call probes instead."""
+        with self._lock:
+            if self.state == 'half-open':
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half-open' or self._failures >= self.failure_threshold:
+                if self.state != 'open':
+                    metrics.incr('llm.breaker_opened')
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class LLMClient:
+    """
+    Pooled, deadline-bounded, retrying access to chat completions.
+
+    Args:
+        api_key: Provider API key
+        base_url: Alternative API root (e.g. a local fake server)
+        timeout: Seconds allowed for a single attempt
+        deadline: Seconds allowed for a whole call, retries included
+        max_retries: Retries per call (the retry budget may allow fewer)
+        backoff_base: First backoff ceiling in seconds; doubles per retry
+        backoff_max: Largest backoff ceiling in seconds
+        pool_size: Connections kept open to the provider
+        retry_budget: Shared RetryBudget
+        breaker: Shared CircuitBreaker
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, timeout: float = 30,
+                 deadline: float = 60, max_retries: int = 2, backoff_base: float = 0.5,
+                 backoff_max: float = 8, pool_size: int = 20, retry_budget: Optional[RetryBudget] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Built from the SDK's own limits type so it matches the HTTP library the SDK uses
+        self.limits = type(openai.DEFAULT_CONNECTION_LIMITS)(
+            max_connections=pool_size, max_keepalive_connections=pool_size, keepalive_expiry=60
+        )
+        self.retry_budget = retry_budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self._sync = None
+        self._async = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def sync_client(self) -> OpenAI:
+        if self._sync is None:
+            with self._lock:
+                if self._sync is None:
+                    self._sync = OpenAI(
+                        api_key=self.api_key, base_url=self.base_url, max_retries=0, timeout=self.timeout,
+                        http_client=DefaultHttpxClient(limits=self.limits, timeout=self.timeout)
+                    )
+        return self._sync
+
+    def async_client(self) -> AsyncOpenAI:
+        """The async SDK client for the running event loop (pools are per loop)."""
+        loop = asyncio.get_running_loop()
+        client = self._async.get(loop)
+        if client is None:
+            client = self._async[loop] = AsyncOpenAI(
+                api_key=self.api_key, base_url=self.base_url, max_retries=0, timeout=self.timeout,
+                http_client=DefaultAsyncHttpxClient(limits=self.limits, timeout=self.timeout)
+            )
+        return client
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter backoff, or the server's Retry-After when it sent one."""
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _admit(self) -> str:
+        """Pass the breaker or raise ``CircuitOpenError``; returns the breaker's admission."""
+        admission = self.breaker.admit()
+        if admission is None:
+            metrics.incr('llm.breaker_rejected')
+            raise CircuitOpenError('LLM provider circuit is open')
+        self.retry_budget.deposit()
+        metrics.incr('llm.calls')
+        return admission
+
+    def _attempts(self, deadline_at: float):
+        """
+        Yield (attempt, per-attempt timeout) until the caller stops, the
+        retries or budget run out, or ``deadline_at`` passes.
+        """
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceededError(f'No successful attempt within {self.deadline}s')
+            yield attempt, min(self.timeout, remaining)
+            attempt += 1
+
+    def _pause(self, attempt: int, error: Exception, deadline_at: float) -> float:
+        """Backoff before the next attempt, never past the deadline."""
+        return max(0.0, min(self._backoff(attempt, error), deadline_at - time.monotonic()))
+
+    def _should_retry(self, attempt: int, error: Exception) -> bool:
+        self.breaker.record_failure()
+        metrics.incr('llm.failures')
+        if attempt >= self.max_retries:
+            return False
+        if not self.retry_budget.try_spend():
+            metrics.incr('llm.retry_budget_exhausted')
+            return False
+        if not self.breaker.allow():
+            return False
+        metrics.incr('llm.retries')
+        return True
+
+    def create(self, **kwargs):
+        """
+        ``chat.completions.create`` with retries. With ``stream=True`` only
+        opening the stream is retried; the returned stream is not.
+        """
+        admission = self._admit()
+        deadline_at = time.monotonic() + self.deadline
+        try:
+            for attempt, timeout in self._attempts(deadline_at):
+                try:
+                    response = self.sync_client.chat.completions.create(timeout=timeout, **kwargs)
+                except RETRYABLE_ERRORS as e:
+                    if not self._should_retry(attempt, e):
+                        raise
+                    time.sleep(self._pause(attempt, e, deadline_at))
+                    continue
+                self.breaker.record_success()
+                return response
+        finally:
+            # A probe ended by a non-retryable error must not hold the circuit half-open
+            if admission == 'probe':
+                self.breaker.release_probe()
+
+    async def acreate(self, **kwargs):
+        """Async ``create``: same retries, breaker and deadline."""
+        admission = self._admit()
+        deadline_at = time.monotonic() + self.deadline
+        try:
+            for attempt, timeout in self._attempts(deadline_at):
+                try:
+                    response = await self.async_client().chat.completions.create(timeout=timeout, **kwargs)
+                except RETRYABLE_ERRORS as e:
+                    if not self._should_retry(attempt, e):
+                        raise
+                    await asyncio.sleep(self._pause(attempt, e, deadline_at))
+                    continue
+                self.breaker.record_success()
+                return response
+        finally:
+            if admission == 'probe':
+                self.breaker.release_probe()
+
+
+_settings = {}
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def configure_llm_client(**settings):
+    """Set ``LLMClient`` keyword arguments; the client is rebuilt on next use."""
+    global _client
+    with _client_lock:
+        _settings.clear()
+        _settings.update({k: v for k, v in settings.items() if v is not None})
+        _client = None
+
+
+def get_llm_client() -> LLMClient:
+    """The process-wide client, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(**_settings)
+    return _client
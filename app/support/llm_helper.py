@@ -1,22 +1,43 @@
 """
 LLM integration helper for OpenAI API.
+
+Calls go through the pooled, retrying client in ``llm_client``; failures
+that survive its retries become ERROR_REPLY, or StreamInterrupted once a
+stream has already sent part of the reply.
 """
 
-import os
-from openai import OpenAI
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator
+
+from .llm_client import get_llm_client
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Returned instead of raising when the API call fails
+ERROR_REPLY = "I'm sorry, I encountered an error processing your request. Please try again later."
+
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+class StreamInterrupted(Exception):
+    """A streamed reply failed after some of it was already yielded."""
+
+
+def record_usage(api_usage, usage: Optional[Dict[str, int]]):
+    """Copy token counts from an API usage object into ``usage``, if given."""
+    if usage is None or api_usage is None:
+        return
+    for name in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+        value = getattr(api_usage, name, None)
+        if value is not None:
+            usage[name] = value
 
 
 def call_llm(
     system_prompt: str,
     user_message: str,
     context: Optional[str] = None,
-    model: str = "gpt-4o-mini",
+    model: str = DEFAULT_MODEL,
     temperature: float = 0.7,
-    max_tokens: int = 2000
+    max_tokens: int = 2000,
+    usage: Optional[Dict[str, int]] = None
 ) -> str:
     """
     Call the OpenAI API with a system prompt and user message.
@@ -28,6 +49,8 @@ def call_llm(
         model: OpenAI model to use (default: gpt-4o-mini)
         temperature: Sampling temperature (0-1)
         max_tokens: Maximum tokens in response
+        usage: Optional dict that receives the API's prompt_tokens,
+            completion_tokens and total_tokens
         
     Returns:
         The LLM's response as a string
@@ -40,7 +63,7 @@ def call_llm(
             system_prompt = system_prompt.format(context="No additional context provided.")
         
         # Create chat completion
-        response = client.chat.completions.create(
+        response = get_llm_client().create(
             model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -50,20 +73,22 @@ def call_llm(
             max_tokens=max_tokens
         )
         
+        record_usage(response.usage, usage)
         return response.choices[0].message.content
     
     except Exception as e:
         print(f"Error in LLM call: {e}")
-        return "I'm sorry, I encountered an error processing your request. Please try again later."
+        return ERROR_REPLY
 
 
 def call_llm_with_history(
     system_prompt: str,
     conversation_history: List[Dict[str, str]],
     context: Optional[str] = None,
-    model: str = "gpt-4o-mini",
+    model: str = DEFAULT_MODEL,
     temperature: float = 0.7,
-    max_tokens: int = 2000
+    max_tokens: int = 2000,
+    usage: Optional[Dict[str, int]] = None
 ) -> str:
     """
     Call the OpenAI API with conversation history for multi-turn conversations.
@@ -75,6 +100,8 @@ def call_llm_with_history(
         model: OpenAI model to use
         temperature: Sampling temperature
         max_tokens: Maximum tokens in response
+        usage: Optional dict that receives the API's prompt_tokens,
+            completion_tokens and total_tokens
         
     Returns:
         The LLM's response as a string
@@ -91,15 +118,129 @@ def call_llm_with_history(
         messages.extend(conversation_history)
         
         # Create chat completion
-        response = client.chat.completions.create(
+        response = get_llm_client().create(
             model=model,
             messages=messages,
             temperature=temperature,
             max_tokens=max_tokens
         )
         
+        record_usage(response.usage, usage)
         return response.choices[0].message.content
     
     except Exception as e:
         print(f"Error in LLM call: {e}")
-        return "I'm sorry, I encountered an error processing your request. Please try again later."
+        return ERROR_REPLY
+
+
+async def acall_llm_with_history(
+    system_prompt: str,
+    conversation_history: List[Dict[str, str]],
+    context: Optional[str] = None,
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 2000,
+    usage: Optional[Dict[str, int]] = None
+) -> str:
+    """
+    Async version of ``call_llm_with_history`` for callers running an event loop.
+    
+    Args:
+        system_prompt: The system prompt defining the assistant's role
+        conversation_history: List of message dicts with 'role' and 'content'
+        context: Optional context string (docs, code) to inject
+        model: OpenAI model to use
+        temperature: Sampling temperature
+        max_tokens: Maximum tokens in response
+        usage: Optional dict that receives the API's prompt_tokens,
+            completion_tokens and total_tokens
+        
+    Returns:
+        The LLM's response as a string
+    """
+    try:
+        system_prompt = system_prompt.format(context=context or "No additional context provided.")
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(conversation_history)
+        
+        response = await get_llm_client().acreate(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        
+        record_usage(response.usage, usage)
+        return response.choices[0].message.content
+    
+    except Exception as e:
+        print(f"Error in LLM call: {e}")
+        return ERROR_REPLY
+
+
+def stream_llm(
+    system_prompt: str,
+    conversation_history: List[Dict[str, str]],
+    context: Optional[str] = None,
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.7,
+    max_tokens: int = 2000,
+    usage: Optional[Dict[str, int]] = None
+) -> Iterator[str]:
+    """
+    Stream a completion from the OpenAI API, yielding text as it arrives.
+    
+    Args:
+        system_prompt: The system prompt defining the assistant's role
+        conversation_history: List of message dicts with 'role' and 'content',
+            ending with the user's new message
+        context: Optional context string (docs, code) to inject
+        model: OpenAI model to use
+        temperature: Sampling temperature
+        max_tokens: Maximum tokens in response
+        usage: Optional dict that receives the API's prompt_tokens,
+            completion_tokens and total_tokens once the stream ends
+        
+    Yields:
+        Text fragments of the reply; ERROR_REPLY if the call fails before
+        anything was produced
+
+    Raises:
+        StreamInterrupted: The stream failed part way; what was yielded is
+            an incomplete reply
+    """
+    produced = False
+    try:
+        # Inject context into system prompt if provided
+        if context:
+            system_prompt = system_prompt.format(context=context)
+        else:
+            system_prompt = system_prompt.format(context="No additional context provided.")
+        
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(conversation_history)
+        
+        stream = get_llm_client().create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            # The last chunk then carries the token usage
+            stream_options={"include_usage": True}
+        )
+        
+        for chunk in stream:
+            record_usage(getattr(chunk, 'usage', None), usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                produced = True
+                yield delta
+    
+    except Exception as e:
+        print(f"Error in LLM stream: {e}")
+        if produced:
+            raise StreamInterrupted(str(e)) from e
+        yield ERROR_REPLY
@@ -0,0 +1,62 @@
+"""
+In-process counters and timings for the support assistant.
+
+Each worker keeps its own numbers; ``/api/support/metrics`` reports the
+worker that serves the request.
+"""
+
+import threading
+from typing import Dict
+
+
+class Metrics:
+    """Thread-safe named counters plus count/total/max summaries for timings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, amount: float = 1):
+        """Add ``amount`` to counter ``name``."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float):
+        """Record one measurement (e.g. milliseconds) under ``name``."""
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = {'count': 0, 'total': 0.0, 'max': 0.0}
+            timing['count'] += 1
+            timing['total'] += value
+            timing['max'] = max(timing['max'], value)
+
+    def get(self, name: str) -> float:
+        """Current value of counter ``name`` (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        """
+        Copy of all counters and timings.
+
+        Returns:
+            {"counters": {...}, "timings": {name: {count, total, max, mean}}}
+        """
+        with self._lock:
+            timings = {
+                name: dict(timing, mean=timing['total'] / timing['count'] if timing['count'] else 0.0)
+                for name, timing in self._timings.items()
+            }
+            return {'counters': dict(self._counters), 'timings': timings}
+
+    def reset(self):
+        """Clear everything (used by tests and benchmarks)."""
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+# Shared by every support module in this process
+metrics = Metrics()
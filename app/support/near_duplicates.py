@@ -0,0 +1,325 @@
+"""
+Near-duplicate detection across the indexed documentation.
+
+The docs repeat each other: the support chat README exists at the root and
+under docs/, and the setup guide, implementation notes and quick reference
+restate its install steps, configuration and troubleshooting. Every
+section and every paragraph is reduced to shingles (hashed runs of
+``SHINGLE_TERMS`` consecutive words) and grouped into clusters of
+near-duplicates by the Jaccard similarity of their shingle sets.
+Candidates are found by banding a one-permutation MinHash sketch, so
+clustering is linear in the size of the docs. This runs once per document
+index snapshot, like the vector index: the clusters are saved next to the
+index and ship in the context bundle.
+
+When a context is packed, only the preferred member of each cluster goes
+in, which for a question is the best ranked one. A section that repeats
+nearly all of a preferred section is left out, and a chosen section loses
+the paragraphs another chosen section already carries.
+"""
+
+import json
+import os
+import re
+import threading
+import zlib
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from .question_index import jaccard
+from .retrieval import TOKEN_RE, get_bm25_index
+from .tokens import estimate_tokens
+
+
+# Words per shingle
+SHINGLE_TERMS = 3
+
+# Minimum Jaccard similarity of the shingle sets of two near-duplicates.
+# A whole section is only left out when it repeats nearly all of another;
+# one that adds something loses just its repeated paragraphs.
+SECTION_THRESHOLD = 0.8
+PARAGRAPH_THRESHOLD = 0.5
+
+# Text with fewer shingles (headings, one-liners) is never a duplicate
+MIN_SHINGLES = 8
+
+# Bins of the MinHash sketch, hashed in bands of BAND_BINS. Sets at
+# Jaccard 0.5 share at least one band ~99% of the time; candidates are then
+# verified with the exact similarity.
+SKETCH_BINS = 32
+BAND_BINS = 2
+
+# Most candidate clusters verified per set; the band a near-duplicate shares
+# is almost always among the first checked
+MAX_VERIFIED = 16
+
+# A band shared by this many clusters is boilerplate and stops collecting
+BUCKET_LIMIT = 50
+
+FENCE_RE = re.compile(r'\s*(```|~~~)')
+
+
+def paragraph_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the blank-line separated paragraphs of ``text``; fenced code stays whole."""
+    spans = []
+    start = None
+    offset = 0
+    in_fence = False
+    for line in text.splitlines(keepends=True):
+        if FENCE_RE.match(line):
+            in_fence = not in_fence
+        if line.strip() or in_fence:
+            if start is None:
+                start = offset
+        elif start is not None:
+            spans.append((start, offset))
+            start = None
+        offset += len(line)
+    if start is not None:
+        spans.append((start, offset))
+    return spans
+
+
+def shingle_hashes(text: str) -> FrozenSet[int]:
+    """Hashes of every run of ``SHINGLE_TERMS`` consecutive words of ``text``, ignoring case and punctuation."""
+    terms = TOKEN_RE.findall(text.lower())
+    return frozenset(
+        zlib.crc32(' '.join(terms[i:i + SHINGLE_TERMS]).encode('utf-8'))
+        for i in range(len(terms) - SHINGLE_TERMS + 1)
+    )
+
+
+def _bands(shingle_set: FrozenSet[int]) -> List[tuple]:
+    """
+    Band keys of a one-permutation MinHash sketch: the smallest hash in
+    each of ``SKETCH_BINS`` bins, empty bins borrowing from the next filled one.
+    """
+    minima: List[Optional[int]] = [None] * SKETCH_BINS
+    for h in shingle_set:
+        slot = h % SKETCH_BINS
+        if minima[slot] is None or h < minima[slot]:
+            minima[slot] = h
+    for slot in range(SKETCH_BINS):
+        step = 1
+        while minima[slot] is None:
+            minima[slot] = minima[(slot + step) % SKETCH_BINS]
+            step += 1
+    return [(band,) + tuple(minima[band:band + BAND_BINS]) for band in range(0, SKETCH_BINS, BAND_BINS)]
+
+
+def _match(shingle_set: FrozenSet[int], keys: List[tuple], buckets: Dict[tuple, List[int]],
+           shingle_sets: List[FrozenSet[int]], threshold: float) -> Optional[int]:
+    """The first cluster sharing a band with ``shingle_set`` that it is a near-duplicate of."""
+    checked = set()
+    for key in keys:
+        for leader in buckets.get(key, ()):
+            if leader in checked:
+                continue
+            if jaccard(shingle_set, shingle_sets[leader]) >= threshold:
+                return leader
+            checked.add(leader)
+            if len(checked) >= MAX_VERIFIED:
+                return None
+    return None
+
+
+def cluster(shingle_sets: List[FrozenSet[int]], threshold: float) -> List[int]:
+    """
+    Group near-duplicate shingle sets.
+
+    Each set joins the cluster of the first earlier set it is a
+    near-duplicate of, or starts its own.
+
+    Returns:
+        The cluster of each set, as the index of the set that started it
+    """
+    clusters = list(range(len(shingle_sets)))
+    buckets: Dict[tuple, List[int]] = defaultdict(list)
+    for i, shingle_set in enumerate(shingle_sets):
+        if len(shingle_set) < MIN_SHINGLES:
+            continue
+        keys = _bands(shingle_set)
+        leader = _match(shingle_set, keys, buckets, shingle_sets, threshold)
+        if leader is not None:
+            clusters[i] = leader
+        else:
+            for key in keys:
+                if len(buckets[key]) < BUCKET_LIMIT:
+                    buckets[key].append(i)
+    return clusters
+
+
+def _key(unit: dict) -> Tuple[str, int]:
+    return unit['path'], unit['section_pos']
+
+
+class DuplicateIndex:
+    """
+    Near-duplicate clusters among the sections of one document index snapshot.
+
+    Sections are identified by (path, section position), so the clusters
+    apply to any unit list built from the same documents.
+
+    Args:
+        fingerprint: Fingerprint of the document index snapshot
+        sections: (path, section_pos) -> cluster, for sections that have a near-duplicate
+        paragraphs: (path, section_pos) -> [(start, end, cluster)] for the
+            paragraphs of that section that have a near-duplicate
+    """
+
+    def __init__(self, fingerprint: Optional[str], sections: Dict[Tuple[str, int], int],
+                 paragraphs: Dict[Tuple[str, int], List[Tuple[int, int, int]]]):
+        self.fingerprint = fingerprint
+        self.sections = sections
+        self.paragraphs = paragraphs
+
+    @classmethod
+    def build(cls, fingerprint: Optional[str], units: List[dict]) -> 'DuplicateIndex':
+        """Cluster the sections of ``units`` and their paragraphs."""
+        spans, paragraph_sets, section_sets = [], [], []
+        for unit_id, unit in enumerate(units):
+            shingles = frozenset()
+            for start, end in paragraph_spans(unit['text']):
+                paragraph = shingle_hashes(unit['text'][start:end])
+                spans.append((unit_id, start, end))
+                paragraph_sets.append(paragraph)
+                shingles |= paragraph
+            section_sets.append(shingles)
+
+        section_clusters = cluster(section_sets, SECTION_THRESHOLD)
+        sizes = Counter(section_clusters)
+        sections = {_key(unit): c for unit, c in zip(units, section_clusters) if sizes[c] > 1}
+
+        paragraph_clusters = cluster(paragraph_sets, PARAGRAPH_THRESHOLD)
+        sizes = Counter(paragraph_clusters)
+        paragraphs = defaultdict(list)
+        for (unit_id, start, end), c in zip(spans, paragraph_clusters):
+            if sizes[c] > 1:
+                paragraphs[_key(units[unit_id])].append((start, end, c))
+        return cls(fingerprint, sections, dict(paragraphs))
+
+    def to_json(self) -> dict:
+        return {
+            'fingerprint': self.fingerprint,
+            'sections': [[path, pos, c] for (path, pos), c in self.sections.items()],
+            'paragraphs': [[path, pos, spans] for (path, pos), spans in self.paragraphs.items()],
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> 'DuplicateIndex':
+        return cls(
+            data['fingerprint'],
+            {(path, pos): c for path, pos, c in data['sections']},
+            {(path, pos): spans for path, pos, spans in data['paragraphs']},
+        )
+
+    def save(self, directory: Path):
+        """Write the clusters atomically."""
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / 'support_duplicates.json'
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(), f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, directory: Path, fingerprint: str) -> Optional['DuplicateIndex']:
+        """Read saved clusters if they match ``fingerprint``."""
+        try:
+            with open(directory / 'support_duplicates.json', 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cls.from_json(data) if data.get('fingerprint') == fingerprint else None
+
+    def cluster_of(self, unit: dict) -> Optional[int]:
+        """The cluster of a unit's section, or None if it has no near-duplicate."""
+        return self.sections.get(_key(unit))
+
+    def repeats(self, units: List[dict]) -> List[bool]:
+        """For units in preference order, whether each near-duplicates an earlier one."""
+        seen = set()
+        flags = []
+        for unit in units:
+            c = self.cluster_of(unit)
+            flags.append(c is not None and c in seen)
+            seen.add(c)
+        return flags
+
+    def trim(self, units: List[dict]) -> Tuple[List[dict], int]:
+        """
+        Drop from each unit the paragraphs an earlier unit already carries.
+
+        Args:
+            units: Chosen units, in preference order
+
+        Returns:
+            The units, trimmed copies where paragraphs were dropped (a unit
+            left with nothing but headings is dropped), and the tokens removed
+        """
+        emitted = set()
+        kept = []
+        removed = 0
+        for unit in units:
+            spans = self.paragraphs.get(_key(unit), [])
+            drop = [(start, end) for start, end, c in spans if c in emitted]
+            emitted.update(c for _start, _end, c in spans)
+            if not drop:
+                kept.append(unit)
+                continue
+            text = _remove_spans(unit['text'], drop)
+            if all(text[start:end].lstrip().startswith('#') for start, end in paragraph_spans(text)):
+                removed += unit['tokens']
+                continue
+            trimmed = dict(unit, text=text, tokens=estimate_tokens(text))
+            removed += unit['tokens'] - trimmed['tokens']
+            kept.append(trimmed)
+        return kept, removed
+
+
+def _remove_spans(text: str, spans: List[Tuple[int, int]]) -> str:
+    """``text`` without the given paragraphs and the blank lines after them."""
+    starts = [start for start, _end in paragraph_spans(text)] + [len(text)]
+    parts = []
+    offset = 0
+    for start, _end in sorted(spans):
+        parts.append(text[offset:start])
+        offset = next(s for s in starts if s > start)
+    parts.append(text[offset:])
+    return ''.join(parts)
+
+
+_duplicate_cache: Dict[str, DuplicateIndex] = {}
+_duplicate_lock = threading.Lock()
+
+
+def get_duplicate_index(document_index) -> DuplicateIndex:
+    """Return the near-duplicate clusters for a document index, loading or building them on change."""
+    key = str(document_index.base)
+    bm25 = get_bm25_index(document_index)
+    cached = _duplicate_cache.get(key)
+    if cached is not None and cached.fingerprint == bm25.fingerprint:
+        return cached
+
+    with _duplicate_lock:
+        cached = _duplicate_cache.get(key)
+        if cached is None or cached.fingerprint != bm25.fingerprint:
+            directory = document_index.index_path.parent if document_index.index_path else None
+            cached = DuplicateIndex.load(directory, bm25.fingerprint) if directory else None
+            if cached is None:
+                cached = DuplicateIndex.build(bm25.fingerprint, bm25.units)
+                if directory:
+                    try:
+                        cached.save(directory)
+                    except OSError as e:
+                        print(f"Error saving near-duplicate clusters: {e}")
+            _duplicate_cache[key] = cached
+
+    return cached
+
+
+def prime_duplicate_index(document_index, duplicates: DuplicateIndex):
+    """Install prebuilt clusters for ``duplicates.fingerprint`` so they are not rebuilt on first use."""
+    with _duplicate_lock:
+        _duplicate_cache[str(document_index.base)] = duplicates
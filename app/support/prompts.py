@@ -2,6 +2,8 @@
 System prompts and templates for the support LLM assistant.
 """
 
+import re
+
 SUPPORT_ASSISTANT_PROMPT = """You are an AI-powered support assistant for the Bug Tracker application.
 
 About the Bug Tracker Application:
@@ -106,3 +108,14 @@ Topic to document: {topic}
 
 Create a complete, well-structured help article in Markdown format.
 """
+
+# The fixed redirect the assistant is told to give for out-of-scope questions,
+# so it can also be sent without asking the LLM
+OUT_OF_SCOPE_REPLY = re.search(r'respond with:\n"(.+?)"\n', SUPPORT_ASSISTANT_PROMPT, re.S).group(1)
+
+# Help articles the redirect points to
+REDIRECT_ARTICLES = [
+    {'title': 'Getting Started Guide', 'path': 'help_articles/getting-started-guide.md'},
+    {'title': 'How to Create a Bug Report', 'path': 'help_articles/how-to-create-a-bug-report.md'},
+    {'title': 'Understanding User Roles', 'path': 'help_articles/understanding-user-roles.md'},
+]
@@ -0,0 +1,261 @@
+"""
+Near-duplicate matching of support questions against ones already answered.
+
+Questions are reduced to shingles (canonical terms plus adjacent-term
+pairs, so "how to make a bug report" and "how do I create a bug" share
+most of them). A MinHash signature split into LSH bands finds candidate
+questions in constant time; candidates are then verified with the exact
+Jaccard similarity of their shingle sets, and must ask for the same action
+on the same thing: "how do I delete a bug" never reuses the answer to "how
+do I edit a bug", however similar the rest of the wording. Answers live in SQLite next to
+the reply cache so every worker can serve them.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from .metrics import metrics
+from .retrieval import SYNONYMS, canonical_tokens, stem
+
+
+# MinHash signature = LSH_BANDS bands of LSH_ROWS hashes. Two rows per band
+# makes pairs at Jaccard 0.3 candidates ~95% of the time; the exact check
+# then applies the real threshold.
+LSH_BANDS = 32
+LSH_ROWS = 2
+
+# Delete expired answers from SQLite every this many inserts
+PRUNE_EVERY = 50
+
+# Actions and objects of the app. A stored answer is only reused when the
+# question names exactly the same ones (after SYNONYMS), since they decide
+# what the answer is about.
+ACTION_TERMS = frozenset(SYNONYMS.get(stem(word), stem(word)) for word in [
+    'create', 'delete', 'edit', 'filter', 'login', 'logout', 'assign', 'close',
+    'reopen', 'open', 'fix', 'sort', 'export', 'import', 'view', 'reset',
+    'comment', 'attach', 'upload', 'download', 'register',
+])
+OBJECT_TERMS = frozenset(SYNONYMS.get(stem(word), stem(word)) for word in [
+    'bug', 'project', 'user', 'account', 'status', 'severity', 'role',
+    'manager', 'reporter', 'developer', 'dashboard', 'email',
+])
+KEY_TERMS = ACTION_TERMS | OBJECT_TERMS
+
+_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (1 + 2 * zlib.crc32(f'a{i}'.encode()), zlib.crc32(f'b{i}'.encode()))
+    for i in range(LSH_BANDS * LSH_ROWS)
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answered_questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question TEXT NOT NULL,
+    shingles TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    context_version TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+
+def shingles(question: str) -> FrozenSet[str]:
+    """Canonical terms of a question plus each adjacent pair of them."""
+    terms = canonical_tokens(question)
+    return frozenset(terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])])
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Exact Jaccard similarity of two shingle sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def key_terms(shingle_set: FrozenSet[str]) -> FrozenSet[str]:
+    """The ``KEY_TERMS`` among the terms of a shingle set."""
+    return shingle_set & KEY_TERMS
+
+
+def minhash(shingle_set: FrozenSet[str]) -> List[int]:
+    """MinHash signature of a non-empty shingle set."""
+    hashes = [zlib.crc32(s.encode('utf-8')) for s in shingle_set]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def lsh_keys(signature: List[int]) -> List[Tuple[int, ...]]:
+    """One bucket key per band; sharing any key makes two questions candidates."""
+    return [(band,) + tuple(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]) for band in range(LSH_BANDS)]
+
+
+class QuestionIndex:
+    """
+    LSH index over answered questions, backed by a SQLite table.
+
+    Args:
+        path: SQLite file shared by workers; None keeps questions in memory only
+        threshold: Minimum Jaccard similarity for a match
+        ttl_seconds: Answers older than this are not served
+    """
+
+    def __init__(self, path: Optional[str], threshold: float = 0.6, ttl_seconds: float = 86400):
+        self.path = path
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[int, ...], List[int]] = defaultdict(list)
+        self._entries: Dict[int, dict] = {}
+        self._keys: Dict[int, List[Tuple[int, ...]]] = {}
+        self._added = 0
+        self._last_id = 0
+        self._next_local_id = -1
+        self._inserts = 0
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection, committing on success."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _add(self, entry_id: int, entry: dict):
+        """Index an entry; the caller holds the lock."""
+        keys = lsh_keys(minhash(entry['shingles']))
+        self._entries[entry_id] = entry
+        self._keys[entry_id] = keys
+        for key in keys:
+            self._buckets[key].append(entry_id)
+        self._added += 1
+        if self._added % PRUNE_EVERY == 0:
+            self._evict(time.time() - self.ttl_seconds)
+
+    def _evict(self, cutoff: float):
+        """Forget entries created before ``cutoff``; the caller holds the lock."""
+        for entry_id in [i for i, entry in self._entries.items() if entry['created'] < cutoff]:
+            del self._entries[entry_id]
+            for key in self._keys.pop(entry_id):
+                bucket = self._buckets[key]
+                bucket.remove(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def sync(self):
+        """Pull questions other workers answered since the last sync."""
+        if not self.path:
+            return
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    'SELECT id, question, shingles, answer, context_version, created '
+                    'FROM answered_questions WHERE id > ? ORDER BY id', (self._last_id,)
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading question index: {e}")
+            return
+
+        with self._lock:
+            for entry_id, question, shingle_json, answer, context_version, created in rows:
+                if entry_id <= self._last_id:
+                    continue
+                self._add(entry_id, {
+                    'question': question,
+                    'shingles': frozenset(json.loads(shingle_json)),
+                    'answer': answer,
+                    'context_version': context_version,
+                    'created': created,
+                })
+                self._last_id = entry_id
+
+    def candidates(self, question: str) -> List[Tuple[float, dict]]:
+        """
+        All indexed questions sharing an LSH bucket with ``question`` and
+        naming the same ``KEY_TERMS``.
+
+        Returns:
+            List of (jaccard, entry) best first, regardless of threshold
+        """
+        query = shingles(question)
+        if not query:
+            return []
+        terms = key_terms(query)
+        with self._lock:
+            ids = {entry_id for key in lsh_keys(minhash(query)) for entry_id in self._buckets.get(key, ())}
+            entries = [self._entries[i] for i in ids]
+        scored = [(jaccard(query, entry['shingles']), entry) for entry in entries
+                  if key_terms(entry['shingles']) == terms]
+        return sorted(scored, key=lambda pair: pair[0], reverse=True)
+
+    def lookup(self, question: str, context_version: str) -> Optional[Tuple[float, dict]]:
+        """
+        Best stored answer for a near-duplicate of ``question``.
+
+        Only answers produced against the same docs (``context_version``)
+        and younger than the TTL qualify.
+
+        Returns:
+            (similarity, entry) or None when nothing clears the threshold
+        """
+        self.sync()
+        now = time.time()
+        for similarity, entry in self.candidates(question):
+            if similarity < self.threshold:
+                break
+            if entry['context_version'] == context_version and now - entry['created'] <= self.ttl_seconds:
+                metrics.incr('similar_questions.hits')
+                metrics.observe('similar_questions.similarity', similarity)
+                return similarity, entry
+        metrics.incr('similar_questions.misses')
+        return None
+
+    def add(self, question: str, answer: str, context_version: str):
+        """Remember an answered single-turn question."""
+        shingle_set = shingles(question)
+        if not shingle_set:
+            return
+        entry = {
+            'question': question,
+            'shingles': shingle_set,
+            'answer': answer,
+            'context_version': context_version,
+            'created': time.time(),
+        }
+
+        if not self.path:
+            with self._lock:
+                self._add(self._next_local_id, entry)
+                self._next_local_id -= 1
+            return
+
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT INTO answered_questions (question, shingles, answer, context_version, created) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (question, json.dumps(sorted(shingle_set)), answer, context_version, entry['created'])
+                )
+                self._inserts += 1
+                # Memory is pruned as rows are added to it, see _add()
+                if self._inserts % PRUNE_EVERY == 0:
+                    conn.execute('DELETE FROM answered_questions WHERE created < ?',
+                                 (entry['created'] - self.ttl_seconds,))
+        except sqlite3.Error as e:
+            print(f"Error writing question index: {e}")
+            return
+        # Picks up the new row (and anything other workers added) in id order
+        self.sync()
@@ -0,0 +1,218 @@
+"""
+Persistent cache of support assistant replies.
+
+Replies are keyed on everything that determines them: the model, the
+system prompt, the normalized question, the version of the documentation
+the context was built from, and a hash of the conversation history. A
+small in-memory LRU sits in front of a SQLite table that every worker
+shares, so a question answered once is served without an API call until
+its entry expires or the docs change.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from .metrics import metrics
+
+
+# Entries kept in each worker's in-memory front
+MEMORY_ENTRIES = 256
+
+# Evict from SQLite every this many writes rather than on each one
+EVICT_EVERY = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS response_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    reply TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_response_cache_last_used ON response_cache (last_used);
+"""
+
+
+def normalize_prompt(text: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return ' '.join(text.casefold().split()).rstrip('?!. ')
+
+
+def history_hash(history: Optional[List[Dict[str, str]]]) -> str:
+    """Stable hash of the role/content pairs of a conversation."""
+    pairs = [[msg.get('role', ''), msg.get('content', '')] for msg in (history or [])]
+    return hashlib.sha256(json.dumps(pairs, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def cache_key(model: str, system_prompt: str, prompt: str, context_version: str,
+              history: Optional[List[Dict[str, str]]] = None) -> str:
+    """
+    Build the cache key for one LLM call.
+
+    Args:
+        model: Model name
+        system_prompt: System prompt template (so prompt edits invalidate)
+        prompt: The user's message; normalized before hashing
+        context_version: Fingerprint of the documents the context came from
+        history: Prior turns sent along with the message, if any
+
+    Returns:
+        Hex digest identifying the call
+    """
+    parts = [
+        model,
+        hashlib.sha256(system_prompt.encode('utf-8')).hexdigest(),
+        normalize_prompt(prompt),
+        context_version,
+        history_hash(history),
+    ]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU memory front over a SQLite store with TTL and size eviction.
+
+    Args:
+        path: SQLite file; None keeps only the in-memory front
+        ttl_seconds: Entries older than this are ignored and deleted
+        max_entries: SQLite rows kept; the least recently used go first
+        memory_entries: Size of the in-memory LRU
+    """
+
+    def __init__(self, path: Optional[str], ttl_seconds: float = 86400, max_entries: int = 5000,
+                 memory_entries: int = MEMORY_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._connect() as conn:
+                # WAL lets workers read while another one writes
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection, committing on success."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str, record_miss: bool = True) -> Optional[str]:
+        """
+        Return the cached reply for ``key`` or None, recording hit/miss.
+        Polling callers pass ``record_miss=False`` to keep the miss count honest.
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                reply, created = entry
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    metrics.incr('response_cache.hits')
+                    metrics.incr('response_cache.memory_hits')
+                    return reply
+                del self._memory[key]
+
+        if self.path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        'SELECT reply, created FROM response_cache WHERE key = ?', (key,)
+                    ).fetchone()
+                    if row is not None and now - row[1] > self.ttl_seconds:
+                        conn.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+                        metrics.incr('response_cache.expired')
+                        row = None
+                    if row is not None:
+                        conn.execute(
+                            'UPDATE response_cache SET last_used = ?, hits = hits + 1 WHERE key = ?',
+                            (now, key)
+                        )
+                        self._remember(key, row[0], row[1])
+                        metrics.incr('response_cache.hits')
+                        return row[0]
+            except sqlite3.Error as e:
+                print(f"Error reading response cache: {e}")
+
+        if record_miss:
+            metrics.incr('response_cache.misses')
+        return None
+
+    def put(self, key: str, model: str, reply: str):
+        """Store a reply under ``key``."""
+        now = time.time()
+        self._remember(key, reply, now)
+        metrics.incr('response_cache.stores')
+
+        if not self.path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO response_cache (key, model, reply, created, last_used, hits) '
+                    'VALUES (?, ?, ?, ?, ?, 0)',
+                    (key, model, reply, now, now)
+                )
+                with self._lock:
+                    self._writes += 1
+                    evict = self._writes % EVICT_EVERY == 0
+                if evict:
+                    self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Error writing response cache: {e}")
+
+    def evict(self):
+        """Drop expired rows, then the least recently used beyond ``max_entries``."""
+        if self.path:
+            with self._connect() as conn:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        expired = conn.execute(
+            'DELETE FROM response_cache WHERE created < ?', (time.time() - self.ttl_seconds,)
+        ).rowcount
+        overflow = conn.execute(
+            'DELETE FROM response_cache WHERE key IN ('
+            '  SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        ).rowcount
+        if expired:
+            metrics.incr('response_cache.expired', expired)
+        if overflow:
+            metrics.incr('response_cache.evictions', overflow)
+
+    def clear(self):
+        """Forget every cached reply."""
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM response_cache')
+
+    def _remember(self, key: str, reply: str, created: float):
+        with self._lock:
+            self._memory[key] = (reply, created)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+                metrics.incr('response_cache.memory_evictions')
@@ -0,0 +1,230 @@
+"""
+Keyword retrieval over the indexed documentation using BM25.
+
+Sections of the document index are the retrieval units. The BM25 postings
+are rebuilt only when the document index content changes (its fingerprint),
+so scoring a question is a handful of dictionary lookups.
+"""
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from .tokens import estimate_tokens
+
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for',
+    'from', 'how', 'i', 'if', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on',
+    'or', 'so', 'that', 'the', 'there', 'this', 'to', 'was', 'what', 'when',
+    'where', 'which', 'who', 'why', 'will', 'with', 'you', 'your', 'we', 'our',
+    'should', 'would', 'could', 'any', 'all', 'about', 'into', 'than', 'then',
+    'these', 'those', 'them', 'they', 'their', 's', 't', 'll', 've', 're', 'd',
+}
+
+# Heading words describe the whole section, so they count extra
+HEADING_WEIGHT = 3
+
+# Stems mapped onto the wording the docs use, so paraphrases share features.
+# Words that are app terms in their own right stay out: "open"/"new" bugs
+# are a status, not creating one, "fix" isn't editing, "sort" isn't
+# filtering and an account isn't a login.
+SYNONYMS = {
+    'mak': 'creat', 'add': 'creat', 'submit': 'creat',
+    'issu': 'bug', 'defect': 'bug', 'ticket': 'bug', 'problem': 'bug',
+    'remov': 'delet', 'eras': 'delet', 'discard': 'delet',
+    'chang': 'edit', 'updat': 'edit', 'modify': 'edit',
+    'admin': 'manag', 'administrator': 'manag', 'lead': 'manag',
+    'search': 'filter', 'find': 'filter',
+    'permission': 'rol', 'access': 'rol', 'allow': 'rol',
+    'sign': 'login', 'password': 'login',
+}
+
+
+def stem(token: str) -> str:
+    """Very small suffix stripper so 'creating', 'created' and 'create' match."""
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if len(token) > len(suffix) + 2 and token.endswith(suffix):
+            token = token[:-len(suffix)]
+            break
+    if len(token) > 3 and token.endswith('e'):
+        token = token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-alphanumerics, drop stopwords and stem."""
+    return [stem(t) for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def canonical_tokens(text: str) -> List[str]:
+    """``tokenize`` with paraphrases mapped onto one term via ``SYNONYMS``."""
+    return [SYNONYMS.get(token, token) for token in tokenize(text)]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of text units.
+
+    Args:
+        units: List of dicts with 'text' and optional 'heading'; any other
+            keys are carried through untouched
+        k1: Term frequency saturation
+        b: Length normalization strength
+    """
+
+    def __init__(self, units: List[dict], k1: float = 1.5, b: float = 0.75):
+        self.units = units
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths: List[int] = []
+        self._kind_filters: Dict[frozenset, Set[int]] = {}
+        # Reads a unit's kind without building the unit (see from_postings)
+        self.kind_of: Optional[Callable[[int], Optional[str]]] = None
+        # Fingerprint of the document index snapshot the units came from
+        self.fingerprint: Optional[str] = None
+
+        for unit_id, unit in enumerate(units):
+            terms = Counter(tokenize(unit['text']))
+            for term in tokenize(unit.get('heading', '')):
+                terms[term] += HEADING_WEIGHT
+            for term, tf in terms.items():
+                self.postings[term].append((unit_id, tf))
+            self.lengths.append(sum(terms.values()))
+
+        count = len(units)
+        self.avg_length = (sum(self.lengths) / count) if count else 0.0
+        self.idf = {
+            term: math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+
+    @classmethod
+    def from_postings(cls, units: Sequence[dict], postings: Mapping[str, Sequence[Tuple[int, int]]],
+                      lengths: Sequence[int], idf: Dict[str, float], k1: float = 1.5, b: float = 0.75,
+                      kind_of: Optional[Callable[[int], Optional[str]]] = None) -> 'BM25Index':
+        """
+        Rebuild an index from saved postings, lengths and IDF weights without re-tokenizing ``units``.
+
+        ``units`` may build each unit when it is first read; ``kind_of``
+        then lets kind filters skip building them.
+        """
+        index = cls([], k1, b)
+        index.units = units
+        index.kind_of = kind_of
+        index.postings = postings
+        index.lengths = lengths
+        index.avg_length = (sum(lengths) / len(units)) if units else 0.0
+        index.idf = idf
+        return index
+
+    def score(self, query: str, allowed: Optional[Set[int]] = None) -> List[Tuple[float, int]]:
+        """
+        Score units against a query.
+
+        Args:
+            query: Free-text question
+            allowed: Optional set of unit ids to restrict scoring to
+
+        Returns:
+            List of (score, unit_id) with positive scores, best first
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        avg_length = self.avg_length or 1.0
+
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf[term]
+            for unit_id, tf in posting:
+                if allowed is not None and unit_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[unit_id] / avg_length)
+                scores[unit_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(((s, u) for u, s in scores.items() if s > 0), reverse=True)
+
+    def units_of_kinds(self, kinds: Set[str]) -> Set[int]:
+        """Ids of units whose 'kind' is in ``kinds`` (memoized per kind set)."""
+        key = frozenset(kinds)
+        allowed = self._kind_filters.get(key)
+        if allowed is None:
+            if self.kind_of is not None:
+                allowed = {i for i in range(len(self.units)) if self.kind_of(i) in key}
+            else:
+                allowed = {i for i, unit in enumerate(self.units) if unit.get('kind') in key}
+            self._kind_filters[key] = allowed
+        return allowed
+
+
+def section_units(documents: Iterable[dict]) -> List[dict]:
+    """Flatten indexed documents into BM25 units, one per non-empty section."""
+    units = []
+    for doc_pos, document in enumerate(documents):
+        for section_pos, section in enumerate(document['sections']):
+            if section['text'].strip():
+                units.append(section_unit(document, doc_pos, section_pos))
+    return units
+
+
+def section_unit(document: dict, doc_pos: int, section_pos: int) -> dict:
+    """The BM25 unit for one section of an indexed document."""
+    section = document['sections'][section_pos]
+    return {
+        'document': document,
+        'doc_pos': doc_pos,
+        'section_pos': section_pos,
+        'path': document['path'],
+        'kind': document['kind'],
+        'heading': f"{section['heading']} {document['path']}",
+        'text': section['text'],
+        'tokens': section['tokens'] if 'tokens' in section else estimate_tokens(section['text']),
+    }
+
+
+_bm25_cache: Dict[str, Tuple[str, BM25Index]] = {}
+_bm25_lock = threading.Lock()
+
+
+def get_bm25_index(document_index) -> BM25Index:
+    """Return the BM25 index for a document index, rebuilding it on change."""
+    key = str(document_index.base)
+    cached = _bm25_cache.get(key)
+    if cached is not None and cached[0] == document_index.fingerprint:
+        return cached[1]
+
+    with _bm25_lock:
+        cached = _bm25_cache.get(key)
+        if cached is None or cached[0] != document_index.fingerprint:
+            fingerprint = document_index.fingerprint
+            bm25 = BM25Index(section_units(document_index.documents()))
+            bm25.fingerprint = fingerprint
+            _bm25_cache[key] = (fingerprint, bm25)
+            cached = _bm25_cache[key]
+
+    return cached[1]
+
+
+def prime_bm25_index(document_index, bm25: BM25Index):
+    """Install a prebuilt index for ``bm25.fingerprint`` so it is not rebuilt on first use."""
+    with _bm25_lock:
+        _bm25_cache[str(document_index.base)] = (bm25.fingerprint, bm25)
+
+
+def rank_sections(document_index, query: str, kinds: Set[str]) -> List[Tuple[float, dict]]:
+    """
+    Rank indexed sections of the given kinds against a query.
+
+    Returns:
+        List of (score, unit) best first; units carry 'document', 'doc_pos',
+        'section_pos', 'path', 'kind' and 'text'
+    """
+    bm25 = get_bm25_index(document_index)
+    allowed = bm25.units_of_kinds(kinds)
+    return [(score, bm25.units[unit_id]) for score, unit_id in bm25.score(query, allowed)]
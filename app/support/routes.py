@@ -4,17 +4,249 @@ Flask routes for support chat functionality.
 
 import os
 import json
+import sqlite3
+import time
 from datetime import datetime
 from pathlib import Path
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, session
 
-from .llm_helper import call_llm, call_llm_with_history
+from .admission import AdmissionController, Overloaded, retry_after_header
+from .article_answers import answer_from_articles
+from .article_catalog import SORTS, ArticleCatalog
+from .article_html import ArticleRenderer
+from .chat_log import CACHE_OUTCOMES, ChatLog
+from .llm_client import CircuitBreaker, RetryBudget, configure_llm_client
+from .llm_helper import (
+    DEFAULT_MODEL, ERROR_REPLY, StreamInterrupted, call_llm, call_llm_with_history, stream_llm
+)
 from .context_builder import build_context
-from .prompts import SUPPORT_ASSISTANT_PROMPT, ARTICLE_GENERATION_PROMPT
+from .conversations import ConversationStore, history_messages
+from .doc_index import configure_document_index, get_document_index
+from .jobs import JobRunner
+from .metrics import metrics
+from .question_index import QuestionIndex
+from .response_cache import ResponseCache, cache_key
+from .single_flight import SingleFlight
+from .usage import GROUP_BY, UsageLog, prompt_breakdown
+from .prompts import SUPPORT_ASSISTANT_PROMPT, ARTICLE_GENERATION_PROMPT, OUT_OF_SCOPE_REPLY, REDIRECT_ARTICLES
+from .scope_classifier import ScopeClassifier
 
 support_bp = Blueprint('support', __name__, url_prefix='/api/support')
 
 
+@support_bp.record_once
+def configure_support(state):
+    """Point the document index and LLM client at the app's settings when registered."""
+    config = state.app.config
+    configure_document_index(
+        config.get('BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(__file__)))),
+        state_dir=config.get('SUPPORT_STATE_DIR'),
+        poll_interval=config.get('SUPPORT_INDEX_POLL_SECONDS', 5.0),
+        bundle_path=config.get('SUPPORT_CONTEXT_BUNDLE') or None
+    )
+    configure_llm_client(
+        base_url=config.get('OPENAI_BASE_URL'),
+        timeout=config.get('SUPPORT_LLM_TIMEOUT'),
+        deadline=config.get('SUPPORT_LLM_DEADLINE'),
+        max_retries=config.get('SUPPORT_LLM_MAX_RETRIES'),
+        pool_size=config.get('SUPPORT_LLM_POOL_SIZE'),
+        retry_budget=RetryBudget(ratio=config.get('SUPPORT_LLM_RETRY_BUDGET', 0.2)),
+        breaker=CircuitBreaker(
+            failure_threshold=config.get('SUPPORT_LLM_BREAKER_FAILURES', 5),
+            reset_timeout=config.get('SUPPORT_LLM_BREAKER_RESET', 30)
+        )
+    )
+
+
+def get_response_cache():
+    """
+    Return the app-wide reply cache, or None when caching is disabled
+    (``SUPPORT_RESPONSE_CACHE_TTL`` of 0).
+    """
+    if 'support_response_cache' not in current_app.extensions:
+        ttl = current_app.config.get('SUPPORT_RESPONSE_CACHE_TTL', 86400)
+        cache = None
+        if ttl > 0:
+            state_dir = current_app.config.get('SUPPORT_STATE_DIR')
+            cache = ResponseCache(
+                os.path.join(state_dir, 'support_cache.db') if state_dir else None,
+                ttl_seconds=ttl,
+                max_entries=current_app.config.get('SUPPORT_RESPONSE_CACHE_MAX_ENTRIES', 5000)
+            )
+        current_app.extensions['support_response_cache'] = cache
+    return current_app.extensions['support_response_cache']
+
+
+def get_question_index():
+    """
+    Return the app-wide near-duplicate question index, or None when
+    ``SUPPORT_SIMILAR_QUESTION_THRESHOLD`` is 0 or caching is disabled.
+    """
+    if 'support_question_index' not in current_app.extensions:
+        threshold = current_app.config.get('SUPPORT_SIMILAR_QUESTION_THRESHOLD', 0.6)
+        ttl = current_app.config.get('SUPPORT_RESPONSE_CACHE_TTL', 86400)
+        index = None
+        if threshold > 0 and ttl > 0:
+            state_dir = current_app.config.get('SUPPORT_STATE_DIR')
+            index = QuestionIndex(
+                os.path.join(state_dir, 'support_cache.db') if state_dir else None,
+                threshold=threshold,
+                ttl_seconds=ttl
+            )
+        current_app.extensions['support_question_index'] = index
+    return current_app.extensions['support_question_index']
+
+
+def get_scope_classifier():
+    """
+    Return the app-wide out-of-scope classifier trained on
+    BOT_BEHAVIOR_EXAMPLES.md, or None when ``SUPPORT_SCOPE_THRESHOLD`` is 0
+    or the examples file is missing.
+    """
+    if 'support_scope_classifier' not in current_app.extensions:
+        classifier = None
+        if current_app.config.get('SUPPORT_SCOPE_THRESHOLD', 0.85) > 0:
+            base_path = current_app.config.get('BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+            classifier = ScopeClassifier.from_file(os.path.join(base_path, 'BOT_BEHAVIOR_EXAMPLES.md'))
+        current_app.extensions['support_scope_classifier'] = classifier
+    return current_app.extensions['support_scope_classifier']
+
+
+def get_single_flight():
+    """
+    Return the app-wide coalescer for identical in-flight chat requests, or
+    None when ``SUPPORT_COALESCE_SECONDS`` is 0. Workers coordinate through
+    the reply cache database when ``SUPPORT_COALESCE_ACROSS_WORKERS`` is set
+    and caching is enabled.
+    """
+    if 'support_single_flight' not in current_app.extensions:
+        wait_seconds = current_app.config.get('SUPPORT_COALESCE_SECONDS', 30)
+        flights = None
+        if wait_seconds > 0:
+            state_dir = current_app.config.get('SUPPORT_STATE_DIR')
+            shared = (current_app.config.get('SUPPORT_COALESCE_ACROSS_WORKERS', True)
+                      and state_dir and get_response_cache() is not None)
+            flights = SingleFlight(
+                os.path.join(state_dir, 'support_cache.db') if shared else None,
+                wait_seconds=wait_seconds
+            )
+        current_app.extensions['support_single_flight'] = flights
+    return current_app.extensions['support_single_flight']
+
+
+def get_conversation_store():
+    """Return the app-wide server-side conversation store."""
+    store = current_app.extensions.get('support_conversations')
+    if store is None:
+        state_dir = current_app.config.get('SUPPORT_STATE_DIR') or current_app.instance_path
+        store = current_app.extensions.setdefault(
+            'support_conversations',
+            ConversationStore(os.path.join(state_dir, 'support_conversations.db'))
+        )
+    return store
+
+
+def get_usage_log():
+    """Return the app-wide token usage log."""
+    log = current_app.extensions.get('support_usage')
+    if log is None:
+        state_dir = current_app.config.get('SUPPORT_STATE_DIR') or current_app.instance_path
+        log = current_app.extensions.setdefault(
+            'support_usage', UsageLog(os.path.join(state_dir, 'support_usage.db'))
+        )
+    return log
+
+
+def get_chat_log():
+    """Return the app-wide chat analytics log, or None when ``SUPPORT_CHAT_LOG`` is off."""
+    if 'support_chat_log' not in current_app.extensions:
+        log = None
+        if current_app.config.get('SUPPORT_CHAT_LOG', True):
+            state_dir = current_app.config.get('SUPPORT_STATE_DIR') or current_app.instance_path
+            log = ChatLog(os.path.join(state_dir, 'support_analytics.db'))
+        current_app.extensions.setdefault('support_chat_log', log)
+    return current_app.extensions['support_chat_log']
+
+
+def get_admission():
+    """Return the app-wide rate limits and LLM concurrency cap for the chat endpoints."""
+    admission = current_app.extensions.get('support_admission')
+    if admission is None:
+        config = current_app.config
+        admission = current_app.extensions.setdefault('support_admission', AdmissionController(
+            user_rate=config.get('SUPPORT_RATE_PER_MINUTE', 20) / 60,
+            user_burst=config.get('SUPPORT_RATE_BURST', 5),
+            global_rate=config.get('SUPPORT_GLOBAL_RATE_PER_MINUTE', 0) / 60,
+            global_burst=config.get('SUPPORT_GLOBAL_RATE_BURST', 20),
+            max_concurrent=config.get('SUPPORT_LLM_MAX_CONCURRENT', 4),
+            max_queue=config.get('SUPPORT_LLM_QUEUE', 8),
+            queue_timeout=config.get('SUPPORT_LLM_QUEUE_TIMEOUT', 10),
+            max_waiters=config.get('SUPPORT_COALESCE_MAX_WAITERS', 8)
+        ))
+    return admission
+
+
+def admit():
+    """
+    Apply the caller's rate limits.
+    
+    Returns:
+        None when the request may go ahead, else a 429 response
+    """
+    user_id = session.get('user_id')
+    try:
+        get_admission().check_rate(f"user:{user_id}" if user_id is not None else f"ip:{request.remote_addr}")
+    except Overloaded as e:
+        return overloaded_response(e)
+    return None
+
+
+def overloaded_response(error):
+    """429 with a Retry-After for a shed request."""
+    response = jsonify({'error': 'Too many requests, please try again shortly',
+                        'retry_after': int(retry_after_header(error.retry_after))})
+    response.status_code = 429
+    response.headers['Retry-After'] = retry_after_header(error.retry_after)
+    return response
+
+
+def get_article_catalog():
+    """Return the app-wide help-article catalog."""
+    catalog = current_app.extensions.get('support_article_catalog')
+    if catalog is None:
+        catalog = current_app.extensions.setdefault('support_article_catalog', ArticleCatalog())
+    return catalog
+
+
+def get_article_renderer():
+    """Return the app-wide help-article renderer, caching HTML under the state directory."""
+    renderer = current_app.extensions.get('support_article_renderer')
+    if renderer is None:
+        state_dir = current_app.config.get('SUPPORT_STATE_DIR') or current_app.instance_path
+        renderer = current_app.extensions.setdefault(
+            'support_article_renderer', ArticleRenderer(os.path.join(state_dir, 'article_html'))
+        )
+    return renderer
+
+
+def get_job_runner():
+    """
+    Return the app-wide background job runner, or None when
+    ``SUPPORT_JOB_WORKERS`` is 0 and jobs run inside the request.
+    """
+    if 'support_jobs' not in current_app.extensions:
+        workers = current_app.config.get('SUPPORT_JOB_WORKERS', 2)
+        runner = None
+        if workers > 0:
+            state_dir = current_app.config.get('SUPPORT_STATE_DIR') or current_app.instance_path
+            runner = JobRunner(os.path.join(state_dir, 'support_jobs.db'), workers=workers,
+                               context=current_app._get_current_object().app_context)
+            for kind, handler in JOB_HANDLERS.items():
+                runner.register(kind, handler)
+        current_app.extensions['support_jobs'] = runner
+    return current_app.extensions['support_jobs']
+
+
 def extract_proposed_article(response_text):
     """
     Extract the proposed help article from the assistant's response.
@@ -46,6 +278,82 @@ def extract_proposed_article(response_text):
     return False, None, None
 
 
+def sse_event(event, payload):
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def event_stream(events):
+    """Wrap an iterator of SSE strings in an unbuffered streaming response."""
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop nginx and similar proxies from holding tokens back
+        'X-Accel-Buffering': 'no'
+    })
+
+
+def reply_response(reply, stream, **extra):
+    """Send a finished reply as JSON, or as a one-token event stream."""
+    payload = dict({'reply': reply, 'timestamp': datetime.utcnow().isoformat()}, **extra)
+    if stream:
+        return event_stream([sse_event('token', {'text': reply}), sse_event('done', payload)])
+    return jsonify(payload)
+
+
+def run_after(events, *callbacks):
+    """Relay ``events``, then run ``callbacks`` even if the client went away."""
+    try:
+        yield from events
+    finally:
+        for callback in callbacks:
+            callback()
+
+
+def stream_chat(conversation, context, on_complete, conversation_id=None):
+    """
+    Relay a streamed completion as 'token' events, then a 'done' event with
+    the full reply. ``on_complete(reply, usage, latency_ms, first_token_at)``
+    runs once the reply has finished; ``first_token_at`` is a
+    ``time.perf_counter()`` reading.
+    
+    A stream that breaks off part way ends with an 'error' event instead of
+    'done', and ``on_complete`` gets ERROR_REPLY so the partial reply is
+    neither cached nor kept in the conversation.
+    """
+    started = time.perf_counter()
+    first_token_at = None
+    parts = []
+    usage = {}
+    try:
+        for fragment in stream_llm(
+            system_prompt=SUPPORT_ASSISTANT_PROMPT,
+            conversation_history=conversation,
+            context=context,
+            usage=usage
+        ):
+            if not parts:
+                first_token_at = time.perf_counter()
+                metrics.observe('chat.first_token_ms', (first_token_at - started) * 1000)
+            parts.append(fragment)
+            yield sse_event('token', {'text': fragment})
+    except StreamInterrupted:
+        metrics.incr('chat.stream_interrupted')
+        on_complete(ERROR_REPLY, usage, (time.perf_counter() - started) * 1000, first_token_at)
+        yield sse_event('error', {'error': ERROR_REPLY, 'conversation_id': conversation_id})
+        return
+    
+    reply = ''.join(parts)
+    latency_ms = (time.perf_counter() - started) * 1000
+    metrics.observe('chat.llm_ms', latency_ms)
+    on_complete(reply, usage, latency_ms, first_token_at)
+    yield sse_event('done', {
+        'reply': reply,
+        'timestamp': datetime.utcnow().isoformat(),
+        'conversation_id': conversation_id,
+        'cached': False
+    })
+
+
 @support_bp.route('/chat', methods=['POST'])
 def chat():
     """
@@ -54,17 +362,30 @@ def chat():
     Expected JSON payload:
     {
         "message": "How do I create a bug report?",
-        "conversation": [  // Optional: conversation history
-            {"role": "user", "content": "..."},
-            {"role": "assistant", "content": "..."}
-        ]
+        "conversation_id": "...",  // Optional: omit to start a conversation
+        "stream": true  // Optional: reply as server-sent events
     }
     
+    History is kept server-side under the conversation id. Clients that
+    still send "conversation": [{"role": ..., "content": ...}] without an id
+    have that history used as-is.
+    
     Returns:
     {
         "reply": "To create a bug report...",
-        "timestamp": "2025-12-06T10:30:00"
+        "timestamp": "2025-12-06T10:30:00",
+        "conversation_id": "...",
+        "cached": false,
+        "similar_to": "How do I create a bug?",  // Only for near-duplicate matches
+        "out_of_scope": true,  // Only for the redirect sent without the LLM,
+        "from_article": true,  // or for a help-article section sent without it,
+        "articles": [{"title": ..., "path": ...}]  // with the articles it links
     }
+    
+    With "stream": true the response is text/event-stream: one "token"
+    event per fragment ({"text": "..."}) and a final "done" event carrying
+    the JSON object above, or an "error" event ({"error": "...",
+    "conversation_id": "..."}) if the reply broke off part way.
     """
     try:
         data = request.get_json()
@@ -72,44 +393,357 @@ def chat():
         if not data or 'message' not in data:
             return jsonify({'error': 'Message is required'}), 400
         
+        request_started = time.perf_counter()
         user_message = data['message']
-        conversation_history = data.get('conversation', [])
+        conversation_id = data.get('conversation_id')
+        stream = bool(data.get('stream'))
+        user_id = session.get('user_id')
+        chat_log = get_chat_log()
+        
+        shed = admit()
+        if shed is not None:
+            if chat_log is not None:
+                chat_log.log(user_message, 'shed', total_ms=(time.perf_counter() - request_started) * 1000,
+                             user_id=user_id, conversation_id=conversation_id, streamed=stream)
+            return shed
+        
+        if 'conversation' in data and not conversation_id:
+            conversation_history = list(data['conversation'])
+            # Older widgets include the new message as the last history entry
+            if conversation_history and conversation_history[-1].get('role') == 'user' \
+                    and conversation_history[-1].get('content') == user_message:
+                conversation_history.pop()
+            store = None
+        else:
+            store = get_conversation_store()
+            # Someone else's (or an unknown) conversation id starts a new conversation
+            if not store.exists(conversation_id, user_id):
+                conversation_id = store.create(user_id)
+            summary, recent = store.window(
+                conversation_id, current_app.config.get('SUPPORT_HISTORY_TOKENS', 1500)
+            )
+            conversation_history = history_messages(summary, recent)
+        
+        usage_log = get_usage_log()
+        retrieved = []
+        context_stats = {}
+        
+        def record(reply, outcome, context='', api_usage=None, latency_ms=None, first_token_at=None):
+            breakdown = prompt_breakdown(SUPPORT_ASSISTANT_PROMPT, context, conversation_history, user_message)
+            usage_log.record(
+                'chat', DEFAULT_MODEL, breakdown,
+                reply, api_usage=api_usage, cached=outcome in CACHE_OUTCOMES, user_id=user_id,
+                conversation_id=conversation_id, latency_ms=latency_ms
+            )
+            if chat_log is not None:
+                finished = time.perf_counter()
+                chat_log.log(
+                    user_message, outcome, sections=retrieved, context=context,
+                    context_tokens=breakdown['context_tokens'],
+                    duplicate_tokens=context_stats.get('duplicate_tokens', 0), api_usage=api_usage,
+                    first_token_ms=((first_token_at or finished) - request_started) * 1000,
+                    total_ms=(finished - request_started) * 1000, user_id=user_id,
+                    conversation_id=conversation_id, follow_up=bool(conversation_history), streamed=stream,
+                    article_proposed=extract_proposed_article(reply)[0]
+                )
+            if store is not None and reply != ERROR_REPLY:
+                # The reply may already be sent, so a failed write is logged rather than raised
+                try:
+                    store.append(conversation_id, [
+                        {"role": "user", "content": user_message},
+                        {"role": "assistant", "content": reply}
+                    ])
+                except sqlite3.Error as e:
+                    print(f"Error saving conversation turns: {e}")
+        
+        # Questions about features the app doesn't have get the fixed redirect locally
+        classifier = get_scope_classifier()
+        if classifier is not None:
+            threshold = current_app.config.get('SUPPORT_SCOPE_THRESHOLD', 0.85)
+            started = time.perf_counter()
+            out_of_scope = classifier.is_out_of_scope(user_message, threshold)
+            metrics.observe('chat.scope_check_ms', (time.perf_counter() - started) * 1000)
+            if out_of_scope:
+                metrics.incr('chat.local_redirects')
+                record(OUT_OF_SCOPE_REPLY, 'redirect', latency_ms=0.0)
+                return reply_response(OUT_OF_SCOPE_REPLY, stream, conversation_id=conversation_id, cached=False,
+                                      out_of_scope=True, articles=REDIRECT_ARTICLES)
         
         # Get repository base path
         base_path = current_app.config.get('BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
         
-        # Build context from documentation and code
+        # Identical question + docs + history means an identical prompt
+        context_version = get_document_index(base_path).fingerprint
+        cache = get_response_cache()
+        key = cache_key(DEFAULT_MODEL, SUPPORT_ASSISTANT_PROMPT, user_message,
+                        context_version, conversation_history)
+        if cache is not None:
+            reply = cache.get(key)
+            if reply is not None:
+                record(reply, 'cache')
+                return reply_response(reply, stream, conversation_id=conversation_id, cached=True)
+        
+        # A first question worded like one already answered gets that answer
+        questions = get_question_index() if not conversation_history else None
+        if questions is not None:
+            match = questions.lookup(user_message, context_version)
+            if match is not None:
+                record(match[1]['answer'], 'similar')
+                return reply_response(match[1]['answer'], stream, conversation_id=conversation_id,
+                                      cached=True, similar_to=match[1]['question'])
+        
+        # A first question a help-article section clearly answers gets that section
+        article_threshold = current_app.config.get('SUPPORT_ARTICLE_ANSWER_THRESHOLD', 0.7)
+        if article_threshold > 0 and not conversation_history:
+            answer = answer_from_articles(get_document_index(base_path), user_message, article_threshold)
+            if answer is not None:
+                record(answer['reply'], 'article', latency_ms=0.0)
+                return reply_response(answer['reply'], stream, conversation_id=conversation_id, cached=False,
+                                      from_article=True, articles=answer['articles'])
+        
+        admission = get_admission()
+        flights = get_single_flight()
+        flight = None
+        
+        def shed(error):
+            if chat_log is not None:
+                chat_log.log(user_message, 'shed', total_ms=(time.perf_counter() - request_started) * 1000,
+                             user_id=user_id, conversation_id=conversation_id,
+                             follow_up=bool(conversation_history), streamed=stream)
+            return overloaded_response(error)
+        
+        streaming = False
+        try:
+            # The same request already in flight (here or in another worker) shares its reply.
+            # Waiting for it holds one of a bounded number of waiter places, kept apart from the
+            # slot queue so the request computing the reply is never shed because of its waiters.
+            # If that request fails, one of its waiters computes the reply for the rest.
+            if flights is not None:
+                try:
+                    flight, reply = flights.join(
+                        key, lambda: cache.get(key, record_miss=False) if cache is not None else None,
+                        hold=admission.waiting)
+                except Overloaded as e:
+                    return shed(e)
+                if reply is not None:
+                    record(reply, 'coalesced')
+                    return reply_response(reply, stream, conversation_id=conversation_id, cached=True)
+        
+            # Wait for one of the limited LLM slots, or shed the request
+            try:
+                admission.acquire()
+            except Overloaded as e:
+                return shed(e)
+        
+            released = []
+        
+            def release():
+                if released:
+                    return
+                released.append(True)
+                admission.release()
+                if flight is not None:
+                    flight.finish(None)
+        
+            try:
+                # Build context from documentation and code
+                context = build_context(
+                    base_path=base_path,
+                    query=user_message,
+                    include_docs=True,
+                    include_code=True,
+                    sections=retrieved,
+                    stats=context_stats
+                )
+            except Exception:
+                admission.release()
+                raise
+        
+            def remember(reply, api_usage=None, latency_ms=None, first_token_at=None):
+                outcome = 'error' if reply == ERROR_REPLY else 'llm'
+                record(reply, outcome, context, api_usage, latency_ms, first_token_at)
+                if reply != ERROR_REPLY:
+                    if cache is not None:
+                        cache.put(key, DEFAULT_MODEL, reply)
+                    if questions is not None:
+                        questions.add(user_message, reply, context_version)
+                # After the cache write, so other workers find the reply once the lease is gone
+                if flight is not None:
+                    flight.finish(None if reply == ERROR_REPLY else reply)
+        
+            if stream:
+                conversation = conversation_history + [{"role": "user", "content": user_message}]
+                response = event_stream(run_after(stream_chat(conversation, context, remember, conversation_id),
+                                                  release))
+                # A stream closed before it starts never runs run_after's callbacks
+                response.call_on_close(release)
+                # From here the stream finishes the flight when it ends
+                streaming = True
+                return response
+        
+            # Call LLM
+            started = time.perf_counter()
+            api_usage = {}
+            try:
+                if conversation_history:
+                    reply = call_llm_with_history(
+                        system_prompt=SUPPORT_ASSISTANT_PROMPT,
+                        conversation_history=conversation_history + [{"role": "user", "content": user_message}],
+                        context=context,
+                        usage=api_usage
+                    )
+                else:
+                    reply = call_llm(
+                        system_prompt=SUPPORT_ASSISTANT_PROMPT,
+                        user_message=user_message,
+                        context=context,
+                        usage=api_usage
+                    )
+            finally:
+                admission.release()
+            latency_ms = (time.perf_counter() - started) * 1000
+            metrics.observe('chat.llm_ms', latency_ms)
+            remember(reply, api_usage, latency_ms)
+        
+            return reply_response(reply, False, conversation_id=conversation_id, cached=False)
+        finally:
+            # Every other way out (a shed, a coalesced or failed reply, an
+            # error anywhere) must still wake followers and free the lease;
+            # finish() does nothing if the reply was already published
+            if flight is not None and not streaming:
+                flight.finish(None)
+    
+    except Exception as e:
+        print(f"Error in chat endpoint: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+def write_article(payload):
+    """
+    Job handler: generate (or extract) a help article and save it.
+    
+    Args:
+        payload: {"topic", "conversation", "conversation_id", "user_id", "base_path"}
+        
+    Returns:
+        {"success": true, "article_path": ..., "title": ..., "content": ...}
+    """
+    topic = payload['topic']
+    conversation = payload['conversation']
+    base_path = payload['base_path']
+    
+    # Check if the last assistant message contains a proposed article
+    article_content = None
+    if conversation:
+        for msg in reversed(conversation):
+            if msg.get('role') == 'assistant':
+                has_article, extracted_content, extracted_title = extract_proposed_article(msg.get('content', ''))
+                if has_article:
+                    # Use the extracted article content directly
+                    article_content = extracted_content
+                    # Update topic if we found a better title
+                    if extracted_title:
+                        topic = extracted_title
+                    break
+    
+    # If no proposed article was found in conversation, generate a new one
+    if not article_content:
+        # Build context
         context = build_context(
             base_path=base_path,
-            query=user_message,
+            query=topic,
             include_docs=True,
             include_code=True
         )
         
-        # Call LLM
-        if conversation_history:
-            # Add current message to history
-            conversation_history.append({"role": "user", "content": user_message})
-            reply = call_llm_with_history(
-                system_prompt=SUPPORT_ASSISTANT_PROMPT,
-                conversation_history=conversation_history,
-                context=context
-            )
-        else:
-            reply = call_llm(
-                system_prompt=SUPPORT_ASSISTANT_PROMPT,
-                user_message=user_message,
-                context=context
-            )
+        # Format conversation history as string
+        conversation_text = "\n".join([
+            f"{msg['role'].upper()}: {msg['content']}"
+            for msg in conversation
+        ])
         
-        return jsonify({
-            'reply': reply,
-            'timestamp': datetime.utcnow().isoformat()
-        })
+        # Generate article using LLM
+        article_prompt = ARTICLE_GENERATION_PROMPT.format(
+            context=context,
+            conversation=conversation_text,
+            topic=topic
+        )
+        
+        started = time.perf_counter()
+        api_usage = {}
+        article_content = call_llm(
+            system_prompt="You are a technical documentation writer.",
+            user_message=article_prompt,
+            temperature=0.7,
+            usage=api_usage
+        )
+        # The article prompt embeds context, conversation and topic; estimate each
+        get_usage_log().record(
+            'generate-article', DEFAULT_MODEL,
+            prompt_breakdown(ARTICLE_GENERATION_PROMPT.format(context='', conversation='', topic=''),
+                             context, conversation, topic),
+            article_content, api_usage=api_usage, user_id=payload.get('user_id'),
+            conversation_id=payload.get('conversation_id'),
+            latency_ms=(time.perf_counter() - started) * 1000
+        )
+        if article_content == ERROR_REPLY:
+            raise RuntimeError('The article could not be generated')
     
-    except Exception as e:
-        print(f"Error in chat endpoint: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+    # Save article to file
+    help_articles_dir = Path(base_path) / 'help_articles'
+    help_articles_dir.mkdir(exist_ok=True)
+    
+    # Create filename from topic
+    filename = topic.lower().replace(' ', '-').replace('/', '-')
+    filename = ''.join(c for c in filename if c.isalnum() or c in ('-', '_'))
+    filename = f"{filename}.md"
+    
+    article_path = help_articles_dir / filename
+    
+    with open(article_path, 'w', encoding='utf-8') as f:
+        f.write(f"# {topic}\n\n")
+        f.write(f"_Generated on {datetime.utcnow().strftime('%Y-%m-%d')}_\n\n")
+        f.write(article_content)
+    
+    # Make the new article available to the next chat right away
+    get_document_index(base_path).refresh()
+    
+    return {
+        'success': True,
+        'article_path': f"help_articles/{filename}",
+        'title': topic,
+        'content': article_content
+    }
+
+
+def reindex_documents(payload):
+    """Job handler: re-read changed documentation and code into the document index."""
+    index = get_document_index(payload['base_path'])
+    changed = index.refresh()
+    return {'changed': changed, 'documents': len(index.documents()), 'fingerprint': index.fingerprint}
+
+
+JOB_HANDLERS = {
+    'generate-article': write_article,
+    'reindex': reindex_documents,
+}
+
+
+def start_job(kind, payload):
+    """
+    Run a job in the background and answer 202 with where to poll for it,
+    or run it now and answer with its result when background jobs are off.
+    """
+    runner = get_job_runner()
+    if runner is None:
+        return jsonify(JOB_HANDLERS[kind](payload))
+    
+    job_id = runner.submit(kind, payload, user_id=session.get('user_id'))
+    status_url = f"{support_bp.url_prefix}/jobs/{job_id}"
+    response = jsonify({'job_id': job_id, 'status': 'queued', 'status_url': status_url})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
 
 
 @support_bp.route('/generate-article', methods=['POST'])
@@ -117,16 +751,24 @@ def generate_article():
     """
     Generate a new help article based on the conversation and topic.
     
+    The article is written by a background job; poll the returned
+    status_url until the job is done.
+    
     Expected JSON payload:
     {
         "topic": "Creating a Bug Report",
-        "conversation": [
-            {"role": "user", "content": "..."},
-            {"role": "assistant", "content": "..."}
-        ]
+        "conversation_id": "..."  // Or "conversation": [{"role": ..., "content": ...}]
     }
     
-    Returns:
+    Returns (202):
+    {
+        "job_id": "...",
+        "status": "queued",
+        "status_url": "/api/support/jobs/..."
+    }
+    
+    The finished job's result (or, with SUPPORT_JOB_WORKERS=0, the
+    response itself) is:
     {
         "success": true,
         "article_path": "help_articles/creating-a-bug-report.md",
@@ -139,76 +781,24 @@ def generate_article():
         if not data or 'topic' not in data:
             return jsonify({'error': 'Topic is required'}), 400
         
-        topic = data['topic']
-        conversation = data.get('conversation', [])
+        shed = admit()
+        if shed is not None:
+            return shed
         
-        # Get repository base path
-        base_path = current_app.config.get('BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-        
-        # Check if the last assistant message contains a proposed article
-        article_content = None
-        if conversation:
-            for msg in reversed(conversation):
-                if msg.get('role') == 'assistant':
-                    has_article, extracted_content, extracted_title = extract_proposed_article(msg.get('content', ''))
-                    if has_article:
-                        # Use the extracted article content directly
-                        article_content = extracted_content
-                        # Update topic if we found a better title
-                        if extracted_title:
-                            topic = extracted_title
-                        break
-        
-        # If no proposed article was found in conversation, generate a new one
-        if not article_content:
-            # Build context
-            context = build_context(
-                base_path=base_path,
-                query=topic,
-                include_docs=True,
-                include_code=True
-            )
-            
-            # Format conversation history as string
-            conversation_text = "\n".join([
-                f"{msg['role'].upper()}: {msg['content']}"
-                for msg in conversation
-            ])
-            
-            # Generate article using LLM
-            article_prompt = ARTICLE_GENERATION_PROMPT.format(
-                context=context,
-                conversation=conversation_text,
-                topic=topic
-            )
-            
-            article_content = call_llm(
-                system_prompt="You are a technical documentation writer.",
-                user_message=article_prompt,
-                temperature=0.7
-            )
-        
-        # Save article to file
-        help_articles_dir = Path(base_path) / 'help_articles'
-        help_articles_dir.mkdir(exist_ok=True)
-        
-        # Create filename from topic
-        filename = topic.lower().replace(' ', '-').replace('/', '-')
-        filename = ''.join(c for c in filename if c.isalnum() or c in ('-', '_'))
-        filename = f"{filename}.md"
-        
-        article_path = help_articles_dir / filename
-        
-        with open(article_path, 'w', encoding='utf-8') as f:
-            f.write(f"# {topic}\n\n")
-            f.write(f"_Generated on {datetime.utcnow().strftime('%Y-%m-%d')}_\n\n")
-            f.write(article_content)
+        conversation = data.get('conversation', [])
+        if data.get('conversation_id'):
+            store = get_conversation_store()
+            if not store.exists(data['conversation_id'], session.get('user_id')):
+                return jsonify({'error': 'Conversation not found'}), 404
+            conversation = store.turns(data['conversation_id'], session.get('user_id'))
         
-        return jsonify({
-            'success': True,
-            'article_path': f"help_articles/{filename}",
-            'title': topic,
-            'content': article_content
+        return start_job('generate-article', {
+            'topic': data['topic'],
+            'conversation': conversation,
+            'conversation_id': data.get('conversation_id'),
+            'user_id': session.get('user_id'),
+            # Get repository base path
+            'base_path': current_app.config.get('BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
         })
     
     except Exception as e:
@@ -216,10 +806,62 @@ def generate_article():
         return jsonify({'error': 'Internal server error'}), 500
 
 
+@support_bp.route('/reindex', methods=['POST'])
+def reindex():
+    """
+    Re-read changed documentation and code into the chat index in the
+    background (managers only).
+    
+    Returns (202):
+    {
+        "job_id": "...",
+        "status": "queued",
+        "status_url": "/api/support/jobs/..."
+    }
+    """
+    if session.get('user_role') != 'manager':
+        return jsonify({'error': 'Manager access required'}), 403
+    
+    base_path = current_app.config.get('BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    return start_job('reindex', {'base_path': base_path})
+
+
+@support_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Poll a background job.
+    
+    Returns:
+    {
+        "id": "...",
+        "kind": "generate-article",
+        "status": "queued" | "running" | "done" | "failed",
+        "result": {...},  // When done
+        "error": "...",  // When failed
+        "created": 1765000000.0, "started": ..., "finished": ...
+    }
+    """
+    runner = get_job_runner()
+    job = runner.get(job_id) if runner is not None else None
+    # Jobs are private to whoever started them
+    if job is None or (job['user_id'] is not None and job['user_id'] != session.get('user_id')):
+        return jsonify({'error': 'Job not found'}), 404
+    
+    del job['user_id']
+    return jsonify(job)
+
+
 @support_bp.route('/articles', methods=['GET'])
 def list_articles():
     """
-    List all available help articles.
+    List the available help articles, a page at a time.
+    
+    Query parameters:
+        page: 1-based page number (default 1)
+        per_page: Articles per page (default 20, max 100)
+        sort: created (default, newest first), title or size
+        order: asc or desc (default depends on sort)
+        q: Only articles whose title or summary contains this
     
     Returns:
     {
@@ -227,39 +869,35 @@ def list_articles():
             {
                 "title": "Creating a Bug Report",
                 "path": "help_articles/creating-a-bug-report.md",
-                "created": "2025-12-06T10:30:00"
+                "created": "2025-12-06T10:30:00",
+                "size": 2048,
+                "summary": "Creating a bug report in the Bug Tracker is..."
             }
-        ]
+        ],
+        "total": 42,
+        "page": 1,
+        "per_page": 20,
+        "pages": 3
     }
     """
+    sort = request.args.get('sort', 'created')
+    if sort not in SORTS:
+        return jsonify({'error': f"sort must be one of: {', '.join(SORTS)}"}), 400
+    order = request.args.get('order')
+    if order not in (None, 'asc', 'desc'):
+        return jsonify({'error': 'order must be asc or desc'}), 400
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = max(1, min(int(request.args.get('per_page', 20)), 100))
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be numbers'}), 400
+    
     try:
         base_path = current_app.config.get('BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-        help_articles_dir = Path(base_path) / 'help_articles'
-        
-        articles = []
-        
-        if help_articles_dir.exists():
-            for article_file in help_articles_dir.glob('*.md'):
-                try:
-                    with open(article_file, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                        # Extract title from first heading
-                        title = article_file.stem.replace('-', ' ').title()
-                        for line in lines:
-                            if line.startswith('# '):
-                                title = line[2:].strip()
-                                break
-                        
-                        articles.append({
-                            'title': title,
-                            'path': f"help_articles/{article_file.name}",
-                            'created': datetime.fromtimestamp(article_file.stat().st_mtime).isoformat()
-                        })
-                except Exception as e:
-                    print(f"Error reading article {article_file}: {e}")
-                    continue
-        
-        return jsonify({'articles': articles})
+        return jsonify(get_article_catalog().page(
+            get_document_index(base_path), sort=sort, descending=None if order is None else order == 'desc',
+            page=page, per_page=per_page, query=request.args.get('q', '').strip()
+        ))
     
     except Exception as e:
         print(f"Error in list-articles endpoint: {e}")
@@ -269,37 +907,109 @@ def list_articles():
 @support_bp.route('/article/<path:filename>', methods=['GET'])
 def get_article(filename):
     """
-    Get the content of a specific help article.
+    Get the content of a specific help article, with its rendered HTML.
+    
+    The response carries an ETag of the article's content; a request with
+    a matching If-None-Match gets 304 without the article being read.
     
     Returns:
     {
         "title": "Creating a Bug Report",
-        "content": "# Creating a Bug Report\n\n..."
+        "content": "# Creating a Bug Report\n\n...",
+        "html": "<h1>Creating a Bug Report</h1>..."
     }
     """
     try:
         base_path = current_app.config.get('BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-        article_path = Path(base_path) / 'help_articles' / filename
+        help_articles_dir = (Path(base_path) / 'help_articles').resolve()
+        article_path = (help_articles_dir / filename).resolve()
         
-        if not article_path.exists() or not article_path.is_file():
+        if help_articles_dir not in article_path.parents or not article_path.is_file():
             return jsonify({'error': 'Article not found'}), 404
         
-        with open(article_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-            # Extract title
-            title = filename.replace('-', ' ').replace('.md', '').title()
-            lines = content.split('\n')
-            for line in lines:
-                if line.startswith('# '):
-                    title = line[2:].strip()
-                    break
+        renderer = get_article_renderer()
+        etag = renderer.etag(str(article_path))
+        if etag is not None and etag in request.if_none_match:
+            metrics.incr('articles.not_modified')
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        
+        etag, content, html = renderer.render(str(article_path))
         
-        return jsonify({
+        # Extract title
+        title = filename.replace('-', ' ').replace('.md', '').title()
+        lines = content.split('\n')
+        for line in lines:
+            if line.startswith('# '):
+                title = line[2:].strip()
+                break
+        
+        response = jsonify({
             'title': title,
-            'content': content
+            'content': content,
+            'html': html
         })
+        response.set_etag(etag)
+        # Cacheable, but revalidated on every view so edits show up at once
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     
     except Exception as e:
         print(f"Error in get-article endpoint: {e}")
         return jsonify({'error': 'Internal server error'}), 500
+
+
+@support_bp.route('/metrics', methods=['GET'])
+def support_metrics():
+    """
+    Report this worker's support assistant counters and timings.
+    
+    Returns:
+    {
+        "counters": {"response_cache.hits": 12, ...},
+        "timings": {"chat.llm_ms": {"count": 3, "total": 2400.0, "max": 950.0, "mean": 800.0}}
+    }
+    """
+    return jsonify(metrics.snapshot())
+
+
+@support_bp.route('/usage', methods=['GET'])
+def token_usage():
+    """
+    Query the token usage log (managers only).
+    
+    Query parameters:
+        group_by: endpoint (default), user, conversation or day
+        days: Look-back window in days (default 7)
+        endpoint: Only 'chat' or 'generate-article'
+        user_id: Only this user
+        limit: Number of recent rows to include (default 50, max 500)
+    
+    Returns:
+    {
+        "groups": [{"group": "chat", "requests": 40, "cached": 12, "prompt_tokens": 91000, ...}],
+        "recent": [{"created": 1765000000.0, "endpoint": "chat", "user_id": 2, ...}]
+    }
+    """
+    if session.get('user_role') != 'manager':
+        return jsonify({'error': 'Manager access required'}), 403
+    
+    group_by = request.args.get('group_by', 'endpoint')
+    if group_by not in GROUP_BY:
+        return jsonify({'error': f"group_by must be one of: {', '.join(GROUP_BY)}"}), 400
+    
+    try:
+        days = float(request.args.get('days', 7))
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        user_id = request.args.get('user_id', type=int)
+    except ValueError:
+        return jsonify({'error': 'days and limit must be numbers'}), 400
+    
+    since = time.time() - days * 86400
+    endpoint = request.args.get('endpoint')
+    log = get_usage_log()
+    return jsonify({
+        'groups': log.summary(group_by, since, endpoint, user_id),
+        'recent': log.recent(limit, since, endpoint, user_id)
+    })
@@ -0,0 +1,132 @@
+"""
+Local classifier for questions about features the Bug Tracker doesn't have.
+
+The assistant answers those with a fixed redirect, so a question that is
+confidently out of scope can get that redirect without building context or
+calling the LLM. The model is multinomial naive Bayes over canonical terms
+and adjacent-term pairs, trained on the labelled questions and topic lists
+in BOT_BEHAVIOR_EXAMPLES.md. A question is redirected only when the model
+is confident *and* it contains at least one term that is itself a strong
+out-of-scope signal, so questions made of unfamiliar words go to the LLM.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from .question_index import shingles
+
+
+# A feature must be this many times likelier in out-of-scope examples to
+# count as an out-of-scope keyword
+KEYWORD_RATIO = 3.0
+
+USER_QUOTE_RE = re.compile(r'\*\*User:\*\*\s*"(.+?)"')
+QUOTED_RE = re.compile(r'"(.+?)"')
+TEST_GROUP_RE = re.compile(r'^\d+\.\s+\*\*(.+?)\*\*')
+
+
+def load_examples(path: str) -> List[Tuple[str, bool]]:
+    """
+    Labelled examples from BOT_BEHAVIOR_EXAMPLES.md.
+
+    User questions under the in-scope / out-of-scope headings, the "Will
+    Answer" / "Will Redirect" topic lists and the quoted test questions.
+
+    Returns:
+        List of (text, out_of_scope)
+    """
+    examples = []
+    label = None
+    in_code = False
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped.startswith('```'):
+                in_code = not in_code
+                continue
+            if in_code:
+                continue
+
+            if stripped.startswith('## '):
+                heading = stripped.lower()
+                label = True if 'out-of-scope' in heading else False if 'scope' in heading else None
+            elif stripped.startswith('### '):
+                if 'Will Answer' in stripped:
+                    label = False
+                elif 'Will Redirect' in stripped:
+                    label = True
+                elif 'Example' not in stripped:
+                    label = None
+            elif TEST_GROUP_RE.match(stripped):
+                group = TEST_GROUP_RE.match(stripped).group(1).lower()
+                label = None if not group.startswith('test') else 'out-of-scope' in group
+
+            if label is None:
+                continue
+            quote = USER_QUOTE_RE.search(stripped)
+            if quote:
+                examples.append((quote.group(1), label))
+            elif stripped.startswith('- '):
+                item = stripped[2:]
+                quoted = QUOTED_RE.search(item)
+                if quoted:
+                    examples.append((quoted.group(1), label))
+                elif not item.lower().startswith('any '):
+                    examples.append((item, label))
+    return examples
+
+
+class ScopeClassifier:
+    """
+    Naive Bayes over question shingles.
+
+    Args:
+        examples: (text, out_of_scope) pairs
+        alpha: Additive smoothing
+    """
+
+    def __init__(self, examples: List[Tuple[str, bool]], alpha: float = 0.5):
+        counts = {True: Counter(), False: Counter()}
+        for text, out_of_scope in examples:
+            counts[out_of_scope].update(shingles(text))
+        vocabulary = set(counts[True]) | set(counts[False])
+        totals = {label: sum(c.values()) + alpha * len(vocabulary) for label, c in counts.items()}
+
+        # Per-feature log-likelihood ratio, out-of-scope over in-scope; classes
+        # get equal priors since the examples aren't a sample of real traffic
+        self.log_ratio = {
+            feature: math.log((counts[True][feature] + alpha) / totals[True])
+            - math.log((counts[False][feature] + alpha) / totals[False])
+            for feature in vocabulary
+        }
+        self.examples = len(examples)
+
+    @classmethod
+    def from_file(cls, path: str) -> Optional['ScopeClassifier']:
+        """Train on an examples file; None when it is missing or has no examples of either kind."""
+        if not os.path.exists(path):
+            return None
+        examples = load_examples(path)
+        if not any(label for _, label in examples) or all(label for _, label in examples):
+            return None
+        return cls(examples)
+
+    def probability(self, question: str) -> Tuple[float, List[str]]:
+        """
+        Probability that ``question`` is out of scope.
+
+        Returns:
+            (probability, out-of-scope keywords found in the question)
+        """
+        features = [f for f in shingles(question) if f in self.log_ratio]
+        score = sum(self.log_ratio[f] for f in features)
+        keywords = [f for f in features if self.log_ratio[f] >= math.log(KEYWORD_RATIO)]
+        return 1 / (1 + math.exp(-max(-50.0, min(50.0, score)))), keywords
+
+    def is_out_of_scope(self, question: str, threshold: float) -> bool:
+        """Whether to answer with the redirect without asking the LLM."""
+        probability, keywords = self.probability(question)
+        return bool(keywords) and probability >= threshold
@@ -0,0 +1,223 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+When several requests need the same reply at once, the first one in a
+worker computes it and the others wait for its result. With a SQLite path
+the first worker also takes a lease on the key, and the first request in
+every other worker waits for it too. It polls a shared lookup (the reply
+cache) until the reply appears or the lease is released or expires.
+If the leader fails, its waiters start over and one of them leads the
+retry, rather than each making its own attempt.
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import ExitStack, contextmanager, nullcontext
+from typing import Callable, ContextManager, Dict, Optional, Tuple
+
+from .metrics import metrics
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flight_leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+# How many times waiters whose leader failed start over under a new leader
+REJOINS = 2
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class Flight:
+    """
+    One request's part in a coalesced computation.
+
+    Every request that begins a flight must call ``finish()`` once its
+    reply is known (None if it failed); only the request that owns the
+    computation in this worker actually publishes it.
+    """
+
+    def __init__(self, group: 'SingleFlight', key: str, call: _Call, owner: bool):
+        self.group = group
+        self.key = key
+        self.call = call
+        self.owner = owner
+        self.lease_token = None
+        self.done = False
+        self.leader_failed = False
+
+    def wait(self, lookup: Optional[Callable[[], Optional[str]]] = None,
+             hold: Callable[[], ContextManager] = nullcontext) -> Optional[str]:
+        """
+        Wait for another request's result.
+
+        Args:
+            lookup: Reads a result another worker may have published
+            hold: Context manager held only while actually waiting, such
+                as a place in an admission queue; what it raises propagates
+
+        Returns:
+            The shared result, or None when this request should compute it
+            (it leads, the leader failed, or the wait timed out)
+        """
+        group = self.group
+        if not self.owner:
+            with hold():
+                if self.call.event.wait(group.wait_seconds):
+                    if self.call.result is not None:
+                        metrics.incr('single_flight.coalesced')
+                        return self.call.result
+                    self.leader_failed = True
+            return None
+        if group.path is None:
+            return None
+
+        give_up = time.monotonic() + group.wait_seconds
+        held = False
+        with ExitStack() as waiting:
+            while True:
+                if group._acquire(self):
+                    # The previous holder publishes before releasing its lease
+                    result = lookup() if lookup else None
+                    if result is not None:
+                        metrics.incr('single_flight.remote_coalesced')
+                        self.finish(result)
+                    return result
+                result = lookup() if lookup else None
+                if result is not None:
+                    metrics.incr('single_flight.remote_coalesced')
+                    self.finish(result)
+                    return result
+                if time.monotonic() >= give_up:
+                    return None
+                if not held:
+                    # Another worker holds the lease: from here on this request waits
+                    waiting.enter_context(hold())
+                    held = True
+                time.sleep(group.poll_interval)
+
+    def finish(self, result: Optional[str]):
+        """Publish the result to waiting requests and release the lease."""
+        if self.done:
+            return
+        self.done = True
+        if self.owner:
+            self.group._complete(self.key, self.call, result)
+        if self.lease_token:
+            self.group._release(self)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent requests for the same key.
+
+    Args:
+        path: SQLite file for cross-worker leases; None coalesces within
+            this worker only
+        wait_seconds: Longest a request waits before computing on its own
+        lease_seconds: A lease left by a crashed worker expires after this
+        poll_interval: Seconds between checks for another worker's result
+    """
+
+    def __init__(self, path: Optional[str] = None, wait_seconds: float = 30, lease_seconds: float = 60,
+                 poll_interval: float = 0.05):
+        self.path = path
+        self.wait_seconds = wait_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection, committing on success."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def begin(self, key: str) -> Flight:
+        """Join the in-flight computation for ``key``, or start one."""
+        with self._lock:
+            call = self._calls.get(key)
+            owner = call is None
+            if owner:
+                call = self._calls[key] = _Call()
+        metrics.incr('single_flight.leaders' if owner else 'single_flight.followers')
+        return Flight(self, key, call, owner)
+
+    def join(self, key: str, lookup: Optional[Callable[[], Optional[str]]] = None,
+             hold: Callable[[], ContextManager] = nullcontext) -> Tuple[Flight, Optional[str]]:
+        """
+        Begin a flight for ``key`` and wait for its result.
+
+        Waiters whose leader failed begin again, so one of them leads the
+        retry while the rest keep waiting (up to ``REJOINS`` times).
+
+        Returns:
+            The flight, which must be finished, and the shared result or
+            None when this request should compute it
+        """
+        for attempt in range(REJOINS + 1):
+            flight = self.begin(key)
+            try:
+                result = flight.wait(lookup, hold)
+            except BaseException:
+                flight.finish(None)
+                raise
+            if result is not None or not flight.leader_failed:
+                break
+            metrics.incr('single_flight.rejoins')
+        return flight, result
+
+    def _complete(self, key: str, call: _Call, result: Optional[str]):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result = result
+        call.event.set()
+
+    def _acquire(self, flight: Flight) -> bool:
+        token = secrets.token_hex(8)
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM flight_leases WHERE key = ? AND expires < ?', (flight.key, now))
+                acquired = conn.execute(
+                    'INSERT OR IGNORE INTO flight_leases (key, owner, expires) VALUES (?, ?, ?)',
+                    (flight.key, token, now + self.lease_seconds)
+                ).rowcount == 1
+        except sqlite3.Error as e:
+            print(f"Error taking request lease: {e}")
+            # Without the lease table, behave as if no other worker were busy
+            return True
+        if acquired:
+            flight.lease_token = token
+        return acquired
+
+    def _release(self, flight: Flight):
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM flight_leases WHERE key = ? AND owner = ?',
+                             (flight.key, flight.lease_token))
+        except sqlite3.Error as e:
+            print(f"Error releasing request lease: {e}")
@@ -0,0 +1,31 @@
+"""
+Local token estimation for prompt budgeting.
+
+This is a tokenizer-free approximation of BPE token counts: every word or
+punctuation mark is at least one token and long words cost one extra token
+per ~6 characters. It is meant for budgeting and attribution, not billing;
+actual usage comes from the API response.
+"""
+
+import re
+
+
+PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+# Rough chars-per-token ratio used to convert character budgets
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate how many tokens ``text`` costs in a prompt.
+
+    Args:
+        text: Any prompt text
+
+    Returns:
+        Estimated token count (0 for empty text)
+    """
+    if not text:
+        return 0
+    return sum(1 + (len(piece) - 1) // 6 for piece in PIECE_RE.findall(text))
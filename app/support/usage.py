@@ -0,0 +1,206 @@
+"""
+Token accounting for support assistant requests.
+
+Every chat reply and generated article is logged with the token usage the
+API reported and a local estimate of each prompt component (system
+prompt, documentation context, conversation history, the user's message),
+tagged with the endpoint, user and conversation. The log is a SQLite table
+that can be queried directly or through ``/api/support/usage``; running
+totals also go into the metrics registry.
+"""
+
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from .metrics import metrics
+from .tokens import estimate_tokens
+
+
+COMPONENTS = ('system', 'context', 'history', 'message')
+
+# Columns the summary can be grouped by
+GROUP_BY = {
+    'endpoint': 'endpoint',
+    'user': 'user_id',
+    'conversation': 'conversation_id',
+    'day': "date(created, 'unixepoch')",
+}
+
+# Delete rows older than this every PRUNE_EVERY inserts
+RETENTION_SECONDS = 90 * 24 * 3600
+PRUNE_EVERY = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_usage (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    endpoint TEXT NOT NULL,
+    user_id INTEGER,
+    conversation_id TEXT,
+    model TEXT NOT NULL,
+    cached INTEGER NOT NULL DEFAULT 0,
+    system_tokens INTEGER NOT NULL DEFAULT 0,
+    context_tokens INTEGER NOT NULL DEFAULT 0,
+    history_tokens INTEGER NOT NULL DEFAULT 0,
+    message_tokens INTEGER NOT NULL DEFAULT 0,
+    reply_tokens INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS ix_token_usage_created ON token_usage (created);
+CREATE INDEX IF NOT EXISTS ix_token_usage_user ON token_usage (user_id, created);
+"""
+
+
+def prompt_breakdown(system_prompt: str = '', context: str = '',
+                     history: Optional[List[Dict[str, str]]] = None, message: str = '') -> Dict[str, int]:
+    """
+    Estimate the tokens each prompt component contributes.
+
+    Args:
+        system_prompt: System prompt template, without the context filled in
+        context: Documentation context injected into the system prompt
+        history: Earlier messages sent with the request
+        message: The new user message (or article prompt)
+
+    Returns:
+        Dict of '<component>_tokens' -> estimated tokens
+    """
+    return {
+        'system_tokens': estimate_tokens(system_prompt.replace('{context}', '')),
+        'context_tokens': estimate_tokens(context),
+        'history_tokens': sum(estimate_tokens(m.get('content', '')) for m in (history or [])),
+        'message_tokens': estimate_tokens(message),
+    }
+
+
+class UsageLog:
+    """
+    Append-only SQLite log of token usage, shared by every worker.
+
+    Args:
+        path: SQLite file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._inserts = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection, committing on success."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, endpoint: str, model: str, breakdown: Dict[str, int], reply: str,
+               api_usage: Optional[Dict[str, int]] = None, cached: bool = False,
+               user_id: Optional[int] = None, conversation_id: Optional[str] = None,
+               latency_ms: Optional[float] = None):
+        """
+        Log one request.
+
+        Args:
+            endpoint: 'chat' or 'generate-article'
+            model: Model the request was (or would have been) sent to
+            breakdown: Output of ``prompt_breakdown``
+            reply: Text returned to the user
+            api_usage: {'prompt_tokens', 'completion_tokens'} from the API
+                response; None when no call was made or none was reported
+            cached: Whether the reply came from a cache instead of the API
+            user_id: Logged-in user, if any
+            conversation_id: Server-side conversation, if any
+            latency_ms: Time spent in the LLM call
+        """
+        api_usage = api_usage or {}
+        row = dict(breakdown, reply_tokens=estimate_tokens(reply))
+
+        metrics.incr(f'usage.{endpoint}.requests')
+        if cached:
+            metrics.incr(f'usage.{endpoint}.cached')
+        for name in ('prompt_tokens', 'completion_tokens'):
+            if api_usage.get(name) is not None:
+                metrics.incr(f'usage.{endpoint}.{name}', api_usage[name])
+        for name, value in row.items():
+            metrics.incr(f'usage.{endpoint}.estimated_{name}', value)
+
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT INTO token_usage (created, endpoint, user_id, conversation_id, model, cached, '
+                    'system_tokens, context_tokens, history_tokens, message_tokens, reply_tokens, '
+                    'prompt_tokens, completion_tokens, latency_ms) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (time.time(), endpoint, user_id, conversation_id, model, int(cached),
+                     row['system_tokens'], row['context_tokens'], row['history_tokens'],
+                     row['message_tokens'], row['reply_tokens'],
+                     api_usage.get('prompt_tokens'), api_usage.get('completion_tokens'), latency_ms)
+                )
+                self._inserts += 1
+                if self._inserts % PRUNE_EVERY == 0:
+                    conn.execute('DELETE FROM token_usage WHERE created < ?', (time.time() - RETENTION_SECONDS,))
+        except sqlite3.Error as e:
+            print(f"Error writing token usage: {e}")
+
+    def _filters(self, since: float, endpoint: Optional[str], user_id: Optional[int]):
+        clauses, params = ['created >= ?'], [since]
+        if endpoint:
+            clauses.append('endpoint = ?')
+            params.append(endpoint)
+        if user_id is not None:
+            clauses.append('user_id = ?')
+            params.append(user_id)
+        return ' AND '.join(clauses), params
+
+    def summary(self, group_by: str = 'endpoint', since: float = 0, endpoint: Optional[str] = None,
+                user_id: Optional[int] = None) -> List[dict]:
+        """
+        Aggregate usage per group, largest total first.
+
+        Args:
+            group_by: One of ``GROUP_BY``
+            since: Only rows created at or after this Unix time
+            endpoint: Only this endpoint
+            user_id: Only this user
+
+        Returns:
+            List of dicts with the group value, request and cache counts,
+            API token totals and the mean estimated size of each component
+        """
+        column = GROUP_BY[group_by]
+        where, params = self._filters(since, endpoint, user_id)
+        means = ', '.join(f'AVG({c}_tokens) AS mean_{c}_tokens' for c in COMPONENTS + ('reply',))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f'SELECT {column} AS "group", COUNT(*) AS requests, SUM(cached) AS cached, '
+                f'COALESCE(SUM(prompt_tokens), 0) AS prompt_tokens, '
+                f'COALESCE(SUM(completion_tokens), 0) AS completion_tokens, '
+                f'MAX(COALESCE(prompt_tokens, 0) + COALESCE(completion_tokens, 0)) AS max_request_tokens, '
+                f'{means} FROM token_usage WHERE {where} GROUP BY {column} '
+                f'ORDER BY SUM(COALESCE(prompt_tokens, 0) + COALESCE(completion_tokens, 0)) DESC, '
+                f'COUNT(*) DESC',
+                params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def recent(self, limit: int = 50, since: float = 0, endpoint: Optional[str] = None,
+               user_id: Optional[int] = None) -> List[dict]:
+        """Most recent log rows, newest first."""
+        where, params = self._filters(since, endpoint, user_id)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f'SELECT * FROM token_usage WHERE {where} ORDER BY id DESC LIMIT ?', params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,273 @@
+"""
+Offline vector retrieval for the support context builder.
+
+Chunks are embedded locally with a hashed feature projection (stemmed
+words mapped through the shared synonym table, word bigrams and character trigrams,
+IDF-weighted and L2-normalized), so no document text leaves the machine.
+The embedding matrix is saved as a ``.npy`` file and loaded with
+``mmap_mode='r'``: every worker maps the same file, the OS shares its pages
+between them, and a query is one matrix-vector product plus a partial sort.
+
+NumPy is optional; without it ``get_vector_index()`` returns None and the
+context builder uses BM25 alone.
+"""
+
+import json
+import math
+import os
+import threading
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # vector search is optional
+    np = None
+
+from .retrieval import canonical_tokens, get_bm25_index
+
+
+# Embedding width; 256 float32s keeps 10k chunks in ~10 MB
+EMBEDDING_DIM = 256
+
+# Relative weights of the hashed feature families
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.5
+TRIGRAM_WEIGHT = 0.25
+
+# Weight of the vector ranking relative to the BM25 ranking in the fusion
+VECTOR_WEIGHT = 1.0
+
+# Nearest neighbours fetched per query before fusion
+VECTOR_TOP_K = 40
+
+# Reciprocal rank fusion damping; small values favour each list's top hits
+RRF_K = 10
+
+
+def _features(text: str) -> Counter:
+    """Hashed-projection features for a text, before IDF weighting."""
+    words = canonical_tokens(text)
+    features = Counter()
+    for i, word in enumerate(words):
+        features['w:' + word] += WORD_WEIGHT
+        if i:
+            features[f"b:{words[i - 1]}_{word}"] += BIGRAM_WEIGHT
+        padded = f"#{word}#"
+        for j in range(len(padded) - 2):
+            features['c:' + padded[j:j + 3]] += TRIGRAM_WEIGHT
+    return features
+
+
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    """Stable (bucket, sign) for a feature; crc32 is identical in every process."""
+    h = zlib.crc32(feature.encode('utf-8'))
+    return h % dim, (1.0 if h & 0x80000000 else -1.0)
+
+
+class HashedEmbedder:
+    """
+    Signed feature hashing into ``dim`` buckets with bucket-level IDF.
+
+    Args:
+        dim: Embedding width
+        idf: Per-bucket IDF weights from ``fit``; None means unweighted
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, idf=None):
+        self.dim = dim
+        self.idf = idf
+        self._bucket_cache: Dict[str, Tuple[int, float]] = {}
+
+    def _raw(self, text: str):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in _features(text).items():
+            cached = self._bucket_cache.get(feature)
+            if cached is None:
+                cached = self._bucket_cache[feature] = _bucket(feature, self.dim)
+            bucket, sign = cached
+            vector[bucket] += sign * (1.0 + math.log(weight)) if weight >= 1 else sign * weight
+        return vector
+
+    def fit_transform(self, texts: List[str]):
+        """Embed a corpus, learning bucket IDF weights from it."""
+        raw = np.vstack([self._raw(text) for text in texts]) if texts else np.zeros((0, self.dim), np.float32)
+        df = np.count_nonzero(raw, axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+        return self._normalize(raw * self.idf)
+
+    def transform(self, text: str):
+        """Embed one query with the fitted IDF weights."""
+        vector = self._raw(text)
+        if self.idf is not None:
+            vector *= self.idf
+        return self._normalize(vector[None, :])[0]
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).astype(np.float32)
+
+
+class VectorIndex:
+    """
+    Row-aligned embeddings for the BM25 units of one document index snapshot.
+
+    Row ``i`` of ``matrix`` embeds ``bm25.units[i]`` for the snapshot with
+    ``fingerprint``.
+    """
+
+    def __init__(self, fingerprint: str, matrix, embedder: HashedEmbedder, kinds: List[str]):
+        self.fingerprint = fingerprint
+        self.matrix = matrix
+        self.embedder = embedder
+        self.kinds = np.array(kinds) if kinds else np.array([], dtype=str)
+        self._masks: Dict[frozenset, object] = {}
+
+    @classmethod
+    def build(cls, fingerprint: str, units: List[dict], dim: int = EMBEDDING_DIM) -> 'VectorIndex':
+        embedder = HashedEmbedder(dim)
+        texts = [f"{unit.get('heading', '')}\n{unit['text']}" for unit in units]
+        matrix = embedder.fit_transform(texts)
+        return cls(fingerprint, matrix, embedder, [unit.get('kind', '') for unit in units])
+
+    def save(self, directory: Path):
+        """Write the matrix and metadata atomically (matrix first)."""
+        directory.mkdir(parents=True, exist_ok=True)
+        suffix = f'.{os.getpid()}.tmp'
+        matrix_path = directory / 'support_vectors.npy'
+        meta_path = directory / 'support_vectors.json'
+
+        with open(str(matrix_path) + suffix, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        os.replace(str(matrix_path) + suffix, matrix_path)
+
+        with open(str(meta_path) + suffix, 'w', encoding='utf-8') as f:
+            json.dump({
+                'fingerprint': self.fingerprint,
+                'rows': int(self.matrix.shape[0]),
+                'dim': self.embedder.dim,
+                'idf': self.embedder.idf.tolist(),
+                'kinds': self.kinds.tolist(),
+            }, f)
+        os.replace(str(meta_path) + suffix, meta_path)
+
+    @classmethod
+    def load(cls, directory: Path, fingerprint: str) -> Optional['VectorIndex']:
+        """Memory-map a saved index if it matches ``fingerprint``."""
+        matrix_path = directory / 'support_vectors.npy'
+        meta_path = directory / 'support_vectors.json'
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('fingerprint') != fingerprint:
+                return None
+            matrix = np.load(matrix_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        if matrix.shape != (meta['rows'], meta['dim']):
+            return None
+
+        embedder = HashedEmbedder(meta['dim'], np.array(meta['idf'], dtype=np.float32))
+        return cls(fingerprint, matrix, embedder, meta['kinds'])
+
+    def search(self, query: str, k: int = VECTOR_TOP_K, kinds: Optional[Set[str]] = None) -> List[Tuple[float, int]]:
+        """
+        Cosine top-k over the matrix.
+
+        Returns:
+            List of (similarity, row) best first, positive similarities only
+        """
+        if self.matrix.shape[0] == 0:
+            return []
+
+        scores = self.matrix @ self.embedder.transform(query)
+        if kinds is not None:
+            scores = np.where(self._kind_mask(kinds), scores, -1.0)
+
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[row]), int(row)) for row in top if scores[row] > 0]
+
+    def _kind_mask(self, kinds: Set[str]):
+        key = frozenset(kinds)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self._masks[key] = np.isin(self.kinds, list(key))
+        return mask
+
+
+_vector_cache: Dict[str, VectorIndex] = {}
+_vector_lock = threading.Lock()
+
+
+def get_vector_index(document_index) -> Optional[VectorIndex]:
+    """
+    Return the vector index for a document index, loading or building it
+    when the documents change. Returns None when NumPy is not installed.
+    """
+    if np is None:
+        return None
+
+    key = str(document_index.base)
+    cached = _vector_cache.get(key)
+    bm25 = get_bm25_index(document_index)
+    if cached is not None and cached.fingerprint == bm25.fingerprint:
+        return cached
+
+    with _vector_lock:
+        cached = _vector_cache.get(key)
+        if cached is None or cached.fingerprint != bm25.fingerprint:
+            directory = document_index.index_path.parent if document_index.index_path else None
+            cached = VectorIndex.load(directory, bm25.fingerprint) if directory else None
+            if cached is None:
+                cached = VectorIndex.build(bm25.fingerprint, bm25.units)
+                if directory:
+                    try:
+                        cached.save(directory)
+                        # Re-open from disk so this worker shares pages with the others
+                        cached = VectorIndex.load(directory, bm25.fingerprint) or cached
+                    except OSError as e:
+                        print(f"Error saving vector index: {e}")
+            _vector_cache[key] = cached
+
+    return cached
+
+
+def prime_vector_index(document_index, vectors: VectorIndex):
+    """Install prebuilt vectors for ``vectors.fingerprint`` so they are not loaded or built on first use."""
+    with _vector_lock:
+        _vector_cache[str(document_index.base)] = vectors
+
+
+def hybrid_rank(document_index, query: str, kinds: Set[str]) -> List[Tuple[float, dict]]:
+    """
+    Rank sections by BM25 fused with vector similarity.
+
+    The two rankings are combined with reciprocal rank fusion, so scores on
+    different scales never need calibrating and a chunk that only the
+    vector search finds (a paraphrase with no shared keywords) can still
+    outrank weak keyword matches.
+
+    Returns:
+        List of (score, unit) best first, like ``rank_sections``
+    """
+    bm25 = get_bm25_index(document_index)
+    ranked = bm25.score(query, bm25.units_of_kinds(kinds))
+    vectors = get_vector_index(document_index)
+    if vectors is None or vectors.fingerprint != bm25.fingerprint:
+        return [(score, bm25.units[unit_id]) for score, unit_id in ranked]
+
+    combined: Dict[int, float] = {}
+    for rank, (_score, unit_id) in enumerate(ranked):
+        combined[unit_id] = 1.0 / (RRF_K + rank)
+    for rank, (_similarity, unit_id) in enumerate(vectors.search(query, VECTOR_TOP_K, kinds)):
+        combined[unit_id] = combined.get(unit_id, 0.0) + VECTOR_WEIGHT / (RRF_K + rank)
+
+    return sorted(((score, bm25.units[unit_id]) for unit_id, score in combined.items()),
+                  key=lambda pair: pair[0], reverse=True)
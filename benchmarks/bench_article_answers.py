@@ -0,0 +1,104 @@
+"""
+Hit rate and precision of extractive answers from the help articles.
+
+Runs questions labelled with the help-article sections that answer them,
+plus questions the help articles don't answer, through
+answer_from_articles(). For each confidence threshold it reports the share
+answered without the LLM, how many of those answers came from a section
+labelled relevant, and the time an extractive answer takes.
+
+Usage:
+    python benchmarks/bench_article_answers.py [--show 0.8]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.support.article_answers import answer_from_articles
+from app.support.doc_index import get_document_index
+from app.support.metrics import metrics
+
+
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+
+# Question -> (article, heading substring) of sections that answer it
+ANSWERED = {
+    "How do I create a bug report?": [('how-to-create-a-bug-report.md', 'Steps to Create a Bug Report')],
+    "What can a manager do?": [('understanding-user-roles.md', 'Manager Role')],
+    "What are reporters allowed to do?": [('understanding-user-roles.md', 'Reporter Role')],
+    "What's the difference between a reporter and a manager?": [
+        ('understanding-user-roles.md', 'Permission Comparison Table'),
+        ('understanding-user-roles.md', 'Reporter Role'),
+        ('understanding-user-roles.md', 'Manager Role'),
+    ],
+    "How can I tell which role I have?": [('understanding-user-roles.md', 'How to Tell Your Role')],
+    "What do the severity levels mean?": [('getting-started-guide.md', 'Severity Levels')],
+    "What bug statuses are there?": [('getting-started-guide.md', 'Bug Statuses')],
+    "How do I log in?": [('getting-started-guide.md', 'Log In')],
+    "Why can't I delete a bug?": [('understanding-user-roles.md', 'When Deleting Bugs'),
+                                 ('understanding-user-roles.md', 'Role-Based Restrictions')],
+    "What happens after I submit a bug report?": [('how-to-create-a-bug-report.md', 'What Happens Next')],
+    "Any tips for writing a good bug report?": [('how-to-create-a-bug-report.md', 'Tips for Writing Good Bug Reports')],
+    "How do managers triage bugs?": [('getting-started-guide.md', 'Triaging Bugs')],
+    "How do I delete a bug report?": [('understanding-user-roles.md', 'When Deleting Bugs')],
+    "How do I edit a bug report?": [('understanding-user-roles.md', 'When Editing Bugs')],
+    "Can managers create bug reports?": [('understanding-user-roles.md', 'Manager Role'),
+                                         ('understanding-user-roles.md', 'Permission Comparison Table')],
+}
+
+# Questions no help article answers; any extractive answer for these is wrong
+UNANSWERED = [
+    "How do I generate an HTML report of bug statistics?",
+    "Why does the dashboard show an error after I log in?",
+    "Can I attach a screenshot to a bug?",
+    "How do I reset another user's password?",
+    "What happens to a bug when it is reopened?",
+    "How are bugs sorted on the dashboard?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--show', type=float, help='print each answer at this threshold')
+    args = parser.parse_args()
+
+    index = get_document_index(ROOT)
+    questions = list(ANSWERED.items()) + [(q, []) for q in UNANSWERED]
+
+    results = []
+    started = time.perf_counter()
+    for question, relevant in questions:
+        answer = answer_from_articles(index, question, threshold=0.0)
+        correct = answer is not None and any(
+            answer['articles'][0]['path'] == f'help_articles/{article}' and heading.lower() in answer['heading'].lower()
+            for article, heading in relevant
+        )
+        results.append((question, answer, correct, bool(relevant)))
+    per_question_ms = (time.perf_counter() - started) * 1000 / len(questions)
+
+    answerable = sum(1 for r in results if r[3])
+    print(f"{len(questions)} questions ({answerable} answered by a labelled help-article section); "
+          f"{per_question_ms:.2f}ms per lookup\n")
+    print(f"{'threshold':>9} {'local':>6} {'correct':>8} {'wrong':>6}")
+    for threshold in THRESHOLDS:
+        served = [r for r in results if r[1] is not None and r[1]['confidence'] >= threshold]
+        correct = sum(1 for r in served if r[2])
+        print(f"{threshold:>9.1f} {len(served) / len(results):>6.0%} {correct:>8} {len(served) - correct:>6}")
+
+    if args.show is not None:
+        for question, answer, correct, _ in results:
+            if answer is None or answer['confidence'] < args.show:
+                continue
+            print(f"\n{'OK' if correct else 'WRONG'} {answer['confidence']:.2f} {question!r} -> "
+                  f"{answer['articles'][0]['path']} / {answer['heading']}")
+            print('    ' + answer['reply'][:300].replace('\n', '\n    '))
+    metrics.reset()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+End-to-end benchmark of the support chat pipeline against a fake provider.
+
+Drives /api/support/chat (plain and streamed) and /generate-article through
+the Flask app (context build, prompt formatting, the pooled LLM client,
+proposed-article extraction, usage logging) with the LLM served by
+benchmarks/fake_llm_server.py, and reports throughput and latency
+percentiles. "overhead" is each request's end-to-end time minus the LLM
+call time recorded in the usage log, i.e. the part that is our own code,
+so it can be tracked separately from provider latency. chat-burst sends
+the same question from every client to measure request coalescing.
+generate-article requests are timed until their background job has
+finished. article-extract times only the generate-article request that
+saves the article proposed in a preceding chat reply (its req/s includes
+that chat).
+
+Reply caching, rate limits and the LLM concurrency cap are disabled so
+every request reaches the provider. The app
+runs against a scratch copy of the repository so generated articles are
+not written into help_articles/.
+
+Usage:
+    python benchmarks/bench_chat.py [--requests 100] [--concurrency 8] [--latency 0.3]
+        [--tokens-per-second 80] [--error-rate 0] [--scenarios chat,chat-stream,chat-burst,generate-article,article-extract]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from app.support import routes
+from app.support.llm_helper import ERROR_REPLY
+from fake_llm_server import start_server
+
+
+SCENARIOS = ['chat', 'chat-stream', 'chat-burst', 'generate-article', 'article-extract']
+
+QUESTIONS = [
+    "How do I create a bug report?",
+    "What's the difference between a reporter and a manager?",
+    "How do I filter bugs by status?",
+    "What do the severity levels mean?",
+    "How do I change the status of a bug?",
+    "Can I assign a bug to someone?",
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def make_app(base_path, state_dir, base_url):
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='bench', BASE_PATH=base_path, SUPPORT_STATE_DIR=state_dir,
+        SUPPORT_INDEX_POLL_SECONDS=0, SUPPORT_RESPONSE_CACHE_TTL=0, OPENAI_BASE_URL=base_url,
+        SUPPORT_RATE_PER_MINUTE=0, SUPPORT_LLM_MAX_CONCURRENT=0
+    )
+    app.register_blueprint(routes.support_bp)
+    return app
+
+
+def new_conversation(app, turns=()):
+    with app.app_context():
+        store = routes.get_conversation_store()
+        conversation_id = store.create()
+        if turns:
+            store.append(conversation_id, list(turns))
+    return conversation_id
+
+
+def job_result(client, response):
+    """The result of a generate-article request, polling its job when it went to the background."""
+    payload = response.get_json() or {}
+    if response.status_code != 202:
+        return payload
+    while True:
+        job = client.get(payload['status_url']).get_json()
+        if job['status'] not in ('queued', 'running'):
+            return job.get('result') or {}
+        time.sleep(0.01)
+
+
+def run_request(app, scenario, i):
+    """Run one request; return (ok, seconds, first_token_seconds, conversation_id)."""
+    client = app.test_client()
+    # Numbered so concurrent requests differ unless a scenario wants them identical
+    question = f"{QUESTIONS[i % len(QUESTIONS)]} (#{i})"
+    first_token = None
+
+    if scenario == 'article-extract':
+        # The proposed article is already in the conversation: no LLM call
+        chat = client.post('/api/support/chat', json={'message': f"Please write a help article: {question}"})
+        conversation_id = chat.get_json()['conversation_id']
+        started = time.perf_counter()
+        response = client.post('/api/support/generate-article', json={
+            'topic': question, 'conversation_id': conversation_id
+        })
+        ok = job_result(client, response).get('title') == 'Reporting a Bug Step by Step'
+        return ok, time.perf_counter() - started, None, None
+
+    if scenario == 'chat-burst':
+        # Everyone asks the same thing at once; identical requests share one LLM call
+        question = QUESTIONS[0]
+        scenario = 'chat'
+
+    started = time.perf_counter()
+    if scenario == 'chat':
+        response = client.post('/api/support/chat', json={'message': question})
+        payload = response.get_json()
+        routes.extract_proposed_article(payload.get('reply', ''))
+        ok = response.status_code == 200 and payload.get('reply') != ERROR_REPLY
+        return ok, time.perf_counter() - started, None, payload.get('conversation_id')
+
+    if scenario == 'chat-stream':
+        response = client.post('/api/support/chat', json={'message': question, 'stream': True}, buffered=False)
+        body = []
+        for part in response.response:
+            if first_token is None and b'event: token' in part:
+                first_token = time.perf_counter() - started
+            body.append(part)
+        response.close()
+        elapsed = time.perf_counter() - started
+        done = b''.join(body).rsplit(b'event: done\ndata: ', 1)
+        payload = json.loads(done[1]) if len(done) == 2 else {}
+        ok = response.status_code == 200 and payload.get('reply') not in (None, ERROR_REPLY)
+        return ok, elapsed, first_token, payload.get('conversation_id')
+
+    conversation_id = new_conversation(app)
+    response = client.post('/api/support/generate-article', json={
+        'topic': question, 'conversation_id': conversation_id
+    })
+    ok = job_result(client, response).get('success') is True
+    return ok, time.perf_counter() - started, None, conversation_id
+
+
+def run_scenario(app, scenario, requests, concurrency):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: run_request(app, scenario, i), range(requests)))
+    wall = time.perf_counter() - started
+
+    with app.app_context():
+        rows = routes.get_usage_log().recent(limit=100000)
+    llm_ms = {row['conversation_id']: row['latency_ms'] for row in rows if row['latency_ms'] is not None}
+
+    latencies = [r[1] * 1000 for r in results]
+    first_tokens = [r[2] * 1000 for r in results if r[2] is not None]
+    overheads = [r[1] * 1000 - llm_ms[r[3]] for r in results if r[3] in llm_ms]
+    if scenario == 'article-extract':
+        overheads = latencies
+    return {
+        'scenario': scenario,
+        'ok': sum(1 for r in results if r[0]),
+        'requests': requests,
+        'throughput': requests / wall,
+        'latency': latencies,
+        'first_token': first_tokens,
+        'overhead': overheads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=100, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.3, help='fake provider time to first token')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--base-url', help='use an already running fake server instead of starting one')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server, base_url = start_server(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                                        error_rate=args.error_rate, seed=1)
+    os.environ.setdefault('OPENAI_API_KEY', 'fake')
+
+    scratch = tempfile.mkdtemp(prefix='bench_chat_')
+    try:
+        base_path = os.path.join(scratch, 'repo')
+        shutil.copytree(ROOT, base_path, ignore=shutil.ignore_patterns('.git', 'instance', '__pycache__'))
+        app = make_app(base_path, os.path.join(scratch, 'state'), base_url)
+
+        # Warm up: document index, vector index, connection pool
+        run_request(app, 'chat', 0)
+
+        print(f"{args.requests} requests per scenario, concurrency {args.concurrency}, provider latency "
+              f"{args.latency * 1000:.0f}ms + {args.tokens_per_second:g} tokens/s, error rate {args.error_rate:g}\n")
+        print(f"{'scenario':<17} {'ok':>5} {'req/s':>7} {'p50':>8} {'p90':>8} {'p99':>8} "
+              f"{'ttft p50':>9} {'ovh p50':>8} {'ovh p99':>8}")
+        for scenario in args.scenarios.split(','):
+            result = run_scenario(app, scenario.strip(), args.requests, args.concurrency)
+            ttft = f"{percentile(result['first_token'], 50):>8.0f}ms" if result['first_token'] else f"{'-':>9}"
+            print(f"{result['scenario']:<17} {result['ok']:>5} {result['throughput']:>7.1f} "
+                  f"{percentile(result['latency'], 50):>6.0f}ms {percentile(result['latency'], 90):>6.0f}ms "
+                  f"{percentile(result['latency'], 99):>6.0f}ms {ttft} "
+                  f"{percentile(result['overhead'], 50):>6.1f}ms {percentile(result['overhead'], 99):>6.1f}ms")
+            if server is not None:
+                print(f"{'':<17} provider requests so far: {server.requests}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
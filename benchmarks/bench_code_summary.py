@@ -0,0 +1,110 @@
+"""
+Code context benchmark: AST summaries vs. raw source chunks.
+
+Indexes the repository twice. In the first index app/app.py and
+app/models.py are split into raw function-level source chunks (the old
+behaviour); in the second they are summarized by code_summary. Prints the
+tokens each file costs either way. Then, for questions that need the code,
+packs the context the chat would send and reports the tokens spent on
+code, the context as a whole, and whether the fact that answers the
+question made it in.
+
+Usage:
+    python benchmarks/bench_code_summary.py [--budget 15000] [--repeat 200]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.support import doc_index
+from app.support.code_summary import summarize_module
+from app.support.context_builder import format_chunks, select_ranked_chunks
+from app.support.doc_index import DocumentIndex
+from app.support.tokens import CHARS_PER_TOKEN, estimate_tokens
+from app.support.vector_index import hybrid_rank
+
+# (question, text the context must contain to answer it)
+QUESTIONS = [
+    ("What severity values can a bug have?", "'Low', 'Medium', 'High'"),
+    ("Who is allowed to edit a bug?", "session['user_role'] != 'manager'"),
+    ("Why do I get 'Invalid status.' when saving?", "Invalid status."),
+    ("How long can a bug title be?", "String(200)"),
+    ("What happens if I delete a bug I didn't report?", "Permission denied"),
+    ("Which filters does the dashboard support?", "status, severity"),
+]
+
+KINDS = {'doc', 'help', 'code'}
+
+
+def build_index(base, summaries):
+    """
+    Index a copy of the repository's sources, with or without code summaries.
+
+    Each variant gets its own copy because the retrieval caches are keyed by
+    repository root and file contents, which the two would otherwise share.
+    """
+    for rel_path, _kind, path in doc_index.list_source_files(Path(ROOT)):
+        os.makedirs(os.path.dirname(os.path.join(base, rel_path)), exist_ok=True)
+        shutil.copy(path, os.path.join(base, rel_path))
+    original = doc_index.code_summary
+    if not summaries:
+        doc_index.code_summary = lambda source, path, digest: None
+    try:
+        index = DocumentIndex(base)
+        index.refresh()
+    finally:
+        doc_index.code_summary = original
+    return index
+
+
+def pack(index, question, budget):
+    chosen = select_ranked_chunks(hybrid_rank(index, question, KINDS), budget)
+    return chosen, format_chunks(chosen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--budget', type=int, default=15000, help='context budget in characters')
+    parser.add_argument('--repeat', type=int, default=200, help='summaries timed per file')
+    args = parser.parse_args()
+    budget = args.budget // CHARS_PER_TOKEN
+
+    print(f"{'file':<16} {'raw tokens':>10} {'summary':>8} {'sections':>8} {'summarize':>10}")
+    for path in ('app/app.py', 'app/models.py'):
+        with open(os.path.join(ROOT, path), 'r', encoding='utf-8') as f:
+            source = f.read()
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            sections = summarize_module(source, path)
+        elapsed = (time.perf_counter() - started) / args.repeat * 1000
+        print(f"{path:<16} {estimate_tokens(source):>10} {sum(s['tokens'] for s in sections):>8} "
+              f"{len(sections):>8} {elapsed:>8.2f}ms")
+
+    results = {}
+    scratch = tempfile.mkdtemp(prefix='bench-code-summary-')
+    for label, summaries in (('raw', False), ('summary', True)):
+        index = build_index(os.path.join(scratch, label), summaries)
+        for question, fact in QUESTIONS:
+            chosen, context = pack(index, question, budget)
+            code_tokens = sum(unit['tokens'] for unit in chosen if unit['kind'] == 'code')
+            results[label, question] = (code_tokens, estimate_tokens(context), fact in context)
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    print(f"\n{'question':<50} {'code tokens':>17} {'context tokens':>17} {'answer found':>14}")
+    print(f"{'':<50} {'raw':>8} {'summary':>8} {'raw':>8} {'summary':>8} {'raw':>6} {'summary':>7}")
+    for question, _fact in QUESTIONS:
+        raw, summary = results['raw', question], results['summary', question]
+        print(f"{question[:50]:<50} {raw[0]:>8} {summary[0]:>8} {raw[1]:>8} {summary[1]:>8} "
+              f"{'yes' if raw[2] else 'no':>6} {'yes' if summary[2] else 'no':>7}")
+
+
+if __name__ == '__main__':
+    main()
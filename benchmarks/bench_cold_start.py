@@ -0,0 +1,112 @@
+"""
+Cold-start benchmark for template rendering.
+
+Every measurement runs in a fresh Python process (like a newly scaled-up
+worker) and times the first request to one route, once with an empty
+template cache directory and once with a cache filled by
+``flask --app app precompile-templates``.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, 'app')
+
+# (label, method, path) - the first request each fresh worker serves
+ROUTES = [
+    ('login', 'GET', '/login'),
+    ('dashboard', 'GET', '/dashboard'),
+    ('bug_form', 'GET', '/bug/create'),
+    ('help_articles', 'GET', '/help-articles'),
+    ('reports', 'GET', '/reports/'),
+]
+
+
+def run_worker(path):
+    """Import the app in this process and time the first request to ``path``."""
+    sys.path.insert(0, APP_DIR)
+    os.chdir(APP_DIR)
+    import app as app_module
+
+    app_module.init_db()
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_email'] = 'manager@example.com'
+        sess['user_role'] = 'manager'
+        sess['user_id'] = 2
+
+    start = time.perf_counter()
+    response = client.get(path)
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    client.get(path)
+    warm = time.perf_counter() - start
+
+    print(json.dumps({'status': response.status_code, 'first': first, 'warm': warm}))
+
+
+def measure(path, cache_dir, db_url):
+    """Spawn a fresh worker process and return its timings."""
+    env = dict(os.environ, JINJA_BYTECODE_CACHE_DIR=cache_dir, DATABASE_URL=db_url)
+    env.setdefault('OPENAI_API_KEY', 'benchmark')
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', path],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def precompile(cache_dir, db_url):
+    """Fill ``cache_dir`` the same way a deploy step would."""
+    env = dict(os.environ, JINJA_BYTECODE_CACHE_DIR=cache_dir, DATABASE_URL=db_url)
+    env.setdefault('OPENAI_API_KEY', 'benchmark')
+    subprocess.run(
+        [sys.executable, '-m', 'flask', '--app', 'app', 'precompile-templates'],
+        cwd=APP_DIR, env=env, capture_output=True, check=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        warm_cache = os.path.join(tmp, 'precompiled')
+        precompile(warm_cache, db_url)
+
+        print(f"First-request latency per route (median of {args.runs} fresh workers)")
+        print(f"  {'route':<15} {'no cache':>10} {'precompiled':>12} {'warm':>8}")
+        for label, _method, path in ROUTES:
+            cold, cached, warm = [], [], []
+            for run in range(args.runs):
+                # A new empty directory per run so nothing leaks between workers
+                cold.append(measure(path, os.path.join(tmp, f'empty-{label}-{run}'), db_url)['first'])
+                result = measure(path, warm_cache, db_url)
+                cached.append(result['first'])
+                warm.append(result['warm'])
+
+            print(f"  {label:<15} {statistics.median(cold) * 1000:8.2f}ms "
+                  f"{statistics.median(cached) * 1000:10.2f}ms "
+                  f"{statistics.median(warm) * 1000:6.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Worker cold-start benchmark: prebuilt context bundle vs. indexing at startup.
+
+Builds scratch repositories with growing numbers of help articles and, in
+a fresh Python process per measurement (like a newly scaled-up worker),
+times loading the document index and the first chat's build_context().
+Three starts are compared. "cold" has an empty state directory. "persisted"
+has the index JSON and vector files a previous worker left behind, which
+was the best case before bundles. "bundle" has only the file written by
+``flask --app app build-context-bundle``. Every start must build the same
+context.
+
+Usage:
+    python benchmarks/bench_context_bundle.py [--sizes 50,500,2000] [--runs 3]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+QUESTION = "How do I assign a bug to a developer and change its priority?"
+
+TOPICS = ['login', 'roles', 'priority', 'status', 'dashboard', 'filters', 'comments', 'exports']
+
+
+def build_repo(root, articles):
+    """The repository's own docs plus ``articles`` generated help articles."""
+    shutil.copytree(os.path.join(ROOT, 'docs'), os.path.join(root, 'docs'))
+    shutil.copy(os.path.join(ROOT, 'README.md'), root)
+    os.makedirs(os.path.join(root, 'app'))
+    for name in ('app.py', 'models.py'):
+        shutil.copy(os.path.join(ROOT, 'app', name), os.path.join(root, 'app'))
+    help_dir = Path(root, 'help_articles')
+    help_dir.mkdir()
+    for i in range(articles):
+        topic = TOPICS[i % len(TOPICS)]
+        sections = ''.join(
+            f"## Step {step}: {topic} {i}\n\nOpen the {topic} page, pick bug {i * 7 + step} and "
+            f"update its {TOPICS[(i + step) % len(TOPICS)]} before saving the change.\n\n"
+            for step in range(1, 6)
+        )
+        (help_dir / f'{topic}-{i}.md').write_text(f"# Working with {topic} ({i})\n\n{sections}", encoding='utf-8')
+
+
+def run_worker(base, state_dir, bundle_path):
+    """Start the support index as a worker would and time the first context build."""
+    started = time.perf_counter()
+    from app.support.context_builder import build_context
+    from app.support.doc_index import configure_document_index, get_document_index
+    imported = time.perf_counter()
+
+    configure_document_index(base, state_dir=state_dir, poll_interval=0, bundle_path=bundle_path or None)
+    get_document_index(base)
+    loaded = time.perf_counter()
+    context = build_context(base, QUESTION, max_context_tokens=2000)
+    first = time.perf_counter()
+    build_context(base, QUESTION, max_context_tokens=2000)
+    warm = time.perf_counter()
+
+    print(json.dumps({
+        'import': imported - started,
+        'startup': loaded - imported,
+        'first_chat': first - loaded,
+        'warm_chat': warm - first,
+        'context': hashlib.sha256(context.encode('utf-8')).hexdigest(),
+    }))
+
+
+def measure(base, state_dir, bundle_path=''):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', base, state_dir, bundle_path],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='50,500,2000', help='help articles per scratch repository')
+    parser.add_argument('--runs', type=int, default=3, help='fresh workers per start (median is reported)')
+    parser.add_argument('--worker', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    from app.support.context_bundle import build_bundle
+
+    print("Worker startup (index load) and first chat build_context(), median of fresh processes")
+    print(f"  {'articles':>8} {'start':<10} {'startup':>9} {'first chat':>11} {'total':>9} {'warm chat':>10}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        root = tempfile.mkdtemp(prefix='bench-bundle-')
+        try:
+            base = os.path.join(root, 'repo')
+            build_repo(base, size)
+            bundle_path = os.path.join(root, 'bundle', 'support_context.bundle')
+            build_bundle(base, bundle_path)
+            persisted_dir = os.path.join(root, 'persisted')
+            measure(base, persisted_dir)
+
+            contexts = set()
+            for label in ('cold', 'persisted', 'bundle'):
+                results = []
+                for run in range(args.runs):
+                    if label == 'cold':
+                        result = measure(base, os.path.join(root, f'cold-{run}'))
+                    elif label == 'persisted':
+                        result = measure(base, persisted_dir)
+                    else:
+                        result = measure(base, os.path.join(root, f'empty-{run}'), bundle_path)
+                    results.append(result)
+                    contexts.add(result['context'])
+                startup = statistics.median(r['startup'] for r in results) * 1000
+                first = statistics.median(r['first_chat'] for r in results) * 1000
+                warm = statistics.median(r['warm_chat'] for r in results) * 1000
+                print(f"  {size:>8} {label:<10} {startup:>7.1f}ms {first:>9.1f}ms {startup + first:>7.1f}ms "
+                      f"{warm:>8.1f}ms")
+            assert len(contexts) == 1, 'starts built different contexts'
+            print(f"  {'':>8} bundle file {os.path.getsize(bundle_path) // 1024} KB")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
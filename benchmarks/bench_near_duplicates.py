@@ -0,0 +1,92 @@
+"""
+Near-duplicate suppression benchmark: context packed with and without it.
+
+Clusters the repository's sections and paragraphs and reports how long that
+takes and what it found. Then, for questions about the heavily overlapping
+support chat docs, builds the chat context with and without suppression.
+It prints the context tokens each way and the duplicate tokens that
+build_context reports as left out. A question counts as "repeated" when
+its unsuppressed context carries a paragraph more than once.
+
+Usage:
+    python benchmarks/bench_near_duplicates.py [--budget 15000] [--repeat 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.support.context_builder import build_context
+from app.support.doc_index import get_document_index
+from app.support.near_duplicates import DuplicateIndex, PARAGRAPH_THRESHOLD, paragraph_spans, shingle_hashes
+from app.support.question_index import jaccard
+from app.support.retrieval import get_bm25_index
+from app.support.tokens import estimate_tokens
+
+QUESTIONS = [
+    "How do I set up the support chat?",
+    "How do I configure the OpenAI API key?",
+    "The chat says no documentation found, what do I do?",
+    "How does the support assistant work?",
+    "How do I change the colors of the chat widget?",
+    "What does the chat cost to run?",
+    "How do I test the chat API with curl?",
+    "What environment variables does the support chat need?",
+    "What are the test accounts?",
+    "What happens when I ask about a feature that doesn't exist?",
+]
+
+
+def repeated_tokens(context):
+    """Tokens of paragraphs in ``context`` that near-duplicate an earlier one."""
+    seen = []
+    repeated = 0
+    for start, end in paragraph_spans(context):
+        shingles = shingle_hashes(context[start:end])
+        if len(shingles) < 8:
+            continue
+        if any(jaccard(shingles, other) >= PARAGRAPH_THRESHOLD for other in seen):
+            repeated += estimate_tokens(context[start:end])
+        else:
+            seen.append(shingles)
+    return repeated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--budget', type=int, default=15000, help='context budget in characters')
+    parser.add_argument('--repeat', type=int, default=20, help='cluster builds timed')
+    args = parser.parse_args()
+
+    index = get_document_index(ROOT)
+    bm25 = get_bm25_index(index)
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        duplicates = DuplicateIndex.build(bm25.fingerprint, bm25.units)
+    elapsed = (time.perf_counter() - started) / args.repeat * 1000
+    paragraphs = sum(len(spans) for spans in duplicates.paragraphs.values())
+    print(f"{len(bm25.units)} sections clustered in {elapsed:.1f}ms: {len(duplicates.sections)} sections and "
+          f"{paragraphs} paragraphs have a near-duplicate")
+
+    print(f"\n{'question':<50} {'context tokens':>15} {'left out':>9} {'repeated tokens':>16}")
+    print(f"{'':<50} {'off':>7} {'on':>7} {'':>9} {'off':>7} {'on':>8}")
+    totals = [0, 0, 0, 0, 0]
+    for question in QUESTIONS:
+        full = build_context(ROOT, question, include_code=True, max_context_length=args.budget,
+                             deduplicate=False)
+        stats = {}
+        deduplicated = build_context(ROOT, question, include_code=True, max_context_length=args.budget,
+                                     stats=stats)
+        row = [estimate_tokens(full), estimate_tokens(deduplicated), stats['duplicate_tokens'],
+               repeated_tokens(full), repeated_tokens(deduplicated)]
+        totals = [total + value for total, value in zip(totals, row)]
+        print(f"{question[:50]:<50} {row[0]:>7} {row[1]:>7} {row[2]:>9} {row[3]:>7} {row[4]:>8}")
+    print(f"{'total':<50} {totals[0]:>7} {totals[1]:>7} {totals[2]:>9} {totals[3]:>7} {totals[4]:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark for the bug statistics snapshot.
+
+Seeds a temporary SQLite database with a year of bugs, then times the full
+build, a no-change refresh, an incremental refresh after a batch of edits
+and report rendering (JSON and HTML).
+
+Usage:
+    python benchmarks/bench_reports.py [--bugs 50000] [--edits 200]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from jinja2 import Environment, FileSystemLoader
+from sqlalchemy import create_engine, text
+
+from app.reporting.stats import BugStatsSnapshot
+
+
+def seed_database(engine, bug_count):
+    """Insert ``bug_count`` bugs spread uniformly over the last 365 days."""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    reporters = [f"user{i}@example.com" for i in range(25)]
+    rows = []
+    for bug_id in range(1, bug_count + 1):
+        created = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+        status = rng.choice(['Open', 'Closed'])
+        updated = created + timedelta(seconds=rng.randint(0, int((now - created).total_seconds())))
+        rows.append({
+            'id': bug_id,
+            'severity': rng.choice(['Low', 'Medium', 'High']),
+            'status': status,
+            'reporter': rng.choice(reporters),
+            'created': str(created),
+            'updated': str(updated),
+        })
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE bugs (
+                id INTEGER PRIMARY KEY, title VARCHAR(200), description TEXT,
+                severity VARCHAR(20), status VARCHAR(20), reporter VARCHAR(120),
+                reporter_id INTEGER, created_date DATETIME, updated_date DATETIME
+            )
+        """))
+        conn.execute(text("CREATE INDEX ix_bugs_updated_date ON bugs (updated_date)"))
+        conn.execute(text("""
+            INSERT INTO bugs VALUES (:id, 'Bug', 'Description', :severity, :status,
+                                     :reporter, 1, :created, :updated)
+        """), rows)
+
+
+def timed(label, func, repeat=1):
+    """Run ``func`` ``repeat`` times and print the mean wall time."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"  {label:<32} {elapsed:9.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bugs', type=int, default=50000)
+    parser.add_argument('--edits', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        seed_database(engine, args.bugs)
+        snapshot = BugStatsSnapshot()
+        env = Environment(loader=FileSystemLoader(os.path.join(ROOT, 'app', 'templates')))
+        env.globals['url_for'] = lambda endpoint, **kwargs: '#'
+        template = env.get_template('reports.html')
+
+        print(f"Bug statistics benchmark ({args.bugs} bugs over 365 days)")
+        with engine.connect() as conn:
+            timed('full build (GROUP BY)', lambda: snapshot.refresh(conn))
+            timed('refresh, nothing changed', lambda: snapshot.refresh(conn), repeat=50)
+        print(f"  cube cells: {len(snapshot.cells)}")
+
+        now = str(datetime.utcnow() + timedelta(seconds=1))
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE bugs SET status = 'Closed', updated_date = :u WHERE id <= :n"),
+                         {'u': now, 'n': args.edits})
+
+        with engine.connect() as conn:
+            timed(f'incremental refresh ({args.edits} edits)', lambda: snapshot.refresh(conn))
+
+        report = timed('report, 365 days (cold)', lambda: snapshot.report(days=365))
+        timed('report, 365 days (cached)', lambda: snapshot.report(days=365), repeat=50)
+        timed('JSON encode', lambda: json.dumps(report), repeat=20)
+        timed('HTML render', lambda: template.render(report=report, user_email='bench', user_role='manager'),
+              repeat=5)
+
+
+if __name__ == '__main__':
+    main()
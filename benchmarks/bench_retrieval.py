@@ -0,0 +1,140 @@
+"""
+Relevance and latency benchmark for support context retrieval.
+
+Runs the example questions from BOT_BEHAVIOR_EXAMPLES.md through
+build_context() twice: without a query (budget filled by document kind)
+and with the question (BM25 + vector ranked chunks packed by knapsack). For
+questions with known answers it reports whether a relevant section made it
+into the packed context and the reciprocal rank of the first relevant
+section, plus the estimated prompt tokens each context costs.
+
+Usage:
+    python benchmarks/bench_retrieval.py [--budget 15000] [--repeat 50]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.support.context_builder import build_context
+from app.support.doc_index import get_document_index
+from app.support.retrieval import section_units
+from app.support.tokens import estimate_tokens
+from app.support.vector_index import hybrid_rank
+
+
+# Sections that answer each question: (path, heading substring)
+RELEVANT = {
+    "How do I create a bug report?": [
+        ('help_articles/how-to-create-a-bug-report.md', 'Steps to Create a Bug Report'),
+        ('docs/getting-started.md', 'Creating a Bug Report'),
+    ],
+    "What's the difference between a reporter and a manager?": [
+        ('help_articles/understanding-user-roles.md', 'Reporter Role'),
+        ('help_articles/understanding-user-roles.md', 'Manager Role'),
+        ('help_articles/understanding-user-roles.md', 'Permission Comparison Table'),
+        ('docs/getting-started.md', 'User Roles'),
+    ],
+    "How do I filter bugs by status?": [
+        ('docs/getting-started.md', 'Filtering Bugs'),
+    ],
+    "How do I bulk edit multiple bugs at once?": [
+        ('docs/getting-started.md', 'Editing a Bug'),
+    ],
+}
+
+
+def example_questions():
+    """Extract the **User:** questions from BOT_BEHAVIOR_EXAMPLES.md."""
+    with open(os.path.join(ROOT, 'BOT_BEHAVIOR_EXAMPLES.md'), 'r', encoding='utf-8') as f:
+        return re.findall(r'\*\*User:\*\* "(.+?)"', f.read())
+
+
+def is_relevant(unit, question):
+    heading = unit['document']['sections'][unit['section_pos']]['heading']
+    return any(unit['path'] == path and text in heading for path, text in RELEVANT.get(question, []))
+
+
+def relevant_texts(index, question):
+    units = section_units(index.documents())
+    return [u['text'] for u in units if is_relevant(u, question)]
+
+
+def reciprocal_rank(units, question):
+    for rank, unit in enumerate(units, start=1):
+        if is_relevant(unit, question):
+            return 1.0 / rank
+    return 0.0
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--budget', type=int, default=15000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = get_document_index(ROOT)
+    print(f"Index load: {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({len(index.documents())} files, {len(section_units(index.documents()))} sections)")
+
+    kinds = {'doc', 'help', 'code'}
+    file_order = section_units(index.documents())
+    totals = {'baseline_hit': 0, 'ranked_hit': 0, 'baseline_rr': 0.0, 'ranked_rr': 0.0, 'labelled': 0,
+              'baseline_tokens': 0, 'ranked_tokens': 0, 'questions': 0}
+
+    print(f"\n{'question':<58} {'no query':>10} {'ranked':>10} {'tokens':>13} {'ms':>6}")
+    for question in example_questions():
+        baseline, _ = timed(lambda: build_context(ROOT, "", include_code=True,
+                                                  max_context_length=args.budget), 1)
+        ranked_context, elapsed = timed(lambda: build_context(ROOT, question, include_code=True,
+                                                              max_context_length=args.budget), args.repeat)
+        ranked = [unit for _score, unit in hybrid_rank(index, question, kinds)]
+        baseline_tokens = estimate_tokens(baseline)
+        ranked_tokens = estimate_tokens(ranked_context)
+        totals['questions'] += 1
+        totals['baseline_tokens'] += baseline_tokens
+        totals['ranked_tokens'] += ranked_tokens
+
+        if question in RELEVANT:
+            texts = relevant_texts(index, question)
+            baseline_hit = any(t in baseline for t in texts)
+            ranked_hit = any(t in ranked_context for t in texts)
+            baseline_rr = reciprocal_rank(file_order, question)
+            ranked_rr = reciprocal_rank(ranked, question)
+            totals['labelled'] += 1
+            totals['baseline_hit'] += baseline_hit
+            totals['ranked_hit'] += ranked_hit
+            totals['baseline_rr'] += baseline_rr
+            totals['ranked_rr'] += ranked_rr
+            baseline_col = f"{'hit' if baseline_hit else 'miss'} {baseline_rr:.2f}"
+            ranked_col = f"{'hit' if ranked_hit else 'miss'} {ranked_rr:.2f}"
+        else:
+            baseline_col = ranked_col = '-'
+
+        tokens_col = f"{baseline_tokens}->{ranked_tokens}"
+        print(f"{question[:58]:<58} {baseline_col:>10} {ranked_col:>10} {tokens_col:>13} {elapsed:6.2f}")
+
+    n = totals['labelled'] or 1
+    q = totals['questions'] or 1
+    print(f"\nRelevant section packed: no query {totals['baseline_hit']}/{n}, ranked {totals['ranked_hit']}/{n}")
+    print(f"MRR of first relevant section: file order {totals['baseline_rr'] / n:.3f}, "
+          f"ranked {totals['ranked_rr'] / n:.3f}")
+    print(f"Mean context tokens: no query {totals['baseline_tokens'] / q:.0f}, "
+          f"ranked {totals['ranked_tokens'] / q:.0f}")
+
+
+if __name__ == '__main__':
+    main()
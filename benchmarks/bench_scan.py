@@ -0,0 +1,94 @@
+"""
+Repository scan benchmark: scandir with pruning vs. Path.rglob.
+
+Builds a scratch repository with a few dozen docs and help articles next
+to a large venv, node_modules and .git, then times list_source_files()
+against the rglob-based version it replaced, which walked every excluded
+tree and checked every path's parts. Both must list the same files.
+
+Usage:
+    python benchmarks/bench_scan.py [--venv-files 20000] [--repeat 5]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.support.doc_index import DOC_EXTENSIONS, EXCLUDE_DIRS, HELP_EXTENSIONS, list_source_files
+
+
+def rglob_sources(base):
+    """The docs/ and help_articles/ part of list_source_files() this replaced."""
+    def excluded(path):
+        return any(part in EXCLUDE_DIRS for part in path.relative_to(base).parts[:-1])
+    sources = []
+    for item in sorted((base / 'docs').rglob('*')):
+        if item.suffix in DOC_EXTENSIONS and not excluded(item) and item.is_file():
+            sources.append(item.relative_to(base).as_posix())
+    for item in sorted((base / 'help_articles').rglob('*')):
+        if item.suffix in HELP_EXTENSIONS and not excluded(item) and item.is_file():
+            sources.append(item.relative_to(base).as_posix())
+    return sources
+
+
+def build_repo(root, venv_files):
+    """A repository whose docs are small and whose excluded trees are large."""
+    text = "## Section\n\nSome documentation about bugs and reports.\n" * 40
+    for i in range(40):
+        Path(root, 'docs', f'guide-{i}.md').parent.mkdir(parents=True, exist_ok=True)
+        Path(root, 'docs', f'guide-{i}.md').write_text(f"# Guide {i}\n\n{text}", encoding='utf-8')
+        Path(root, 'help_articles').mkdir(exist_ok=True)
+        Path(root, 'help_articles', f'article-{i}.md').write_text(f"# Article {i}\n\n{text}", encoding='utf-8')
+    # Excluded trees inside docs/ too, as a docs toolchain would leave them
+    for tree, count, suffix in (('venv', venv_files, '.py'), ('docs/node_modules', venv_files // 4, '.js'),
+                                ('.git/objects', venv_files // 2, ''), ('docs/.venv', venv_files // 4, '.md')):
+        for i in range(count):
+            directory = Path(root, tree, f'pkg{i // 200}')
+            if i % 200 == 0:
+                directory.mkdir(parents=True, exist_ok=True)
+            (directory / f'module{i}{suffix}').write_text('x = 1\n', encoding='utf-8')
+
+
+def best_of(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--venv-files', type=int, default=20000, help='files in the fake venv')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement (best is reported)')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='bench-scan-')
+    try:
+        started = time.perf_counter()
+        build_repo(root, args.venv_files)
+        total = sum(len(files) for _, _, files in os.walk(root))
+        print(f"Scratch repo with {total} files built in {time.perf_counter() - started:.1f}s\n")
+
+        base = Path(root)
+        old_src_ms, old_sources = best_of(args.repeat, lambda: rglob_sources(base))
+        new_src_ms, new_sources = best_of(args.repeat, lambda: list_source_files(base))
+        assert old_sources == [path for path, kind, _ in new_sources if kind in ('doc', 'help') and '/' in path]
+
+        print(f"{'':<26} {'rglob':>9} {'scandir':>9} {'speedup':>8}")
+        print(f"{f'list_source_files ({len(new_sources)})':<26} {old_src_ms:>7.1f}ms {new_src_ms:>7.1f}ms "
+              f"{old_src_ms / new_src_ms:>7.1f}x")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
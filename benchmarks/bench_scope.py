@@ -0,0 +1,118 @@
+"""
+Accuracy and latency of the local out-of-scope classifier.
+
+Trains the classifier on BOT_BEHAVIOR_EXAMPLES.md and runs it over a
+labelled set of questions that are not in that file. For each threshold it
+reports the share of questions answered locally, how many in-scope
+questions would wrongly get the redirect, and the out-of-scope questions
+it catches. Latency saved is the classifier's cost compared with the
+context build plus the LLM call that a redirected question skips
+(--llm-ms, default 1500).
+
+Usage:
+    python benchmarks/bench_scope.py [--llm-ms 1500] [--threshold 0.85] [--show 0.85]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.support.context_builder import build_context
+from app.support.scope_classifier import ScopeClassifier, load_examples
+
+
+THRESHOLDS = [0.5, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99]
+
+# (out_of_scope, question)
+QUESTIONS = [
+    (False, "How do I report a new bug?"),
+    (False, "Where do I set the severity of an issue?"),
+    (False, "Can a reporter delete bugs?"),
+    (False, "How do I assign a bug to a developer?"),
+    (False, "What does the status Won't Fix mean?"),
+    (False, "How do I change my password?"),
+    (False, "I forgot my login, what should I do?"),
+    (False, "How do I generate a report of open bugs?"),
+    (False, "How do I edit a bug I created?"),
+    (False, "How do I see only bugs that are in progress?"),
+    (False, "What is the difference between priority and severity?"),
+    (False, "Can managers reopen closed bugs?"),
+    (False, "Why can't I edit someone else's bug?"),
+    (False, "How do I log out?"),
+    (False, "Where is the dashboard?"),
+    (False, "How do I time how long a bug stays open?"),
+    (False, "Can I attach the project name in the bug description?"),
+    (False, "Is there a way to export the bug report as HTML?"),
+    (True, "Can I get email notifications when a bug changes?"),
+    (True, "Is there an Android or iPhone app?"),
+    (True, "Does it integrate with Slack?"),
+    (True, "How do I track the time I spend on a bug?"),
+    (True, "Can I link bugs to GitHub pull requests?"),
+    (True, "Where is the REST API documentation?"),
+    (True, "How do I create a new project?"),
+    (True, "Can I set up a custom workflow with my own statuses?"),
+    (True, "How do I connect the tracker to our CI pipeline?"),
+    (True, "Can I log hours on a ticket?"),
+    (True, "Does it sync with Jira?"),
+    (True, "Can I get an API key?"),
+    (True, "Is there a mobile version?"),
+    (True, "How do I set up a Trello integration?"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--llm-ms', type=float, default=1500.0, help='LLM time a redirect saves')
+    parser.add_argument('--threshold', type=float, default=0.85, help='threshold for the savings estimate')
+    parser.add_argument('--show', type=float, help='print each question at this threshold')
+    args = parser.parse_args()
+
+    path = os.path.join(ROOT, 'BOT_BEHAVIOR_EXAMPLES.md')
+    examples = load_examples(path)
+    started = time.perf_counter()
+    classifier = ScopeClassifier(examples)
+    train_ms = (time.perf_counter() - started) * 1000
+    print(f"Trained on {len(examples)} examples ({sum(1 for _, out in examples if out)} out of scope) "
+          f"in {train_ms:.2f}ms\n")
+
+    repeat = 200
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for _, question in QUESTIONS:
+            classifier.probability(question)
+    classify_ms = (time.perf_counter() - started) * 1000 / (repeat * len(QUESTIONS))
+
+    started = time.perf_counter()
+    for _, question in QUESTIONS[:10]:
+        build_context(ROOT, query=question)
+    context_ms = (time.perf_counter() - started) * 1000 / 10
+
+    scored = [(out, question) + classifier.probability(question) for out, question in QUESTIONS]
+    total_out = sum(1 for out, *_ in scored if out)
+    print(f"{'threshold':>9} {'local':>6} {'caught':>7} {'wrong':>6}")
+    for threshold in THRESHOLDS:
+        redirected = [s for s in scored if s[3] and s[2] >= threshold]
+        caught = sum(1 for s in redirected if s[0])
+        print(f"{threshold:>9.2f} {len(redirected) / len(scored):>6.0%} {caught:>3}/{total_out:<3} "
+              f"{len(redirected) - caught:>6}")
+
+    print(f"\nClassifier: {classify_ms * 1000:.1f}us per question; a redirect skips "
+          f"~{context_ms:.1f}ms of context build + {args.llm_ms:.0f}ms LLM")
+    local = sum(1 for s in scored if s[3] and s[2] >= args.threshold) / len(scored)
+    print(f"At {args.threshold:g}: {local:.0%} answered locally, saving "
+          f"{local * (context_ms + args.llm_ms) - classify_ms:.0f}ms per request on average")
+
+    if args.show is not None:
+        print()
+        for out, question, probability, keywords in scored:
+            redirected = bool(keywords) and probability >= args.show
+            mark = 'ok ' if redirected == out else 'MISS' if out else 'WRONG'
+            print(f"{mark:<5} {probability:.3f} {'out' if out else 'in ':<3} {question!r} {keywords}")
+
+
+if __name__ == '__main__':
+    main()
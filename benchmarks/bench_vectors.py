@@ -0,0 +1,118 @@
+"""
+Latency and paraphrase-recall benchmark for local vector retrieval.
+
+Part one saves synthetic embedding matrices of increasing size, maps them
+back with ``mmap_mode='r'`` like a worker would, and times top-k cosine
+search. Part two asks paraphrased questions (no keywords shared with the
+answer) against the real docs and compares the mean reciprocal rank of
+the answering section for BM25, vectors alone and the fused ranking.
+
+Usage:
+    python benchmarks/bench_vectors.py [--rows 1000 10000 50000] [--repeat 200]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.support.doc_index import get_document_index
+from app.support.retrieval import get_bm25_index, rank_sections
+from app.support.vector_index import EMBEDDING_DIM, HashedEmbedder, VectorIndex, get_vector_index, hybrid_rank
+
+
+# Paraphrased questions and the sections that answer them: (path, heading substring)
+PARAPHRASES = {
+    "how can I make a new ticket": [
+        ('help_articles/how-to-create-a-bug-report.md', 'Steps'),
+        ('docs/getting-started.md', 'Creating a Bug'),
+    ],
+    "what are the steps to report a defect": [
+        ('help_articles/how-to-create-a-bug-report.md', 'Steps'),
+        ('docs/getting-started.md', 'Creating a Bug'),
+    ],
+    "who is allowed to erase issues": [
+        ('help_articles/understanding-user-roles.md', ''),
+    ],
+    "can an administrator change someone else's problem": [
+        ('help_articles/understanding-user-roles.md', 'Manager'),
+    ],
+    "search for tickets by severity": [
+        ('docs/getting-started.md', 'Filtering'),
+    ],
+}
+
+
+def search_latency(rows, repeat, query_vector_source):
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((rows, EMBEDDING_DIM), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = VectorIndex('bench', matrix, query_vector_source, ['doc'] * rows)
+        saved.save(Path(tmp))
+        index = VectorIndex.load(Path(tmp), 'bench')
+        assert isinstance(index.matrix, np.memmap)
+
+        index.search("warm up the page cache")
+        start = time.perf_counter()
+        for _ in range(repeat):
+            index.search("how do I create a bug report", k=40)
+        return (time.perf_counter() - start) / repeat * 1000
+
+
+def reciprocal_rank(units, relevant):
+    for rank, unit in enumerate(units, start=1):
+        heading = unit['document']['sections'][unit['section_pos']]['heading']
+        if any(unit['path'] == path and text in heading for path, text in relevant):
+            return 1.0 / rank
+    return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    embedder = HashedEmbedder(EMBEDDING_DIM, np.ones(EMBEDDING_DIM, dtype=np.float32))
+    print(f"{'rows':>8} {'matrix MB':>10} {'top-40 ms':>10}")
+    for rows in args.rows:
+        elapsed = search_latency(rows, args.repeat, embedder)
+        print(f"{rows:>8} {rows * EMBEDDING_DIM * 4 / 1e6:>10.1f} {elapsed:>10.3f}")
+
+    index = get_document_index(ROOT)
+    bm25 = get_bm25_index(index)
+    start = time.perf_counter()
+    vectors = get_vector_index(index)
+    print(f"\nDocs index: {len(bm25.units)} sections, vectors ready in "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+    kinds = {'doc', 'help', 'code'}
+    totals = {'bm25': 0.0, 'vector': 0.0, 'hybrid': 0.0}
+    print(f"\n{'question':<52} {'bm25':>6} {'vector':>7} {'hybrid':>7}")
+    for question, relevant in PARAPHRASES.items():
+        scores = {
+            'bm25': reciprocal_rank([u for _s, u in rank_sections(index, question, kinds)], relevant),
+            'vector': reciprocal_rank([bm25.units[row] for _s, row in vectors.search(question, 40, kinds)],
+                                      relevant),
+            'hybrid': reciprocal_rank([u for _s, u in hybrid_rank(index, question, kinds)], relevant),
+        }
+        for name, value in scores.items():
+            totals[name] += value
+        print(f"{question[:52]:<52} {scores['bm25']:>6.2f} {scores['vector']:>7.2f} {scores['hybrid']:>7.2f}")
+
+    n = len(PARAPHRASES)
+    print(f"\nParaphrase MRR: bm25 {totals['bm25'] / n:.3f}, vector {totals['vector'] / n:.3f}, "
+          f"hybrid {totals['hybrid'] / n:.3f}")
+
+
+if __name__ == '__main__':
+    main()
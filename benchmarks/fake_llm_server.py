@@ -0,0 +1,216 @@
+"""
+Local OpenAI-compatible stand-in for the LLM provider.
+
+Serves POST /v1/chat/completions (plain and streamed, with a final usage
+chunk when asked) and GET /v1/models. Replies are canned support answers;
+a share of them (and every reply to a message mentioning a help article)
+carries a PROPOSED_HELP_ARTICLE block. Time to first token, token rate
+and injected errors are configurable, so benchmarks can separate our own
+overhead from provider latency. Point the app at it with OPENAI_BASE_URL.
+
+Usage:
+    python benchmarks/fake_llm_server.py [--port 8001] [--latency 0.3] [--tokens-per-second 80]
+        [--error-rate 0.05] [--error-status 503] [--article-rate 0.1]
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+ANSWER = (
+    "To create a bug report, click New Bug in the navigation bar. Fill in a clear title, "
+    "the steps to reproduce, the expected and actual results, and pick a severity and "
+    "priority. Click Create Bug to save it; it starts with the status Open. "
+    "See: 'How to Create a Bug Report' for more details."
+)
+
+ARTICLE = """
+
+=== PROPOSED_HELP_ARTICLE ===
+Title: Reporting a Bug Step by Step
+Summary: How to write and submit a bug report that developers can act on. Covers the required fields and how severity and priority differ.
+Steps:
+1. Click New Bug in the navigation bar.
+2. Enter a title, steps to reproduce, expected and actual results.
+3. Choose severity and priority, then click Create Bug.
+Common issues & fixes:
+- Issue: The Create Bug button does nothing.
+  Fix: Fill in every required field marked with an asterisk.
+- Issue: The bug is not in the list.
+  Fix: Clear the status filter on the bug list.
+=== END_PROPOSED_HELP_ARTICLE ==="""
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def split_tokens(text):
+    """Word-sized pieces that join back into ``text``."""
+    words = text.split(' ')
+    return [word if i == len(words) - 1 else word + ' ' for i, word in enumerate(words)]
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self.send_json(200, {'object': 'list', 'data': [{'id': 'gpt-4o-mini', 'object': 'model', 'owned_by': 'fake'}]})
+        else:
+            self.send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+            return
+
+        options = self.server.options
+        with self.server.lock:
+            self.server.requests += 1
+            fail = self.server.rng.random() < options['error_rate']
+            with_article = self.server.rng.random() < options['article_rate']
+        if fail:
+            headers = {'Retry-After': '0'} if options['error_status'] == 429 else None
+            self.send_json(options['error_status'],
+                           {'error': {'message': 'Injected failure', 'type': 'server_error'}}, headers)
+            return
+
+        messages = request.get('messages', [])
+        last_user = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+        reply = ANSWER
+        if with_article or 'article' in last_user.lower():
+            reply += ARTICLE
+        pieces = split_tokens(reply)[:request.get('max_tokens') or None]
+        usage = {
+            'prompt_tokens': sum(estimate_tokens(m.get('content', '')) for m in messages),
+            'completion_tokens': len(pieces),
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+
+        time.sleep(options['latency'])
+        delay = 1 / options['tokens_per_second'] if options['tokens_per_second'] > 0 else 0
+        completion_id = f'chatcmpl-{uuid.uuid4().hex[:12]}'
+        model = request.get('model', 'gpt-4o-mini')
+
+        if not request.get('stream'):
+            time.sleep(delay * len(pieces))
+            self.send_json(200, {
+                'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': ''.join(pieces)}}],
+                'usage': usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        # Chunked so the connection stays open for the next request, like the real API
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write(data):
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta, finish_reason=None, chunk_usage=None):
+            payload = {
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': model, 'choices': [] if chunk_usage else
+                [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+            }
+            if chunk_usage:
+                payload['usage'] = chunk_usage
+            write(f"data: {json.dumps(payload)}\n\n".encode())
+
+        try:
+            chunk({'role': 'assistant', 'content': ''})
+            for piece in pieces:
+                time.sleep(delay)
+                chunk({'content': piece})
+            chunk({}, 'stop')
+            if (request.get('stream_options') or {}).get('include_usage'):
+                chunk({}, chunk_usage=usage)
+            write(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Pooled clients drop idle keep-alive connections; that is not an error
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def start_server(host='127.0.0.1', port=0, latency=0.3, tokens_per_second=80.0, error_rate=0.0,
+                 error_status=503, article_rate=0.0, seed=None):
+    """
+    Serve in a background thread.
+
+    Returns:
+        (server, base_url); call server.shutdown() to stop it. server.requests
+        counts the completion requests received.
+    """
+    server = FakeLLMServer((host, port), FakeLLMHandler)
+    server.options = {
+        'latency': latency, 'tokens_per_second': tokens_per_second, 'error_rate': error_rate,
+        'error_status': error_status, 'article_rate': article_rate,
+    }
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.1}, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}/v1'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.3, help='seconds before the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0, help='0 sends every token at once')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests that fail')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of injected failures')
+    parser.add_argument('--article-rate', type=float, default=0.0,
+                        help='share of replies with a PROPOSED_HELP_ARTICLE block')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    server, url = start_server(args.host, args.port, args.latency, args.tokens_per_second, args.error_rate,
+                               args.error_status, args.article_rate, args.seed)
+    print(f"Fake LLM server on {url} (set OPENAI_BASE_URL={url}); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
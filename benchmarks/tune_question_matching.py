@@ -0,0 +1,141 @@
+"""
+Offline tuning for near-duplicate question matching.
+
+Replays labelled questions against a pool of previously answered ones and
+reports, per similarity threshold, the hit rate (share of questions that
+would be answered from the pool) and precision (share of those answers
+that belong to the same intent). With --db it also replays the questions
+actually stored in a support cache database, in the order they were asked,
+and reports how often each threshold would have reused an earlier answer;
+--show prints those matches for manual review.
+
+Usage:
+    python benchmarks/tune_question_matching.py [--db app/instance/support_cache.db] [--show 0.6]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.support.question_index import QuestionIndex
+
+
+THRESHOLDS = [0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+
+# Questions already answered: (intent, question)
+POOL = [
+    ('create', "How do I create a bug report?"),
+    ('roles', "What's the difference between a reporter and a manager?"),
+    ('filter-status', "How do I filter bugs by status?"),
+    ('delete', "How do I delete a bug?"),
+    ('edit', "How do I edit a bug?"),
+    ('login', "How do I log in?"),
+    ('severity', "What do the severity levels mean?"),
+    ('projects', "How do I create a project or organize bugs into projects?"),
+]
+
+# Incoming questions: (intent, question); intent None means nothing in the pool answers it
+QUERIES = [
+    ('create', "how to make a bug report"),
+    ('create', "how do I create a bug"),
+    ('create', "How can I submit a new issue?"),
+    ('create', "how do i report a bug"),
+    ('create', "creating a bug report"),
+    ('roles', "what is the difference between reporters and managers"),
+    ('roles', "manager vs reporter difference"),
+    ('roles', "what can a manager do that a reporter cannot?"),
+    ('filter-status', "filter bugs by status"),
+    ('filter-status', "how can I search tickets by status"),
+    ('filter-status', "show only closed bugs"),
+    ('delete', "can I remove a ticket"),
+    ('delete', "how do I delete bugs"),
+    ('edit', "how do I change a bug"),
+    ('edit', "how do I update an issue?"),
+    ('login', "how do I sign in"),
+    ('login', "I can't log in"),
+    ('severity', "what does severity mean"),
+    ('projects', "how do I organize bugs into projects"),
+    (None, "filter bugs by severity"),
+    (None, "how do I delete my account"),
+    (None, "Is there a mobile app I can download?"),
+    (None, "How do I bulk edit multiple bugs at once?"),
+    (None, "Can I connect this to Jira or GitHub?"),
+    (None, "How do I log hours spent fixing a bug?"),
+    (None, "how do I export bugs to csv"),
+    (None, "How do I find open bugs?"),
+    (None, "Show me open bugs"),
+    (None, "What happens to open bugs?"),
+    (None, "Where are new bugs?"),
+    (None, "How do I fix a bug?"),
+]
+
+
+def labelled_results():
+    index = QuestionIndex(None, threshold=0.0)
+    intents = {}
+    for intent, question in POOL:
+        index.add(question, intent, 'v')
+        intents[question] = intent
+
+    results = []
+    for intent, question in QUERIES:
+        candidates = index.candidates(question)
+        if candidates:
+            similarity, entry = candidates[0]
+            results.append((similarity, intents[entry['question']] == intent, question, entry['question']))
+        else:
+            results.append((0.0, False, question, None))
+    return results
+
+
+def replay_database(path):
+    """Best earlier match for each stored question, in the order they were asked."""
+    with sqlite3.connect(path) as conn:
+        questions = [row[0] for row in conn.execute('SELECT question FROM answered_questions ORDER BY id')]
+
+    index = QuestionIndex(None, threshold=0.0)
+    matches = []
+    for question in questions:
+        candidates = index.candidates(question)
+        matches.append((candidates[0][0], question, candidates[0][1]['question']) if candidates
+                       else (0.0, question, None))
+        index.add(question, '', 'v')
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--db', help='support cache database to replay')
+    parser.add_argument('--show', type=float, help='print database matches at or above this threshold')
+    args = parser.parse_args()
+
+    results = labelled_results()
+    print(f"Labelled set: {len(POOL)} answered, {len(QUERIES)} incoming questions\n")
+    print(f"{'threshold':>9} {'hit rate':>9} {'precision':>10} {'wrong':>6}")
+    for threshold in THRESHOLDS:
+        served = [r for r in results if r[0] >= threshold and r[3] is not None]
+        correct = sum(1 for r in served if r[1])
+        precision = correct / len(served) if served else 1.0
+        print(f"{threshold:>9.1f} {len(served) / len(results):>9.0%} {precision:>10.0%} "
+              f"{len(served) - correct:>6}")
+
+    if args.db:
+        matches = replay_database(args.db)
+        print(f"\nReplay of {len(matches)} stored questions from {args.db}\n")
+        print(f"{'threshold':>9} {'reuse rate':>10}")
+        for threshold in THRESHOLDS:
+            reused = sum(1 for m in matches if m[2] is not None and m[0] >= threshold)
+            print(f"{threshold:>9.1f} {reused / (len(matches) or 1):>10.0%}")
+        if args.show is not None:
+            print()
+            for similarity, question, matched in matches:
+                if matched is not None and similarity >= args.show:
+                    print(f"{similarity:.2f}  {question!r} -> {matched!r}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+Tests for the support assistant's document index and context builder.
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.support.doc_index import DocumentIndex, parse_sections
+from app.support.context_builder import document_content
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+
+
+def make_repo(tmp_path):
+    write(tmp_path / 'README.md', '# Bug Tracker\n\nIntro text.\n')
+    write(tmp_path / 'docs' / 'guide.md', '# Guide\n\n## Login\n\nUse your email.\n')
+    write(tmp_path / 'help_articles' / 'roles.md', '# Roles\n\nReporters and managers.\n')
+    write(tmp_path / 'app' / 'models.py', 'class Bug:\n    pass\n')
+    write(tmp_path / 'venv' / 'lib' / 'junk.md', '# Not docs\n')
+    return tmp_path
+
+
+def test_parse_sections_is_lossless():
+    content = "Intro\n# One\ntext\n```\n# not a heading\n```\n## Two\nmore\n"
+    sections = parse_sections(content, '.md')
+    assert [s['heading'] for s in sections] == ['', 'One', 'Two']
+    assert ''.join(s['text'] for s in sections) == content
+
+
+def test_index_lists_sources_in_context_order(tmp_path):
+    index = DocumentIndex(str(make_repo(tmp_path)))
+    index.refresh()
+    assert [(d['path'], d['kind']) for d in index.documents()] == [
+        ('docs/guide.md', 'doc'),
+        ('README.md', 'doc'),
+        ('help_articles/roles.md', 'help'),
+        ('app/models.py', 'code'),
+    ]
+
+
+def test_refresh_rereads_only_changed_files(tmp_path):
+    repo = make_repo(tmp_path)
+    index = DocumentIndex(str(repo))
+    index.refresh()
+    before = {d['path']: d for d in index.documents()}
+    version = index.version
+
+    assert index.refresh() is False
+    assert index.version == version
+
+    time.sleep(0.01)
+    write(repo / 'help_articles' / 'roles.md', '# Roles\n\nUpdated.\n')
+    assert index.refresh() is True
+    after = {d['path']: d for d in index.documents()}
+
+    assert after['docs/guide.md'] is before['docs/guide.md']
+    assert document_content(after['help_articles/roles.md']) == '# Roles\n\nUpdated.\n'
+    assert index.version == version + 1
+
+
+def test_index_persists_and_reloads(tmp_path):
+    repo = make_repo(tmp_path / 'repo')
+    index_path = tmp_path / 'state' / 'support_index.json'
+
+    index = DocumentIndex(str(repo), str(index_path))
+    index.refresh()
+
+    reloaded = DocumentIndex(str(repo), str(index_path))
+    assert reloaded.load() is True
+    assert reloaded.fingerprint == index.fingerprint
+    # Nothing changed on disk, so loading needs no re-reads
+    assert reloaded.refresh() is False
+
+    (repo / 'README.md').unlink()
+    assert reloaded.refresh() is True
+    assert 'README.md' not in [d['path'] for d in reloaded.documents()]
+
+
+def test_bm25_ranks_matching_section_first():
+    from app.support.retrieval import BM25Index
+
+    bm25 = BM25Index([
+        {'heading': 'Installation', 'text': 'Install Python and run pip install.'},
+        {'heading': 'User Roles', 'text': 'A reporter can edit own bugs; a manager can edit any bug.'},
+        {'heading': 'Filtering', 'text': 'Filter bugs by status on the dashboard.'},
+    ])
+    ranked = bm25.score("What's the difference between a reporter and a manager?")
+    assert ranked[0][1] == 1
+    assert bm25.score("kubernetes") == []
+
+
+def test_build_context_packs_relevant_sections_within_budget(tmp_path):
+    from app.support import doc_index
+    from app.support.context_builder import build_context
+
+    repo = make_repo(tmp_path)
+    write(repo / 'BIG.md', '# Unrelated\n\n' + 'lorem ipsum dolor ' * 1000)
+    index = DocumentIndex(str(repo))
+    index.refresh()
+    doc_index._indexes[os.path.realpath(str(repo))] = index
+
+    context = build_context(str(repo), "What roles do reporters and managers have?", max_context_length=500)
+    assert '## Help Article: help_articles/roles.md' in context
+    assert 'lorem ipsum' not in context
+
+
+def test_parse_sections_splits_python_by_function():
+    from app.support.doc_index import parse_sections
+
+    content = "import os\n\n# Helper\n@decorator\ndef one():\n    pass\n\n\nclass Two:\n    pass\n"
+    sections = parse_sections(content, '.py')
+    assert [s['heading'] for s in sections] == ['', 'def one', 'class Two']
+    assert sections[1]['text'].startswith('# Helper\n@decorator')
+    assert ''.join(s['text'] for s in sections) == content
+    assert all(s['tokens'] > 0 for s in sections)
+
+
+def test_code_is_indexed_as_route_and_model_summaries(tmp_path):
+    from app.support.code_summary import summarize_module
+
+    source = (
+        "@app.route('/bug/<int:bug_id>/edit', methods=['GET', 'POST'])\n"
+        "def edit_bug(bug_id):\n"
+        "    if session['user_role'] != 'manager':\n"
+        "        flash('Access denied.', 'danger')\n"
+        "        return redirect(url_for('dashboard'))\n"
+        "    flash('Bug updated.', 'success')\n"
+        "    return redirect(url_for('dashboard'))\n"
+        "\n\n"
+        "class Bug(db.Model):\n"
+        "    id = db.Column(db.Integer, primary_key=True)\n"
+        "    title = db.Column(db.String(200), nullable=False)  # Short summary\n"
+    )
+    sections = summarize_module(source, 'app/app.py')
+    route, model = (s['text'] for s in sections)
+    assert route.startswith('### GET, POST /bug/<int:bug_id>/edit -> edit_bug()')
+    assert "Access denied when `session['user_role'] != 'manager'`: \"Access denied.\"" in route
+    assert '- title: String(200), required (Short summary)' in model
+    assert summarize_module('def broken(:\n', 'app/app.py') is None
+
+    write(tmp_path / 'app' / 'app.py', source)
+    index = DocumentIndex(str(tmp_path))
+    index.refresh()
+    assert [s['text'] for s in index.documents()[0]['sections']] == [route, model]
+
+
+def test_knapsack_beats_first_fit():
+    from app.support.context_builder import knapsack_select
+
+    # First-fit by value would take the 60-token item and then nothing else fits
+    items = [(10.0, 60), (7.0, 50), (7.0, 50)]
+    assert knapsack_select(items, 100, granularity=1) == [1, 2]
+    assert knapsack_select(items, 40, granularity=1) == []
+
+
+def test_vector_index_finds_paraphrase_and_reloads_mmapped(tmp_path):
+    import numpy as np
+    from app.support.vector_index import VectorIndex
+
+    units = [
+        {'heading': 'Creating a Bug Report', 'text': 'Click New Bug and fill in the title.', 'kind': 'help'},
+        {'heading': 'Filtering', 'text': 'Filter bugs by status on the dashboard.', 'kind': 'doc'},
+        {'heading': 'Installation', 'text': 'Install Python and run pip install.', 'kind': 'doc'},
+    ]
+    built = VectorIndex.build('abc', units)
+    assert built.search("how can I make a new ticket")[0][1] == 0
+    assert built.search("search tickets", kinds={'doc'})[0][1] == 1
+
+    built.save(tmp_path)
+    loaded = VectorIndex.load(tmp_path, 'abc')
+    assert isinstance(loaded.matrix, np.memmap)
+    assert loaded.search("how can I make a new ticket") == built.search("how can I make a new ticket")
+    assert VectorIndex.load(tmp_path, 'stale') is None
+
+
+def test_refresh_skips_documents_over_the_size_limit(tmp_path, monkeypatch):
+    from app.support import doc_index
+
+    monkeypatch.setattr(doc_index, 'MAX_FILE_SIZE', 1000)
+    write(tmp_path / 'docs' / 'guide.md', '# Guide\n')
+    write(tmp_path / 'docs' / 'big.md', 'x' * 2000)
+    stat = (tmp_path / 'docs' / 'guide.md').stat()
+    index = DocumentIndex(str(tmp_path))
+    index.refresh()
+    assert [d['path'] for d in index.documents()] == ['docs/guide.md']
+
+    # A file that grew after it was stat'ed is not read past the limit
+    write(tmp_path / 'docs' / 'guide.md', 'x' * 2000)
+    assert index._read_entry('docs/guide.md', 'doc', tmp_path / 'docs' / 'guide.md', stat, None) is None
+
+
+def test_context_bundle_installs_prebuilt_index_and_swaps_on_rebuild(tmp_path):
+    from app.support.context_bundle import build_bundle
+    from app.support.retrieval import BM25Index, get_bm25_index, section_units
+    from app.support.vector_index import get_vector_index
+
+    repo = make_repo(tmp_path / 'repo')
+    bundle_path = str(tmp_path / 'support_context.bundle')
+    stats = build_bundle(str(repo), bundle_path)
+    assert stats['documents'] == 4 and stats['vectors']
+
+    fresh = DocumentIndex(str(repo))
+    fresh.refresh()
+    index = DocumentIndex(str(repo), bundle_path=bundle_path)
+    assert index.load_bundle()
+    assert index.fingerprint == fresh.fingerprint
+    assert index.documents() == fresh.documents()
+    assert not index.load_bundle()
+
+    # Retrieval uses the bundle's postings and mapped vectors instead of rebuilding
+    bm25 = get_bm25_index(index)
+    assert bm25.units[0]['document'] is index.documents()[0]
+    assert bm25.units_of_kinds({'help'}) and len(bm25.units._built) == 1  # kinds are read without units
+    assert list(bm25.units) == section_units(fresh.documents())
+    assert bm25.score('managers roles') == BM25Index(section_units(fresh.documents())).score('managers roles')
+    assert get_vector_index(index).matrix.base is not None
+
+    write(repo / 'help_articles' / 'roles.md', '# Roles\n\nReporters, developers and managers.\n')
+    time.sleep(0.01)
+    build_bundle(str(repo), bundle_path)
+    assert index.load_bundle()
+    bm25 = get_bm25_index(index)
+    assert bm25.units[bm25.score('developers')[0][1]]['path'] == 'help_articles/roles.md'
+
+
+def test_near_duplicate_docs_go_into_the_context_once(tmp_path):
+    from app.support import doc_index
+    from app.support.context_builder import build_context
+
+    setup = ("Copy the example file to `.env`, set OPENAI_API_KEY to your key from the "
+             "OpenAI dashboard and restart the Flask server so the support chat picks it up.\n")
+    write(tmp_path / 'README.md', f"# Bug Tracker\n\n## Support chat setup\n\n{setup}")
+    write(tmp_path / 'docs' / 'SUPPORT_CHAT_README.md',
+          f"# Support Chat\n\n## Setup\n\n{setup.replace('Flask server', 'Flask development server')}")
+    write(tmp_path / 'SETUP_SUPPORT_CHAT.md',
+          f"# Setup\n\n## Configure the support chat\n\n{setup}\n"
+          "Then open the dashboard and click the chat bubble in the corner to ask a question.\n")
+    index = DocumentIndex(str(tmp_path))
+    index.refresh()
+    doc_index._indexes[os.path.realpath(str(tmp_path))] = index
+
+    question = "How do I set the OpenAI API key for the support chat?"
+    full = build_context(str(tmp_path), question, deduplicate=False)
+    assert full.count('OPENAI_API_KEY') == 3
+
+    stats = {}
+    context = build_context(str(tmp_path), question, stats=stats)
+    assert context.count('OPENAI_API_KEY') == 1
+    # The section that also says something new keeps that part
+    assert 'click the chat bubble' in context
+    assert stats['duplicate_tokens'] > 0
+    assert len(context) < len(full)
@@ -0,0 +1,216 @@
+"""
+Tests for the LLM client layer against a local fake provider.
+"""
+
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.support.llm_client import CircuitBreaker, CircuitOpenError, LLMClient, RetryBudget
+from app.support.metrics import metrics
+
+
+COMPLETION = {
+    'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': 'gpt-4o-mini',
+    'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': 'Click New Bug.'}}],
+    'usage': {'prompt_tokens': 10, 'completion_tokens': 3, 'total_tokens': 13},
+}
+
+
+@pytest.fixture
+def provider():
+    """
+    Fake chat completions endpoint. ``script`` holds the status (or
+    'slow') for successive requests; once exhausted every request succeeds.
+    """
+    state = {'script': [], 'requests': 0, 'connections': set()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            state['requests'] += 1
+            state['connections'].add(self.client_address)
+            step = state['script'].pop(0) if state['script'] else 200
+            if step == 'slow':
+                time.sleep(0.5)
+                step = 200
+            body = json.dumps(COMPLETION if step == 200 else {'error': {'message': 'boom'}}).encode()
+            self.send_response(step)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    state['url'] = f'http://127.0.0.1:{server.server_address[1]}/v1'
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(provider, **kwargs):
+    kwargs.setdefault('backoff_base', 0.01)
+    return LLMClient(api_key='test', base_url=provider['url'], **kwargs)
+
+
+def create(client):
+    return client.create(model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'hi'}])
+
+
+def test_retries_server_errors_over_one_pooled_connection(provider):
+    metrics.reset()
+    provider['script'] = [500, 503]
+    client = make_client(provider, max_retries=2)
+
+    assert create(client).choices[0].message.content == 'Click New Bug.'
+    create(client)
+
+    assert provider['requests'] == 4
+    assert len(provider['connections']) == 1
+    assert metrics.get('llm.retries') == 2
+
+
+def test_client_errors_are_not_retried(provider):
+    provider['script'] = [400]
+    client = make_client(provider)
+
+    with pytest.raises(Exception):
+        create(client)
+    assert provider['requests'] == 1
+
+
+def test_deadline_bounds_the_whole_call(provider):
+    provider['script'] = ['slow', 'slow', 'slow']
+    client = make_client(provider, timeout=0.2, deadline=0.3, max_retries=5)
+
+    started = time.monotonic()
+    with pytest.raises(Exception):
+        create(client)
+    assert time.monotonic() - started < 0.45
+    assert provider['requests'] <= 2
+
+
+def test_retry_budget_limits_retries_across_calls(provider):
+    provider['script'] = [500] * 20
+    client = make_client(provider, max_retries=3, retry_budget=RetryBudget(ratio=0.1, max_tokens=2),
+                         breaker=CircuitBreaker(failure_threshold=100))
+
+    for _ in range(4):
+        with pytest.raises(Exception):
+            create(client)
+    # 4 first attempts, 2 retries from the initial budget, none earned back yet
+    assert provider['requests'] == 6
+
+
+def test_circuit_breaker_fails_fast_then_probes(provider):
+    provider['script'] = [500, 500]
+    client = make_client(provider, max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.1))
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            create(client)
+    with pytest.raises(CircuitOpenError):
+        create(client)
+    assert provider['requests'] == 2
+
+    time.sleep(0.12)
+    assert create(client).choices[0].message.content == 'Click New Bug.'
+    assert client.breaker.state == 'closed'
+
+
+def test_probe_ended_by_client_error_releases_the_circuit(provider):
+    provider['script'] = [500, 400]
+    client = make_client(provider, max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+
+    with pytest.raises(Exception):
+        create(client)
+    time.sleep(0.06)
+    with pytest.raises(Exception):
+        create(client)
+    # The 400 neither closed nor re-opened the circuit, so the next call probes again
+    assert client.breaker.state == 'half-open'
+    assert create(client).choices[0].message.content == 'Click New Bug.'
+    assert client.breaker.state == 'closed'
+
+
+def test_backoff_never_sleeps_past_the_deadline(provider, monkeypatch):
+    provider['script'] = [500]
+    client = make_client(provider, deadline=0.2, max_retries=1)
+    monkeypatch.setattr(client, '_backoff', lambda attempt, error: 5)
+
+    started = time.monotonic()
+    with pytest.raises(Exception):
+        create(client)
+    assert time.monotonic() - started < 0.5
+
+
+def test_async_calls_share_the_retry_policy(provider):
+    provider['script'] = [502]
+    client = make_client(provider, max_retries=1)
+
+    async def run():
+        replies = await asyncio.gather(*[
+            client.acreate(model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'hi'}]) for _ in range(3)
+        ])
+        return [r.choices[0].message.content for r in replies]
+
+    assert asyncio.run(run()) == ['Click New Bug.'] * 3
+    assert provider['requests'] == 4
+
+
+def test_helpers_stream_and_call_through_fake_server(monkeypatch):
+    from benchmarks.fake_llm_server import start_server
+    from app.support import llm_client, llm_helper
+
+    server, url = start_server(latency=0, tokens_per_second=0)
+    try:
+        monkeypatch.setattr(llm_client, '_client', LLMClient(api_key='test', base_url=url))
+        usage = {}
+        reply = ''.join(llm_helper.stream_llm('Docs: {context}', [{'role': 'user', 'content': 'Write a help article'}],
+                                              usage=usage))
+        assert '=== PROPOSED_HELP_ARTICLE ===' in reply
+        assert usage['completion_tokens'] > 0
+
+        assert llm_helper.call_llm('Docs: {context}', 'How do I create a bug?').startswith('To create a bug report')
+        assert server.requests == 2
+    finally:
+        server.shutdown()
+
+
+def test_stream_failing_part_way_raises(monkeypatch):
+    from app.support import llm_helper
+
+    class Chunk:
+        usage = None
+
+        def __init__(self, text):
+            self.choices = [type('Choice', (), {'delta': type('Delta', (), {'content': text})})]
+
+    def chunks():
+        yield Chunk('To create ')
+        raise ConnectionError('reset')
+
+    class Client:
+        def create(self, **kwargs):
+            return chunks()
+
+    monkeypatch.setattr(llm_helper, 'get_llm_client', lambda: Client())
+    stream = llm_helper.stream_llm('Docs: {context}', [{'role': 'user', 'content': 'hi'}])
+    assert next(stream) == 'To create '
+    with pytest.raises(llm_helper.StreamInterrupted):
+        next(stream)
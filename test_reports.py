@@ -0,0 +1,147 @@
+"""
+Tests for the bug statistics snapshot used by the reports page.
+"""
+
+import sys
+import os
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+
+from app.reporting.stats import BugStatsSnapshot, ensure_indexes
+
+
+TODAY = date(2025, 12, 6)
+
+
+def make_engine():
+    """Create an in-memory database with the bugs table layout."""
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE bugs (
+                id INTEGER PRIMARY KEY,
+                title VARCHAR(200) NOT NULL,
+                description TEXT NOT NULL,
+                severity VARCHAR(20) NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                reporter VARCHAR(120) NOT NULL,
+                reporter_id INTEGER NOT NULL,
+                created_date DATETIME NOT NULL,
+                updated_date DATETIME NOT NULL
+            )
+        """))
+    return engine
+
+
+def add_bug(conn, bug_id, severity, status, reporter, created, updated=None):
+    conn.execute(text("""
+        INSERT INTO bugs (id, title, description, severity, status, reporter, reporter_id, created_date, updated_date)
+        VALUES (:id, 't', 'd', :severity, :status, :reporter, 1, :created, :updated)
+    """), {
+        'id': bug_id, 'severity': severity, 'status': status, 'reporter': reporter,
+        'created': str(created), 'updated': str(updated or created),
+    })
+
+
+def days_ago(n, hour=9):
+    return datetime.combine(TODAY - timedelta(days=n), datetime.min.time()) + timedelta(hours=hour)
+
+
+def seed(engine):
+    with engine.begin() as conn:
+        add_bug(conn, 1, 'High', 'Open', 'a@example.com', days_ago(2))
+        add_bug(conn, 2, 'Low', 'Closed', 'a@example.com', days_ago(40), days_ago(1))
+        add_bug(conn, 3, 'Medium', 'Open', 'b@example.com', days_ago(100))
+
+
+def test_full_build_sections():
+    engine = make_engine()
+    seed(engine)
+    snapshot = BugStatsSnapshot()
+    with engine.connect() as conn:
+        assert snapshot.refresh(conn) is True
+
+    report = snapshot.report(days=7, today=TODAY)
+    assert report['total_bugs'] == 3
+    assert report['open_bugs'] == 2
+
+    daily = {row['date']: row for row in report['daily']}
+    assert daily[str(TODAY - timedelta(days=2))]['opened'] == 1
+    assert daily[str(TODAY - timedelta(days=1))]['closed'] == 1
+
+    aging = {row['bucket']: row['count'] for row in report['aging']}
+    assert aging == {'0-7 days': 1, '8-30 days': 0, '31-90 days': 0, '90+ days': 1}
+
+    severity = {row['severity']: row for row in report['severity']}
+    assert severity['Low']['closed'] == 1
+    assert severity['High']['open'] == 1
+
+    assert report['reporters'][0] == {'reporter': 'a@example.com', 'open': 1, 'closed': 1, 'total': 2}
+
+
+def test_refresh_is_noop_when_unchanged():
+    engine = make_engine()
+    seed(engine)
+    snapshot = BugStatsSnapshot()
+    with engine.connect() as conn:
+        snapshot.refresh(conn)
+        version = snapshot.version
+        assert snapshot.refresh(conn) is False
+    assert snapshot.version == version
+
+
+def test_incremental_update_moves_edited_bug():
+    engine = make_engine()
+    seed(engine)
+    snapshot = BugStatsSnapshot()
+    with engine.connect() as conn:
+        snapshot.refresh(conn)
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE bugs SET status = 'Closed', updated_date = :u WHERE id = 1"),
+                     {'u': str(days_ago(0))})
+        add_bug(conn, 4, 'High', 'Open', 'c@example.com', days_ago(0, hour=10))
+
+    with engine.connect() as conn:
+        assert snapshot.refresh(conn) is True
+
+    report = snapshot.report(days=7, today=TODAY)
+    assert report['total_bugs'] == 4
+    assert report['open_bugs'] == 2
+    assert report['daily'][-1] == {'date': str(TODAY), 'opened': 1, 'closed': 1}
+
+    # The incremental result must match a snapshot built from scratch.
+    fresh = BugStatsSnapshot()
+    with engine.connect() as conn:
+        fresh.refresh(conn)
+    assert fresh.cells == snapshot.cells
+
+
+def test_delete_triggers_rebuild():
+    engine = make_engine()
+    seed(engine)
+    snapshot = BugStatsSnapshot()
+    with engine.connect() as conn:
+        snapshot.refresh(conn)
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM bugs WHERE id = 3"))
+
+    with engine.connect() as conn:
+        snapshot.refresh(conn)
+
+    report = snapshot.report(days=7, today=TODAY)
+    assert report['total_bugs'] == 2
+    assert 3 not in snapshot.bug_cells
+
+
+def test_ensure_indexes_adds_updated_date_index_to_existing_table():
+    engine = make_engine()
+    with engine.connect() as conn:
+        ensure_indexes(conn)
+        ensure_indexes(conn)
+        plan = conn.execute(text("EXPLAIN QUERY PLAN SELECT MAX(updated_date) FROM bugs")).fetchall()
+    assert 'ix_bugs_updated_date' in str(plan)
@@ -0,0 +1,151 @@
+"""
+Tests for the support assistant's reply cache.
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.support.metrics import metrics
+from app.support.response_cache import ResponseCache, cache_key
+
+
+def test_cache_key_normalizes_prompt_but_not_context_or_history():
+    base = cache_key('gpt-4o-mini', 'prompt', 'How do I create a bug?', 'v1')
+    assert cache_key('gpt-4o-mini', 'prompt', '  how do I   create a BUG ', 'v1') == base
+    assert cache_key('gpt-4o-mini', 'prompt', 'How do I create a bug?', 'v2') != base
+    assert cache_key('gpt-4o-mini', 'prompt', 'How do I create a bug?', 'v1',
+                     [{'role': 'user', 'content': 'hi'}]) != base
+
+
+def test_cache_persists_across_instances_and_counts_hits(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    metrics.reset()
+
+    cache = ResponseCache(path)
+    assert cache.get('k') is None
+    cache.put('k', 'gpt-4o-mini', 'Click New Bug.')
+    assert cache.get('k') == 'Click New Bug.'
+
+    # A second worker has an empty memory front but shares the SQLite store
+    other = ResponseCache(path)
+    assert other.get('k') == 'Click New Bug.'
+
+    counters = metrics.snapshot()['counters']
+    assert counters['response_cache.misses'] == 1
+    assert counters['response_cache.hits'] == 2
+    assert counters['response_cache.memory_hits'] == 1
+
+
+def test_cache_expires_and_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), ttl_seconds=0.05, max_entries=2, memory_entries=1)
+    cache.put('old', 'm', 'old reply')
+    time.sleep(0.06)
+    assert cache.get('old') is None
+
+    cache.ttl_seconds = 60
+    for key in ('a', 'b', 'c'):
+        cache.put(key, 'm', key)
+    cache.evict()
+    fresh = ResponseCache(cache.path, ttl_seconds=60)
+    assert fresh.get('a') is None
+    assert fresh.get('b') == 'b' and fresh.get('c') == 'c'
+
+
+def test_question_index_matches_paraphrases_across_workers(tmp_path):
+    from app.support.question_index import QuestionIndex
+
+    path = str(tmp_path / 'cache.db')
+    first = QuestionIndex(path, threshold=0.6)
+    first.add('How do I create a bug report?', 'Click New Bug.', 'v1')
+    first.add('How do I delete a bug?', 'Managers can delete bugs.', 'v1')
+
+    other = QuestionIndex(path, threshold=0.6)
+    similarity, entry = other.lookup('how to make a bug report', 'v1')
+    assert entry['answer'] == 'Click New Bug.' and similarity >= 0.6
+    assert other.lookup('can I remove a ticket', 'v1')[1]['answer'] == 'Managers can delete bugs.'
+    assert other.lookup('filter bugs by severity', 'v1') is None
+    # Answers given against other docs are not reused
+    assert other.lookup('how to make a bug report', 'v2') is None
+
+
+def test_question_index_needs_the_same_action_and_object():
+    from app.support.question_index import QuestionIndex
+
+    index = QuestionIndex(None, threshold=0.6)
+    index.add('How do I create a bug report?', 'Click New Bug.', 'v1')
+    index.add('How do I edit a bug?', 'Open the bug and click Edit.', 'v1')
+    for question in ['How do I find open bugs?', 'Show me open bugs', 'What happens to open bugs?',
+                     'Where are new bugs?', 'How do I fix a bug?', 'How do I create a project?']:
+        assert index.lookup(question, 'v1') is None, question
+    assert index.lookup('how do I create a bug', 'v1')[1]['answer'] == 'Click New Bug.'
+
+
+def test_question_index_forgets_expired_questions(tmp_path, monkeypatch):
+    from app.support import question_index
+
+    monkeypatch.setattr(question_index, 'PRUNE_EVERY', 2)
+    index = question_index.QuestionIndex(str(tmp_path / 'cache.db'), ttl_seconds=60)
+    index.add('How do I delete a bug?', 'Managers can delete bugs.', 'v1')
+    later = time.time() + 120
+    monkeypatch.setattr(question_index.time, 'time', lambda: later)
+    index.add('How do I create a bug report?', 'Click New Bug.', 'v1')
+    assert [e['question'] for e in index._entries.values()] == ['How do I create a bug report?']
+    assert sum(len(ids) for ids in index._buckets.values()) == len(index._keys[index._last_id])
+
+
+def test_single_flight_waits_for_another_workers_lease(tmp_path):
+    import threading
+    from app.support.single_flight import SingleFlight
+
+    path = str(tmp_path / 'cache.db')
+    published = {}
+    first = SingleFlight(path, wait_seconds=2, poll_interval=0.01)
+    second = SingleFlight(path, wait_seconds=2, poll_interval=0.01)
+
+    leader = first.begin('k')
+    assert leader.wait(lambda: published.get('k')) is None  # takes the lease and computes
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(second.begin('k').wait(lambda: published.get('k'))))
+    waiter.start()
+    time.sleep(0.05)
+    assert not result
+    published['k'] = 'Click New Bug.'
+    leader.finish('Click New Bug.')
+    waiter.join()
+    assert result == ['Click New Bug.']
+
+    # With the lease released and nothing published, the next request computes
+    assert second.begin('other').wait(lambda: None) is None
+
+
+def test_single_flight_waiters_elect_one_new_leader_when_the_leader_fails():
+    import threading
+    from app.support.single_flight import SingleFlight
+
+    flights = SingleFlight(wait_seconds=2)
+    leader = flights.begin('k')
+    joined = []
+
+    def follow():
+        flight, result = flights.join('k')
+        joined.append((flight, result))
+        if flight.owner:
+            time.sleep(0.2)  # the LLM call, while the others rejoin
+            flight.finish('Click New Bug.')
+
+    followers = [threading.Thread(target=follow) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    time.sleep(0.1)
+    leader.finish(None)
+    for follower in followers:
+        follower.join(5)
+
+    # Only one follower computes; the others get its reply
+    assert sum(flight.owner for flight, _ in joined) == 1
+    assert sorted(result or '' for _, result in joined) == ['', 'Click New Bug.', 'Click New Bug.']
+    assert flights._calls == {}
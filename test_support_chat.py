@@ -130,6 +130,20 @@ def test_system_prompt():
     
     print("=" * 70)
 
+def test_scope_classifier_trains_on_bot_behavior_examples():
+    """Test the local out-of-scope classifier against the documented examples"""
+    from app.support.scope_classifier import ScopeClassifier, load_examples
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'BOT_BEHAVIOR_EXAMPLES.md')
+    examples = load_examples(path)
+    assert ('Is there a mobile app I can download?', True) in examples
+    assert ('How do I create a bug report?', False) in examples
+
+    classifier = ScopeClassifier(examples)
+    assert classifier.is_out_of_scope('Can I get email notifications for new bugs?', 0.85)
+    assert classifier.is_out_of_scope('How do I track the time I spend on a bug?', 0.85)
+    for question in ('How do I log out?', 'How do I edit a bug I created?', 'What does severity mean?'):
+        assert not classifier.is_out_of_scope(question, 0.85)
 
 def test_import_modules():
     """Test that all support modules can be imported"""
@@ -0,0 +1,556 @@
+"""
+Tests for the support chat endpoints, with the LLM replaced by fakes.
+"""
+
+import sys
+import os
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from app.support import routes
+from app.support.metrics import metrics
+
+
+def make_client(tmp_path, monkeypatch, fragments=('To create ', 'a bug, ', 'click New Bug.')):
+    repo = tmp_path / 'repo'
+    (repo / 'help_articles').mkdir(parents=True)
+    (repo / 'help_articles' / 'bugs.md').write_text('# Creating Bugs\n\nClick New Bug.\n', encoding='utf-8')
+
+    calls = []
+
+    def fake_stream(system_prompt, conversation_history, context=None, **kwargs):
+        calls.append(list(conversation_history))
+        yield from fragments
+
+    def fake_call(system_prompt, user_message, context=None, usage=None, **kwargs):
+        calls.append([{'role': 'user', 'content': user_message}])
+        if usage is not None:
+            usage.update(prompt_tokens=900, completion_tokens=12)
+        return ''.join(fragments)
+
+    monkeypatch.setattr(routes, 'stream_llm', fake_stream)
+    monkeypatch.setattr(routes, 'call_llm', fake_call)
+
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', BASE_PATH=str(repo), SUPPORT_STATE_DIR=str(tmp_path / 'state'),
+                      SUPPORT_INDEX_POLL_SECONDS=0)
+    app.register_blueprint(routes.support_bp)
+    return app.test_client(), calls
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_chat_streams_tokens_then_done(tmp_path, monkeypatch):
+    client, calls = make_client(tmp_path, monkeypatch)
+
+    response = client.post('/api/support/chat', json={'message': 'How do I create a bug?', 'stream': True})
+    assert response.mimetype == 'text/event-stream'
+    events = parse_events(response.get_data(as_text=True))
+
+    assert [e for e, _ in events] == ['token', 'token', 'token', 'done']
+    assert ''.join(p['text'] for e, p in events if e == 'token') == 'To create a bug, click New Bug.'
+    assert events[-1][1]['reply'] == 'To create a bug, click New Bug.'
+    assert events[-1][1]['cached'] is False
+
+    # The repeat is served from the cache as a single token event
+    events = parse_events(client.post('/api/support/chat', json={
+        'message': 'how do I create a bug', 'stream': True
+    }).get_data(as_text=True))
+    assert events[-1][1]['cached'] is True
+    assert len(calls) == 1
+
+
+def test_stream_that_breaks_off_ends_with_error_and_is_not_kept(tmp_path, monkeypatch):
+    from app.support.llm_helper import StreamInterrupted
+
+    client, calls = make_client(tmp_path, monkeypatch)
+    fake_stream = routes.stream_llm
+
+    def broken_stream(*args, **kwargs):
+        calls.append('broken')
+        yield 'To create '
+        raise StreamInterrupted('connection reset')
+
+    monkeypatch.setattr(routes, 'stream_llm', broken_stream)
+    events = parse_events(client.post('/api/support/chat', json={
+        'message': 'How do I create a bug?', 'stream': True
+    }).get_data(as_text=True))
+    assert [e for e, _ in events] == ['token', 'error']
+    conversation_id = events[-1][1]['conversation_id']
+
+    # Neither the reply cache, the question index nor the conversation kept the partial reply
+    monkeypatch.setattr(routes, 'stream_llm', fake_stream)
+    events = parse_events(client.post('/api/support/chat', json={
+        'message': 'How do I create a bug?', 'conversation_id': conversation_id, 'stream': True
+    }).get_data(as_text=True))
+    assert events[-1][1]['cached'] is False
+    assert calls[-1] == [{'role': 'user', 'content': 'How do I create a bug?'}]
+
+
+def test_failed_leader_always_ends_its_flight(tmp_path, monkeypatch):
+    client, calls = make_client(tmp_path, monkeypatch)
+
+    def failing_call(*args, **kwargs):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(routes, 'call_llm', failing_call)
+    assert client.post('/api/support/chat', json={'message': 'How do I create a bug?'}).status_code == 500
+
+    # Not streamed and not even started: both free the slot and end the flight
+    with client.application.app_context():
+        flights, admission = routes.get_single_flight(), routes.get_admission()
+    client.post('/api/support/chat', json={'message': 'How do I delete a bug?', 'stream': True}).close()
+    assert flights._calls == {} and admission.in_flight == 0
+
+
+def test_chat_does_not_send_new_message_twice(tmp_path, monkeypatch):
+    client, calls = make_client(tmp_path, monkeypatch)
+
+    history = [{'role': 'user', 'content': 'Hi'}, {'role': 'assistant', 'content': 'Hello!'},
+               {'role': 'user', 'content': 'How do I create a bug?'}]
+    client.post('/api/support/chat', json={'message': 'How do I create a bug?', 'conversation': history,
+                                           'stream': True}).get_data()
+    assert [m['content'] for m in calls[0]] == ['Hi', 'Hello!', 'How do I create a bug?']
+
+
+def test_chat_keeps_history_server_side(tmp_path, monkeypatch):
+    client, calls = make_client(tmp_path, monkeypatch)
+
+    first = parse_events(client.post('/api/support/chat', json={
+        'message': 'How do I create a bug?', 'stream': True
+    }).get_data(as_text=True))[-1][1]
+    conversation_id = first['conversation_id']
+    assert conversation_id
+
+    second = client.post('/api/support/chat', json={
+        'message': 'And how do I delete one?', 'conversation_id': conversation_id, 'stream': True
+    })
+    assert parse_events(second.get_data(as_text=True))[-1][1]['conversation_id'] == conversation_id
+    assert [m['content'] for m in calls[1]] == [
+        'How do I create a bug?', 'To create a bug, click New Bug.', 'And how do I delete one?'
+    ]
+
+
+def test_conversations_belong_to_the_user_who_started_them(tmp_path, monkeypatch):
+    client, calls = make_client(tmp_path, monkeypatch)
+    with client.session_transaction() as sess:
+        sess['user_id'] = 7
+    conversation_id = client.post('/api/support/chat', json={
+        'message': 'How do I create a bug?'
+    }).get_json()['conversation_id']
+
+    with client.session_transaction() as sess:
+        sess['user_id'] = 8
+    # Another user's id neither continues the conversation nor reads it
+    reply = client.post('/api/support/chat', json={
+        'message': 'And how do I delete one?', 'conversation_id': conversation_id
+    }).get_json()
+    assert reply['conversation_id'] != conversation_id
+    assert calls[-1] == [{'role': 'user', 'content': 'And how do I delete one?'}]
+    assert client.post('/api/support/generate-article', json={
+        'topic': 'Filing Bugs', 'conversation_id': conversation_id
+    }).status_code == 404
+
+
+def test_history_window_folds_old_turns_into_summary(tmp_path):
+    from app.support.conversations import ConversationStore
+
+    store = ConversationStore(str(tmp_path / 'conversations.db'))
+    conversation_id = store.create()
+    for i in range(10):
+        store.append(conversation_id, [
+            {'role': 'user', 'content': f'Question {i} about filters? ' + 'detail ' * 100},
+            {'role': 'assistant', 'content': f'Answer {i}. ' + 'explanation ' * 100},
+        ])
+
+    summary, recent = store.window(conversation_id, budget_tokens=800)
+    assert recent[-1]['content'].startswith('Answer 9.')
+    assert 'User: Question 0 about filters?' in summary
+    assert len(store.turns(conversation_id)) == 20
+
+    # Folded turns stay folded; the next window only reads what is left
+    store.append(conversation_id, [{'role': 'user', 'content': 'Thanks'}, {'role': 'assistant', 'content': 'Welcome'}])
+    summary_after, recent_after = store.window(conversation_id, budget_tokens=800)
+    assert summary_after.startswith(summary.split('\n')[0])
+    assert recent_after[-1]['content'] == 'Welcome'
+
+
+def test_concurrent_appends_keep_every_turn(tmp_path):
+    import threading
+    from app.support.conversations import ConversationStore
+
+    store = ConversationStore(str(tmp_path / 'conversations.db'))
+    conversation_id = store.create()
+    errors = []
+
+    def append(i):
+        try:
+            store.append(conversation_id, [{'role': 'user', 'content': f'Question {i}'},
+                                           {'role': 'assistant', 'content': f'Answer {i}'}])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=append, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == [] and len(store.turns(conversation_id)) == 16
+
+
+def test_chat_usage_is_logged_and_queryable_by_managers(tmp_path, monkeypatch):
+    client, _calls = make_client(tmp_path, monkeypatch)
+    with client.session_transaction() as sess:
+        sess['user_id'] = 7
+        sess['user_role'] = 'reporter'
+
+    client.post('/api/support/chat', json={'message': 'How do I create a bug?'})
+    client.post('/api/support/chat', json={'message': 'How do I create a bug?'})
+    assert client.get('/api/support/usage').status_code == 403
+
+    with client.session_transaction() as sess:
+        sess['user_role'] = 'manager'
+    data = client.get('/api/support/usage?group_by=user').get_json()
+
+    assert data['groups'][0]['group'] == 7
+    assert data['groups'][0]['requests'] == 2
+    assert data['groups'][0]['cached'] == 1
+    fresh = data['recent'][-1]
+    assert fresh['prompt_tokens'] == 900 and fresh['completion_tokens'] == 12
+    assert fresh['context_tokens'] > 0 and fresh['system_tokens'] > 0 and fresh['reply_tokens'] > 0
+
+    # Out-of-range limits are clamped rather than read as "no limit"
+    assert len(client.get('/api/support/usage?limit=-1').get_json()['recent']) == 1
+    assert len(client.get('/api/support/usage?limit=abc').get_json()['recent']) == 2
+
+
+
+def test_chat_analytics_are_written_in_batches_and_summarized(tmp_path, monkeypatch):
+    client, _calls = make_client(tmp_path, monkeypatch)
+
+    client.post('/api/support/chat', json={'message': 'How do I create a bug?'})
+    client.post('/api/support/chat', json={'message': 'how do I create a bug'})
+    client.post('/api/support/chat', json={'message': 'Where are bugs listed?', 'stream': True}).get_data()
+
+    with client.application.app_context():
+        log = routes.get_chat_log()
+    assert log.flush()
+    with log._connect() as conn:
+        rows = [dict(row) for row in conn.execute('SELECT * FROM chat_requests ORDER BY id')]
+
+    assert [row['outcome'] for row in rows] == ['llm', 'cache', 'llm']
+    assert rows[0]['question_hash'] == rows[1]['question_hash'] != rows[2]['question_hash']
+    assert json.loads(rows[0]['sections']) == ['help_articles/bugs.md: Creating Bugs']
+    assert rows[0]['context_chars'] > 0 and rows[0]['prompt_tokens'] == 900
+    assert rows[2]['streamed'] == 1 and rows[2]['first_token_ms'] <= rows[2]['total_ms']
+
+    summary = log.summary()
+    assert summary['requests'] == 3 and summary['outcomes'] == {'llm': 2, 'cache': 1}
+    assert summary['p95']['total_ms'] >= summary['p50']['total_ms'] > 0
+    top = summary['top_questions'][0]
+    assert top['requests'] == 2 and top['cache_hit_rate'] == 0.5
+
+def test_identical_concurrent_chats_share_one_llm_call(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    client, _calls = make_client(tmp_path, monkeypatch)
+    started = []
+
+    def slow_call(system_prompt, user_message, context=None, usage=None, **kwargs):
+        started.append(user_message)
+        time.sleep(0.3)
+        return 'Click New Bug.'
+
+    monkeypatch.setattr(routes, 'call_llm', slow_call)
+    replies = []
+
+    def ask():
+        replies.append(client.application.test_client().post(
+            '/api/support/chat', json={'message': 'How do I report a bug?'}
+        ).get_json())
+
+    threads = [threading.Thread(target=ask) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert started == ['How do I report a bug?']
+    assert [r['reply'] for r in replies] == ['Click New Bug.'] * 5
+    assert sorted(r['cached'] for r in replies) == [False, True, True, True, True]
+
+
+def test_out_of_scope_questions_get_the_redirect_without_the_llm(tmp_path, monkeypatch):
+    import shutil
+    from app.support.prompts import OUT_OF_SCOPE_REPLY
+
+    client, calls = make_client(tmp_path, monkeypatch)
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'BOT_BEHAVIOR_EXAMPLES.md'),
+                tmp_path / 'repo' / 'BOT_BEHAVIOR_EXAMPLES.md')
+
+    data = client.post('/api/support/chat', json={'message': 'Does it integrate with Slack?'}).get_json()
+    assert data['reply'] == OUT_OF_SCOPE_REPLY
+    assert data['out_of_scope'] is True
+    assert [a['title'] for a in data['articles']][0] == 'Getting Started Guide'
+    assert calls == []
+
+    data = client.post('/api/support/chat', json={'message': 'How do I assign a bug to a developer?'}).get_json()
+    assert 'out_of_scope' not in data
+    assert len(calls) == 1
+
+
+def test_questions_a_help_article_answers_skip_the_llm(tmp_path, monkeypatch):
+    client, calls = make_client(tmp_path, monkeypatch)
+    (tmp_path / 'repo' / 'help_articles' / 'roles.md').write_text(
+        '# User Roles\n\nThere are two roles.\n\n'
+        '## Manager Permissions\n\nManagers can assign bugs to any team member, change the priority and '
+        'status of every bug, and delete bugs that are duplicates or were filed by mistake.\n',
+        encoding='utf-8'
+    )
+
+    data = client.post('/api/support/chat', json={'message': 'What are manager permissions?'}).get_json()
+    assert data['from_article'] is True
+    assert data['reply'].startswith('**Manager Permissions**')
+    assert data['reply'].endswith("See: 'User Roles' for more details.")
+    assert data['articles'] == [{'title': 'User Roles', 'path': 'help_articles/roles.md'}]
+    assert calls == []
+
+    data = client.post('/api/support/chat', json={'message': 'Can I export bugs to a spreadsheet?'}).get_json()
+    assert 'from_article' not in data
+    assert len(calls) == 1
+
+
+def test_article_answers_on_labelled_questions(tmp_path):
+    import shutil
+    from app.support.article_answers import answer_from_articles
+    from app.support.doc_index import DocumentIndex
+
+    shutil.copytree(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'help_articles'),
+                    tmp_path / 'help_articles')
+    index = DocumentIndex(str(tmp_path))
+    index.refresh()
+    threshold = 0.7  # SUPPORT_ARTICLE_ANSWER_THRESHOLD default
+
+    answered = {
+        'How do I create a bug report?': 'Steps to Create a Bug Report',
+        'What can a manager do?': 'Manager Role',
+        'What bug statuses are there?': 'Bug Statuses',
+        "Why can't I delete a bug?": 'When Deleting Bugs',
+        'How do managers triage bugs?': 'Triaging Bugs',
+    }
+    for question, heading in answered.items():
+        answer = answer_from_articles(index, question, threshold)
+        assert answer is not None and heading in answer['heading'], question
+
+    # The article title alone no longer carries these to "What Happens Next?"
+    for question in ['How do I delete a bug report?', 'Can managers create bug reports?',
+                     'What happens to a bug when it is reopened?', 'Can I attach a screenshot to a bug?',
+                     'How do I generate an HTML report of bug statistics?']:
+        assert answer_from_articles(index, question, threshold) is None, question
+
+
+def test_generate_article_runs_as_a_background_job(tmp_path, monkeypatch):
+    client, calls = make_client(tmp_path, monkeypatch, fragments=('Click New Bug and fill in the form.',))
+
+    response = client.post('/api/support/generate-article', json={'topic': 'Filing Bugs'})
+    assert response.status_code == 202
+    job_url = response.get_json()['status_url']
+    assert response.headers['Location'] == job_url
+
+    with client.application.app_context():
+        job = routes.get_job_runner().wait(response.get_json()['job_id'], timeout=10)
+    assert job['status'] == 'done'
+    assert client.get(job_url).get_json()['result']['article_path'] == 'help_articles/filing-bugs.md'
+    assert (tmp_path / 'repo' / 'help_articles' / 'filing-bugs.md').read_text(encoding='utf-8').endswith(
+        'Click New Bug and fill in the form.')
+
+    # Another user can't see it
+    with client.session_transaction() as sess:
+        sess['user_id'] = 7
+    response = client.post('/api/support/generate-article', json={'topic': 'Other'})
+    with client.session_transaction() as sess:
+        sess['user_id'] = 8
+    assert client.get(response.get_json()['status_url']).status_code == 404
+
+
+def test_failed_jobs_record_the_error(tmp_path):
+    from app.support.jobs import JobRunner
+
+    runner = JobRunner(str(tmp_path / 'jobs.db'), workers=1)
+    runner.register('boom', lambda payload: 1 / payload['n'])
+    runner.register('echo', lambda payload: payload)
+
+    assert runner.wait(runner.submit('echo', {'n': 2}))['result'] == {'n': 2}
+    job = runner.wait(runner.submit('boom', {'n': 0}))
+    assert job['status'] == 'failed'
+    assert 'division by zero' in job['error']
+    runner.shutdown()
+
+
+def test_article_catalog_pages_sorts_and_searches(tmp_path, monkeypatch):
+    client, calls = make_client(tmp_path, monkeypatch)
+    articles = tmp_path / 'repo' / 'help_articles'
+    for i, name in enumerate(['alpha', 'charlie', 'bravo']):
+        path = articles / f'{name}.md'
+        path.write_text(f'# {name.title()}\n\n_Generated on 2025-01-01_\n\nAll about {name}.\n', encoding='utf-8')
+        os.utime(path, (1000 + i, 1000 + i))
+
+    data = client.get('/api/support/articles?per_page=2').get_json()
+    assert (data['total'], data['pages']) == (4, 2)
+    assert [a['title'] for a in data['articles']] == ['Creating Bugs', 'Bravo']
+    assert data['articles'][1]['summary'] == 'All about bravo.'
+
+    data = client.get('/api/support/articles?sort=title&page=2&per_page=2').get_json()
+    assert [a['title'] for a in data['articles']] == ['Charlie', 'Creating Bugs']
+    assert [a['path'] for a in client.get('/api/support/articles?q=CHARLIE').get_json()['articles']] == \
+        ['help_articles/charlie.md']
+    assert client.get('/api/support/articles?sort=mtime').status_code == 400
+
+    # A generated article shows up right away
+    response = client.post('/api/support/generate-article', json={'topic': 'Delta'})
+    with client.application.app_context():
+        routes.get_job_runner().wait(response.get_json()['job_id'], timeout=10)
+    assert client.get('/api/support/articles?sort=title&order=desc').get_json()['articles'][0]['title'] == 'Delta'
+
+
+def test_articles_are_served_as_sanitized_html_with_an_etag(tmp_path, monkeypatch):
+    client, calls = make_client(tmp_path, monkeypatch)
+    (tmp_path / 'repo' / 'help_articles' / 'tips.md').write_text(
+        '# Tips\n\n**Be specific.** <script>alert(1)</script>\n\n- One\n  - Nested\n\n'
+        '[Bad](javascript:alert(1)) [Good](https://example.com)\n\n'
+        'See [`app.py`](app/app.py) and [**b**](javascript:alert(1)).\n',
+        encoding='utf-8'
+    )
+
+    response = client.get('/api/support/article/tips.md')
+    html = response.get_json()['html']
+    assert html.startswith('<h1>Tips</h1>\n<p><strong>Be specific.</strong> &lt;script&gt;')
+    assert '<ul><li>One<ul><li>Nested</li></ul></li></ul>' in html
+    assert 'javascript' not in html and '<a href="https://example.com"' in html
+    # Code spans inside link labels, and targets containing parentheses
+    assert '<p>See <a href="app/app.py" rel="noopener noreferrer"><code>app.py</code></a> and <strong>b</strong>.</p>' in html
+
+    etag = response.headers['ETag']
+    assert client.get('/api/support/article/tips.md', headers={'If-None-Match': etag}).status_code == 304
+
+    (tmp_path / 'repo' / 'help_articles' / 'tips.md').write_text('# Tips\n\nChanged.\n', encoding='utf-8')
+    response = client.get('/api/support/article/tips.md', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['html'] == '<h1>Tips</h1>\n<p>Changed.</p>'
+
+    assert client.get('/api/support/article/..%2Frequests.md').status_code == 404
+
+
+def test_chat_sheds_load_with_429(tmp_path, monkeypatch):
+    metrics.reset()
+    client, calls = make_client(tmp_path, monkeypatch)
+    client.application.config.update(SUPPORT_RATE_BURST=2, SUPPORT_LLM_MAX_CONCURRENT=1, SUPPORT_LLM_QUEUE=0)
+
+    # One user gets a burst of two, then has to wait
+    assert client.post('/api/support/chat', json={'message': 'How do I edit a bug?'}).status_code == 200
+    assert client.post('/api/support/chat', json={'message': 'How do I close a bug?'}).status_code == 200
+    response = client.post('/api/support/chat', json={'message': 'How do I assign a bug?'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+    # With the only LLM slot busy and no queue, another user is shed at once
+    with client.application.app_context():
+        admission = routes.get_admission()
+    admission.acquire()
+    try:
+        other = client.application.test_client()
+        with other.session_transaction() as sess:
+            sess['user_id'] = 2
+        assert other.post('/api/support/chat', json={'message': 'How do I log out?'}).status_code == 429
+    finally:
+        admission.release()
+    assert other.post('/api/support/chat', json={'message': 'How do I log out?'}).status_code == 200
+    assert metrics.get('admission.shed.user_rate') == 1
+    assert metrics.get('admission.shed.queue_full') == 1
+
+
+def test_queued_requests_get_the_next_free_slot():
+    import threading
+    from app.support.admission import AdmissionController, Overloaded
+
+    admission = AdmissionController(user_rate=0, max_concurrent=1, max_queue=1, queue_timeout=5)
+    admission.acquire()
+    admitted = threading.Event()
+    waiter = threading.Thread(target=lambda: (admission.acquire(), admitted.set()))
+    waiter.start()
+    while admission.queued == 0:
+        pass
+    with pytest.raises(Overloaded) as shed:
+        admission.acquire()
+    assert shed.value.reason == 'queue_full'
+
+    admission.release()
+    waiter.join(5)
+    assert admitted.is_set() and admission.in_flight == 1
+
+
+def test_coalesced_waiters_are_bounded():
+    import threading
+    from app.support.admission import AdmissionController, Overloaded
+    from app.support.single_flight import SingleFlight
+
+    admission = AdmissionController(user_rate=0, max_concurrent=1, max_queue=1, queue_timeout=5, max_waiters=1)
+    flights = SingleFlight(wait_seconds=5)
+    leader = flights.begin('k')
+    assert leader.wait(hold=admission.waiting) is None
+    assert admission.waiters == 0
+
+    result = []
+    follower = threading.Thread(target=lambda: result.append(flights.begin('k').wait(hold=admission.waiting)))
+    follower.start()
+    while admission.waiters == 0:
+        pass
+    # The one waiter place is taken by the follower, so the next one is shed
+    with pytest.raises(Overloaded):
+        flights.begin('k').wait(hold=admission.waiting)
+
+    leader.finish('Click New Bug.')
+    follower.join(5)
+    assert result == ['Click New Bug.'] and admission.waiters == 0
+
+
+def test_leader_is_admitted_while_its_followers_wait():
+    import threading
+    from app.support.admission import AdmissionController
+    from app.support.single_flight import SingleFlight
+
+    admission = AdmissionController(user_rate=0, max_concurrent=1, max_queue=1, queue_timeout=5, max_waiters=2)
+    flights = SingleFlight(wait_seconds=5)
+    leader = flights.begin('k')
+    assert leader.wait(hold=admission.waiting) is None
+
+    # Another request holds the only slot, and followers fill every waiter place
+    admission.acquire()
+    result = []
+    followers = [threading.Thread(target=lambda: result.append(flights.begin('k').wait(hold=admission.waiting)))
+                 for _ in range(2)]
+    for follower in followers:
+        follower.start()
+    while admission.waiters < 2:
+        pass
+
+    # The leader still gets the queue place and then the slot
+    threading.Timer(0.05, admission.release).start()
+    admission.acquire()
+    leader.finish('Click New Bug.')
+    admission.release()
+    for follower in followers:
+        follower.join(5)
+    assert result == ['Click New Bug.'] * 2 and admission.in_flight == 0